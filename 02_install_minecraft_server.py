@@ -13,16 +13,351 @@ import subprocess
 import zipfile
 import time
 import socket
+import shutil
+import hashlib
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_EXCEPTION
 from pathlib import Path
 from rich.console import Console
 from rich.panel import Panel
 from rich.prompt import Prompt, Confirm
-from rich.progress import Progress, SpinnerColumn, TextColumn
+from rich.progress import Progress, SpinnerColumn, TextColumn, BarColumn, DownloadColumn, TransferSpeedColumn
 from rich.table import Table
 from rich import print as rprint
 
 console = Console()
 
+class DownloadError(Exception):
+    """Descarga fallida o archivo que no coincide con su hash publicado"""
+
+
+class _RestartDownload(Exception):
+    """El servidor ignoró el Range o el archivo cambió: hay que empezar de cero"""
+
+
+class ArtifactDownloader:
+    """Descargas de artefactos (server.jar) con caché direccionada por contenido.
+
+    Los archivos grandes se parten en peticiones HTTP Range paralelas que
+    escriben en un archivo .part; el progreso de cada tramo se guarda en un
+    .json junto a él, así que una descarga interrumpida continúa donde quedó.
+    Los hashes SHA-1/SHA-256 se calculan mientras se descarga, leyendo el
+    prefijo contiguo ya escrito. Los artefactos verificados quedan en
+    artifacts/<algoritmo>/<xx>/<hash>, compartidos entre instalaciones.
+
+    requests.Session no es segura entre hilos: cada tramo usa su propia
+    sesión creada con session_factory.
+    """
+
+    CHUNK_SIZE = 1024 * 1024
+    ALGORITHMS = ("sha1", "sha256")
+
+    def __init__(self, cache_dir, session_factory=requests.Session, workers=4,
+                 min_part_size=8 * 1024 * 1024, timeout=30):
+        self.cache_dir = Path(cache_dir)
+        self.session_factory = session_factory
+        self.session = session_factory()
+        self.workers = workers
+        self.min_part_size = min_part_size
+        self.timeout = timeout
+
+    def cache_path(self, algorithm, digest):
+        digest = digest.lower()
+        return self.cache_dir / "artifacts" / algorithm / digest[:2] / digest
+
+    @staticmethod
+    def file_digest(path, algorithm):
+        digest = hashlib.new(algorithm)
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def lookup(self, sha1=None, sha256=None):
+        """Ruta del artefacto en caché si existe y su contenido coincide, o None"""
+        for algorithm, expected in (("sha256", sha256), ("sha1", sha1)):
+            if not expected:
+                continue
+            path = self.cache_path(algorithm, expected)
+            if path.is_file():
+                if self.file_digest(path, algorithm) == expected.lower():
+                    return path
+                path.unlink()  # Entrada corrupta: se vuelve a descargar
+        return None
+
+    def _probe(self, url):
+        """(tamaño, validador, admite Range) con una petición HEAD"""
+        try:
+            response = self.session.head(url, allow_redirects=True, timeout=self.timeout)
+            response.raise_for_status()
+        except requests.RequestException:
+            return None, None, False
+        length = response.headers.get("Content-Length")
+        size = int(length) if length and length.isdigit() else None
+        validator = response.headers.get("ETag") or response.headers.get("Last-Modified")
+        ranges = response.headers.get("Accept-Ranges", "").lower() == "bytes"
+        return size, validator, ranges and size is not None
+
+    def _new_state(self, url, size, validator, ranges):
+        if not ranges:
+            return {"url": url, "size": size, "validator": validator, "ranges": False, "parts": [[0, None, 0]]}
+        count = max(1, min(self.workers, size // self.min_part_size))
+        step = -(-size // count)
+        parts = [[start, min(start + step, size) - 1, 0] for start in range(0, size, step)]
+        return {"url": url, "size": size, "validator": validator, "ranges": True, "parts": parts}
+
+    @staticmethod
+    def _save_state(state_path, state):
+        tmp_path = state_path.with_name(state_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(state, f)
+        os.replace(tmp_path, state_path)
+
+    def _load_state(self, state_path, part_path, url, size, validator, ranges):
+        """Estado guardado si corresponde a la misma URL y versión del archivo"""
+        try:
+            with open(state_path, "r", encoding="utf-8") as f:
+                state = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if (not ranges or not part_path.exists() or state.get("url") != url
+                or state.get("size") != size or state.get("validator") != validator):
+            return None
+        return state
+
+    def _fetch_part(self, state, index, part_path, lock, stop, counters):
+        part = state["parts"][index]
+        start, end = part[0], part[1]
+        if end is not None and start + part[2] > end:
+            return
+        headers = {}
+        if state["ranges"]:
+            headers["Range"] = f"bytes={start + part[2]}-{end}"
+            if state["validator"]:
+                headers["If-Range"] = state["validator"]
+        elif part[2]:
+            with lock:
+                counters["downloaded"] -= part[2]
+                part[2] = 0
+        
+        with self.session_factory() as session, \
+                session.get(state["url"], headers=headers, stream=True, timeout=self.timeout) as response:
+            response.raise_for_status()
+            if state["ranges"] and response.status_code != 206:
+                raise _RestartDownload()
+            with open(part_path, "r+b", buffering=0) as f:
+                f.seek(start + part[2])
+                for chunk in response.iter_content(chunk_size=self.CHUNK_SIZE):
+                    if stop.is_set():
+                        return
+                    if end is not None:
+                        chunk = chunk[:end + 1 - start - part[2]]
+                    view = memoryview(chunk)
+                    while view:
+                        view = view[f.write(view):]
+                    with lock:
+                        part[2] += len(chunk)
+                        counters["downloaded"] += len(chunk)
+
+    @staticmethod
+    def _frontier(state):
+        """Fin del prefijo contiguo ya escrito"""
+        position = 0
+        for start, end, done in state["parts"]:
+            position = start + done
+            if end is None or position <= end:
+                break
+        return position
+
+    def _download(self, state, part_path, state_path, progress):
+        lock = threading.Lock()
+        stop = threading.Event()
+        counters = {"downloaded": sum(part[2] for part in state["parts"])}
+        hashers = {algorithm: hashlib.new(algorithm) for algorithm in self.ALGORITHMS}
+        hashed = 0
+        
+        with open(part_path, "rb") as reader, ThreadPoolExecutor(max_workers=len(state["parts"])) as pool:
+            futures = [
+                pool.submit(self._fetch_part, state, index, part_path, lock, stop, counters)
+                for index in range(len(state["parts"]))
+            ]
+            pending = set(futures)
+            saved_at = counters["downloaded"]
+            try:
+                while True:
+                    done, pending = wait(pending, timeout=0.2, return_when=FIRST_EXCEPTION)
+                    for future in done:
+                        future.result()
+                    with lock:
+                        frontier = self._frontier(state)
+                        downloaded = counters["downloaded"]
+                    # Hash del tramo contiguo mientras el resto sigue descargando
+                    reader.seek(hashed)
+                    while hashed < frontier:
+                        block = reader.read(min(self.CHUNK_SIZE, frontier - hashed))
+                        if not block:
+                            break
+                        for hasher in hashers.values():
+                            hasher.update(block)
+                        hashed += len(block)
+                    if progress:
+                        progress(downloaded, state["size"])
+                    if state["ranges"] and downloaded - saved_at >= 4 * self.CHUNK_SIZE:
+                        with lock:
+                            self._save_state(state_path, state)
+                        saved_at = downloaded
+                    if not pending:
+                        break
+            except BaseException:
+                stop.set()
+                for future in pending:
+                    future.cancel()
+                raise
+            finally:
+                if state["ranges"]:
+                    with lock:
+                        self._save_state(state_path, state)
+        
+        if state["size"] is not None and hashed != state["size"]:
+            raise DownloadError(f"Descarga incompleta: {hashed} de {state['size']} bytes")
+        return {algorithm: hasher.hexdigest() for algorithm, hasher in hashers.items()}
+
+    def fetch(self, url, sha1=None, sha256=None, progress=None):
+        """Devolver la ruta en caché del artefacto, descargándolo y verificándolo si hace falta"""
+        cached = self.lookup(sha1, sha256)
+        if cached is not None:
+            if progress:
+                size = cached.stat().st_size
+                progress(size, size)
+            return cached
+        
+        downloads_dir = self.cache_dir / "downloads"
+        downloads_dir.mkdir(parents=True, exist_ok=True)
+        name = hashlib.sha1(url.encode("utf-8")).hexdigest()
+        part_path = downloads_dir / f"{name}.part"
+        state_path = downloads_dir / f"{name}.json"
+        
+        size, validator, ranges = self._probe(url)
+        for attempt in range(2):
+            state = self._load_state(state_path, part_path, url, size, validator, ranges) if attempt == 0 else None
+            if state is None:
+                state = self._new_state(url, size, validator, ranges)
+                with open(part_path, "wb") as f:
+                    if size:
+                        f.truncate(size)
+            try:
+                digests = self._download(state, part_path, state_path, progress)
+                break
+            except _RestartDownload:
+                ranges = False
+            except requests.RequestException as e:
+                raise DownloadError(f"Error descargando {url}: {e}") from e
+        
+        expected = {"sha1": sha1, "sha256": sha256}
+        for algorithm, value in expected.items():
+            if value and digests[algorithm] != value.lower():
+                part_path.unlink(missing_ok=True)
+                state_path.unlink(missing_ok=True)
+                raise DownloadError(f"{algorithm.upper()} no coincide: esperado {value}, obtenido {digests[algorithm]}")
+        
+        # Guardar en la caché por SHA-256 y enlazar el alias SHA-1
+        target = self.cache_path("sha256", digests["sha256"])
+        target.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(part_path, target)
+        state_path.unlink(missing_ok=True)
+        alias = self.cache_path("sha1", digests["sha1"])
+        if not alias.exists():
+            alias.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                os.link(target, alias)
+            except OSError:
+                shutil.copyfile(target, alias)
+        return target
+
+    def install(self, url, destination, sha1=None, sha256=None, progress=None):
+        """Descargar (o tomar de la caché) y copiar al destino de forma atómica"""
+        source = self.fetch(url, sha1=sha1, sha256=sha256, progress=progress)
+        destination = Path(destination)
+        tmp_path = destination.with_name(destination.name + ".tmp")
+        shutil.copyfile(source, tmp_path)
+        os.replace(tmp_path, destination)
+        return source
+
+
+class ManifestCache:
+    """Consultas JSON (manifiestos de versiones) con caché en disco y revalidación condicional.
+
+    Cada respuesta se guarda con su ETag/Last-Modified; las siguientes
+    consultas envían If-None-Match/If-Modified-Since y un 304 reutiliza el
+    cuerpo guardado. Sin conexión se devuelve la copia en caché.
+    """
+
+    def __init__(self, cache_dir, session=None, timeout=(5, 30)):
+        self.cache_dir = Path(cache_dir) / "manifests"
+        self.session = session or requests.Session()
+        self.timeout = timeout
+        self.last_source = None  # "network", "revalidated", "cache" u "offline"
+
+    def _entry_path(self, url):
+        return self.cache_dir / (hashlib.sha1(url.encode("utf-8")).hexdigest() + ".json")
+
+    def _read_entry(self, url):
+        try:
+            with open(self._entry_path(url), "r", encoding="utf-8") as f:
+                entry = json.load(f)
+        except (OSError, ValueError):
+            return None
+        return entry if entry.get("url") == url else None
+
+    def _write_entry(self, url, entry):
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        path = self._entry_path(url)
+        tmp_path = path.with_name(path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entry, f)
+        os.replace(tmp_path, path)
+
+    def get_json(self, url, max_age=0, immutable=False):
+        """JSON de `url`. Con max_age (segundos) o immutable se evita incluso el 304"""
+        entry = self._read_entry(url)
+        if entry is not None and (immutable or time.time() - entry.get("checked", 0) < max_age):
+            self.last_source = "cache"
+            return entry["body"]
+        
+        headers = {}
+        if entry is not None:
+            if entry.get("etag"):
+                headers["If-None-Match"] = entry["etag"]
+            if entry.get("last_modified"):
+                headers["If-Modified-Since"] = entry["last_modified"]
+        
+        try:
+            response = self.session.get(url, headers=headers, timeout=self.timeout)
+            if response.status_code == 304 and entry is not None:
+                entry["checked"] = time.time()
+                self._write_entry(url, entry)
+                self.last_source = "revalidated"
+                return entry["body"]
+            response.raise_for_status()
+            body = response.json()
+        except (requests.RequestException, ValueError):
+            if entry is None:
+                raise
+            # Sin conexión (o respuesta inválida): usar la última copia buena
+            self.last_source = "offline"
+            return entry["body"]
+        
+        self._write_entry(url, {
+            "url": url,
+            "etag": response.headers.get("ETag"),
+            "last_modified": response.headers.get("Last-Modified"),
+            "checked": time.time(),
+            "body": body
+        })
+        self.last_source = "network"
+        return body
+
+
 class MinecraftServerInstaller:
     def __init__(self):
         self.server_dir = Path("C:/MinecraftServer")
@@ -32,6 +367,19 @@ class MinecraftServerInstaller:
             "-XX:+ParallelRefProcEnabled", "-jar", "server.jar", "nogui"
         ]
         
+        # Caché compartida entre instalaciones y actualizaciones
+        self.cache_dir = Path.home() / ".minecraft_server_cache"
+        self.session = self.new_session()
+        self.manifests = ManifestCache(self.cache_dir, self.session)
+        self.downloader = ArtifactDownloader(self.cache_dir, self.new_session)
+    
+    @staticmethod
+    def new_session():
+        """Sesión HTTP con conexiones reutilizables (una por hilo de descarga)"""
+        session = requests.Session()
+        session.mount("https://", requests.adapters.HTTPAdapter(pool_connections=4, pool_maxsize=8))
+        return session
+        
     def create_server_directory(self):
         """Crear el directorio del servidor"""
         try:
@@ -42,13 +390,18 @@ class MinecraftServerInstaller:
             console.print(f"❌ Error creando directorio: {e}", style="red")
             return False
     
+    def report_manifest_source(self):
+        """Avisar si los datos vienen de la caché sin conexión"""
+        if self.manifests.last_source == "offline":
+            console.print("📴 Sin conexión: usando la copia en caché", style="yellow")
+    
     def get_minecraft_versions(self):
         """Obtener versiones de Minecraft desde la API oficial"""
         try:
             console.print("🔍 Consultando API de Mojang...", style="yellow")
-            response = requests.get("https://launchermeta.mojang.com/mc/game/version_manifest.json")
-            response.raise_for_status()
-            return response.json()
+            versions_data = self.manifests.get_json("https://launchermeta.mojang.com/mc/game/version_manifest.json")
+            self.report_manifest_source()
+            return versions_data
         except Exception as e:
             console.print(f"❌ Error consultando API: {e}", style="red")
             return None
@@ -57,40 +410,38 @@ class MinecraftServerInstaller:
         """Obtener versiones de PaperMC"""
         try:
             console.print("🔍 Consultando API de PaperMC...", style="yellow")
-            response = requests.get("https://api.papermc.io/v2/projects/paper")
-            response.raise_for_status()
-            return response.json()
+            paper_data = self.manifests.get_json("https://api.papermc.io/v2/projects/paper")
+            self.report_manifest_source()
+            return paper_data
         except Exception as e:
             console.print(f"❌ Error consultando API de PaperMC: {e}", style="red")
             return None
     
-    def download_server_jar(self, download_url, filename="server.jar"):
-        """Descargar el archivo JAR del servidor"""
+    def download_server_jar(self, download_url, filename="server.jar", sha1=None, sha256=None):
+        """Descargar el archivo JAR del servidor (en paralelo, reanudable y verificado)"""
         try:
             with Progress(
                 SpinnerColumn(),
                 TextColumn("[progress.description]{task.description}"),
+                BarColumn(),
+                DownloadColumn(),
+                TransferSpeedColumn(),
                 console=console
             ) as progress:
                 task = progress.add_task("Descargando servidor...", total=None)
                 
-                response = requests.get(download_url, stream=True)
-                response.raise_for_status()
+                def report(downloaded, total):
+                    progress.update(task, completed=downloaded, total=total)
                 
-                total_size = int(response.headers.get('content-length', 0))
-                progress.update(task, total=total_size)
-                
-                with open(self.server_jar, 'wb') as f:
-                    downloaded = 0
-                    for chunk in response.iter_content(chunk_size=8192):
-                        if chunk:
-                            f.write(chunk)
-                            downloaded += len(chunk)
-                            progress.update(task, completed=downloaded)
+                self.downloader.install(
+                    download_url, self.server_dir / filename, sha1=sha1, sha256=sha256, progress=report
+                )
                 
                 progress.update(task, description="✅ Descarga completada")
             
-            console.print(f"✅ Servidor descargado: {self.server_jar}", style="green")
+            if sha1 or sha256:
+                console.print(f"🔒 Hash verificado: {(sha256 or sha1)[:16]}...", style="dim")
+            console.print(f"✅ Servidor descargado: {self.server_dir / filename}", style="green")
             return True
         except Exception as e:
             console.print(f"❌ Error descargando servidor: {e}", style="red")
@@ -113,13 +464,11 @@ class MinecraftServerInstaller:
                 console.print("❌ No se encontró información de la versión", style="red")
                 return False
             
-            # Obtener información del servidor
-            version_response = requests.get(version_info['url'])
-            version_response.raise_for_status()
-            version_data = version_response.json()
+            # Obtener información del servidor (cada versión publicada no cambia)
+            version_data = self.manifests.get_json(version_info['url'], immutable=True)
             
-            server_url = version_data['downloads']['server']['url']
-            return self.download_server_jar(server_url)
+            server_download = version_data['downloads']['server']
+            return self.download_server_jar(server_download['url'], sha1=server_download.get('sha1'))
             
         except Exception as e:
             console.print(f"❌ Error instalando Vanilla: {e}", style="red")
@@ -141,17 +490,15 @@ class MinecraftServerInstaller:
                 console.print(f"❌ Versión {version_id} no encontrada", style="red")
                 return False
             
-            # Obtener información del servidor
-            version_response = requests.get(version_info['url'])
-            version_response.raise_for_status()
-            version_data = version_response.json()
+            # Obtener información del servidor (cada versión publicada no cambia)
+            version_data = self.manifests.get_json(version_info['url'], immutable=True)
             
             if 'server' not in version_data['downloads']:
                 console.print(f"❌ La versión {version_id} no tiene servidor disponible", style="red")
                 return False
             
-            server_url = version_data['downloads']['server']['url']
-            return self.download_server_jar(server_url)
+            server_download = version_data['downloads']['server']
+            return self.download_server_jar(server_download['url'], sha1=server_download.get('sha1'))
             
         except Exception as e:
             console.print(f"❌ Error instalando versión específica: {e}", style="red")
@@ -169,17 +516,22 @@ class MinecraftServerInstaller:
             console.print(f"📦 Instalando PaperMC {latest_version}")
             
             # Obtener builds disponibles
-            builds_response = requests.get(f"https://api.papermc.io/v2/projects/paper/versions/{latest_version}")
-            builds_response.raise_for_status()
-            builds_data = builds_response.json()
+            builds_data = self.manifests.get_json(f"https://api.papermc.io/v2/projects/paper/versions/{latest_version}")
             
             # Obtener el último build
             latest_build = builds_data['builds'][-1]
             
+            # Datos del build: nombre del archivo y SHA-256 publicado
+            build_data = self.manifests.get_json(
+                f"https://api.papermc.io/v2/projects/paper/versions/{latest_version}/builds/{latest_build}",
+                immutable=True
+            )
+            application = build_data['downloads']['application']
+            
             # Descargar el JAR
-            download_url = f"https://api.papermc.io/v2/projects/paper/versions/{latest_version}/builds/{latest_build}/downloads/paper-{latest_version}-{latest_build}.jar"
+            download_url = f"https://api.papermc.io/v2/projects/paper/versions/{latest_version}/builds/{latest_build}/downloads/{application['name']}"
             
-            return self.download_server_jar(download_url)
+            return self.download_server_jar(download_url, sha256=application.get('sha256'))
             
         except Exception as e:
             console.print(f"❌ Error instalando PaperMC: {e}", style="red")
@@ -12,13 +12,32 @@ import json
 import subprocess
 import threading
 import time
+import re
 import socket
 import zipfile
 import shutil
 import hashlib
+import tempfile
+import gzip
+import mmap
+import struct
+import zlib
+import math
+import sqlite3
+import queue
+import asyncio
+import uuid
+import bisect
+import ipaddress
 import schedule
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from array import array
+from collections import deque
+from concurrent.futures import Future, ThreadPoolExecutor, ProcessPoolExecutor
+from concurrent.futures import TimeoutError as FuturesTimeoutError
 from datetime import datetime, timedelta
-from pathlib import Path
+from pathlib import Path, PurePosixPath
+from types import MappingProxyType
 from typing import Optional, Dict, List, Any
 import psutil
 import requests
@@ -39,6 +58,3304 @@ from rich.tree import Tree
 
 console = Console()
 
+# Políticas de compresión de backups por extensión: extensión -> (método ZIP, nivel).
+# Los .dat son NBT ya comprimido en gzip y los chunks de los .mca ya van comprimidos por
+# el servidor (region-file-compression), así que recomprimirlos a nivel 6 gasta CPU casi
+# sin ganancia. Los .mca sí conservan relleno de ceros de sus sectores de 4 KiB, que
+# deflate a nivel 1 elimina de forma barata; "stored" los guarda tal cual.
+BACKUP_COMPRESSION_POLICIES = {
+    "deflate": {
+        "*": (zipfile.ZIP_DEFLATED, 6)
+    },
+    "fast": {
+        ".mca": (zipfile.ZIP_DEFLATED, 1),
+        ".mcc": (zipfile.ZIP_STORED, 0),
+        ".dat": (zipfile.ZIP_STORED, 0),
+        ".dat_old": (zipfile.ZIP_STORED, 0),
+        ".gz": (zipfile.ZIP_STORED, 0),
+        "*": (zipfile.ZIP_DEFLATED, 1)
+    },
+    "stored": {
+        ".mca": (zipfile.ZIP_STORED, 0),
+        ".mcc": (zipfile.ZIP_STORED, 0),
+        ".dat": (zipfile.ZIP_STORED, 0),
+        ".dat_old": (zipfile.ZIP_STORED, 0),
+        ".gz": (zipfile.ZIP_STORED, 0),
+        "*": (zipfile.ZIP_DEFLATED, 6)
+    }
+}
+DEFAULT_BACKUP_POLICY = "fast"
+
+def compression_for(path, policy=DEFAULT_BACKUP_POLICY):
+    """Método y nivel de compresión que corresponden a un archivo según la política"""
+    table = BACKUP_COMPRESSION_POLICIES[policy]
+    return table.get(Path(path).suffix.lower(), table["*"])
+
+class IncrementalBackupStore:
+    """Almacén de backups incrementales direccionado por contenido (deduplicado)"""
+
+    # Los .mca se trocean en bloques alineados a sectores de 4 KiB para que un chunk
+    # modificado solo invalide su bloque y no el archivo de región completo
+    REGION_BLOCK_SIZE = 64 * 1024
+    FILE_BLOCK_SIZE = 4 * 1024 * 1024
+    MANIFEST_VERSION = 1
+
+    def __init__(self, backups_dir, policy=DEFAULT_BACKUP_POLICY):
+        self.policy = policy
+        self.root = Path(backups_dir) / "store"
+        self.objects_dir = self.root / "objects"
+        self.manifests_dir = self.root / "manifests"
+        # snapshot y gc no pueden solaparse: un bloque que snapshot da por existente
+        # (y no reescribe) no debe borrarse antes de que su manifiesto esté en disco
+        self._lock = threading.RLock()
+
+    def ensure_dirs(self):
+        """Crear la estructura del almacén"""
+        self.objects_dir.mkdir(parents=True, exist_ok=True)
+        self.manifests_dir.mkdir(parents=True, exist_ok=True)
+
+    def _object_path(self, digest):
+        return self.objects_dir / digest[:2] / digest[2:]
+
+    def _block_size_for(self, path):
+        return self.REGION_BLOCK_SIZE if path.suffix == ".mca" else self.FILE_BLOCK_SIZE
+
+    def put_object(self, data, level=6):
+        """Guardar un bloque si no existe. Devuelve (hash, bytes escritos en disco)"""
+        digest = hashlib.sha256(data).hexdigest()
+        object_path = self._object_path(digest)
+        if object_path.exists():
+            return digest, 0
+
+        object_path.parent.mkdir(exist_ok=True)
+        payload = zlib.compress(data, level)
+        tmp_path = object_path.with_name(object_path.name + ".tmp")
+        with open(tmp_path, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp_path, object_path)
+        return digest, len(payload)
+
+    def get_object(self, digest):
+        """Leer y descomprimir un bloque del almacén"""
+        with open(self._object_path(digest), 'rb') as f:
+            return zlib.decompress(f.read())
+
+    def list_manifests(self):
+        """Manifiestos ordenados del más antiguo al más reciente"""
+        if not self.manifests_dir.exists():
+            return []
+        return sorted(self.manifests_dir.glob("*.json"))
+
+    def load_manifest(self, manifest_path):
+        with open(manifest_path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+
+    def latest_manifest(self):
+        manifests = self.list_manifests()
+        return self.load_manifest(manifests[-1]) if manifests else None
+
+    def snapshot(self, source_dir, name, auto=False, unchanged=None):
+        """Crear un snapshot guardando solo los bloques nuevos. Devuelve el manifiesto.
+
+        unchanged: entradas de manifiesto ya verificadas (p. ej. durante save-off) que se
+        incluyen sin leer el archivo; source_dir solo necesita contener el resto.
+        """
+        with self._lock:
+            return self._snapshot(source_dir, name, auto, unchanged)
+
+    def _snapshot(self, source_dir, name, auto, unchanged):
+        self.ensure_dirs()
+        source_dir = Path(source_dir)
+        previous = self.latest_manifest()
+        previous_files = previous["files"] if previous else {}
+
+        files = dict(unchanged or {})
+        total_bytes = sum(entry["size"] for entry in files.values())
+        new_bytes = 0
+        stored_bytes = 0
+
+        for root, dirs, filenames in os.walk(source_dir):
+            dirs.sort()
+            for filename in sorted(filenames):
+                file_path = Path(root) / filename
+                arcname = file_path.relative_to(source_dir.parent).as_posix()
+                stat = file_path.stat()
+                total_bytes += stat.st_size
+
+                # Archivo sin cambios desde el último snapshot: reutilizar sus bloques
+                prev = previous_files.get(arcname)
+                if prev and prev["size"] == stat.st_size and prev["mtime_ns"] == stat.st_mtime_ns:
+                    files[arcname] = prev
+                    continue
+
+                blocks = []
+                block_size = self._block_size_for(file_path)
+                # ZIP_STORED -> nivel 0: zlib solo empaqueta el bloque sin comprimir
+                level = compression_for(file_path, self.policy)[1]
+                with open(file_path, 'rb') as f:
+                    while True:
+                        data = f.read(block_size)
+                        if not data:
+                            break
+                        digest, written = self.put_object(data, level)
+                        if written:
+                            new_bytes += len(data)
+                            stored_bytes += written
+                        blocks.append(digest)
+
+                files[arcname] = {
+                    "size": stat.st_size,
+                    "mtime_ns": stat.st_mtime_ns,
+                    "blocks": blocks
+                }
+
+        manifest = {
+            "version": self.MANIFEST_VERSION,
+            "name": name,
+            "created": datetime.now().isoformat(),
+            "auto": auto,
+            "total_bytes": total_bytes,
+            "new_bytes": new_bytes,
+            "stored_bytes": stored_bytes,
+            "files": files
+        }
+
+        manifest_path = self.manifests_dir / f"{name}.json"
+        tmp_path = manifest_path.with_suffix(".tmp")
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, separators=(",", ":"))
+        os.replace(tmp_path, manifest_path)
+        return manifest
+
+    def restore(self, manifest_path, target_dir, workers=None):
+        """Reconstruir un snapshot dentro de target_dir en paralelo (un archivo por tarea)"""
+        manifest = self.load_manifest(manifest_path)
+        target_dir = Path(target_dir)
+
+        def restore_file(item):
+            arcname, entry = item
+            # Las rutas del manifiesto incluyen la carpeta del mundo ("world/...")
+            file_path = target_dir.joinpath(*PurePosixPath(arcname).parts[1:])
+            file_path.parent.mkdir(parents=True, exist_ok=True)
+            with open(file_path, 'wb') as f:
+                for digest in entry["blocks"]:
+                    f.write(self.get_object(digest))
+            os.utime(file_path, ns=(entry["mtime_ns"], entry["mtime_ns"]))
+            return entry["size"]
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+            restored = sum(pool.map(restore_file, manifest["files"].items()))
+
+        return restored
+
+    def delete(self, manifest_path):
+        """Eliminar un manifiesto (los bloques se liberan en gc)"""
+        Path(manifest_path).unlink()
+
+    def gc(self):
+        """Eliminar bloques que ya no referencia ningún manifiesto. Devuelve (objetos, bytes)"""
+        with self._lock:
+            return self._gc()
+
+    def _gc(self):
+        if not self.objects_dir.exists():
+            return 0, 0
+
+        referenced = set()
+        for manifest_path in self.list_manifests():
+            for entry in self.load_manifest(manifest_path)["files"].values():
+                referenced.update(entry["blocks"])
+
+        removed = 0
+        freed = 0
+        for bucket in self.objects_dir.iterdir():
+            if not bucket.is_dir():
+                continue
+            for object_path in bucket.iterdir():
+                if bucket.name + object_path.name not in referenced:
+                    freed += object_path.stat().st_size
+                    object_path.unlink()
+                    removed += 1
+
+        return removed, freed
+
+    def disk_usage(self):
+        """Bytes ocupados por los bloques del almacén"""
+        total = 0
+        if self.objects_dir.exists():
+            for bucket in os.scandir(self.objects_dir):
+                if bucket.is_dir():
+                    for entry in os.scandir(bucket.path):
+                        total += entry.stat().st_size
+        return total
+
+# Cada miembro se comprime en un archivo temporal que vive en memoria hasta este tamaño
+ZIP_SPOOL_MAX = 8 * 1024 * 1024
+# Bytes de entrada en vuelo como máximo entre el pool y el hilo escritor
+ZIP_MAX_INFLIGHT_BYTES = 256 * 1024 * 1024
+
+def _compress_member(file_path, arcname, method, level):
+    """Comprimir un archivo por bloques a un temporal (se ejecuta en el pool; zlib libera el GIL)"""
+    # Fechas anteriores a 1980 (no representables en ZIP) se ajustan a 1980-01-01
+    zinfo = zipfile.ZipInfo.from_file(file_path, arcname, strict_timestamps=False)
+    zinfo.compress_type = method
+    compressor = zlib.compressobj(level, zlib.DEFLATED, -15) if method == zipfile.ZIP_DEFLATED else None
+    spool = tempfile.SpooledTemporaryFile(max_size=ZIP_SPOOL_MAX)
+    crc = 0
+    size = 0
+    try:
+        with open(file_path, 'rb') as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                crc = zlib.crc32(block, crc)
+                size += len(block)
+                spool.write(compressor.compress(block) if compressor else block)
+        if compressor:
+            spool.write(compressor.flush())
+    except BaseException:
+        spool.close()
+        raise
+    zinfo.file_size = size
+    zinfo.compress_size = spool.tell()
+    zinfo.CRC = crc
+    spool.seek(0)
+    return zinfo, spool
+
+class _ZipStreamWriter:
+    """Escritor ZIP secuencial para miembros ya comprimidos.
+
+    zipfile solo sabe comprimir en el propio hilo que escribe, así que las
+    cabeceras locales, el directorio central y los registros ZIP64 se escriben
+    aquí siguiendo el formato (APPNOTE), sin tocar atributos internos de ZipFile.
+    """
+
+    # Límites a partir de los que hacen falta registros ZIP64
+    ZIP64_LIMIT = zipfile.ZIP64_LIMIT
+    FILECOUNT_LIMIT = zipfile.ZIP_FILECOUNT_LIMIT
+
+    def __init__(self, path):
+        self.fp = open(path, 'wb')
+        self.members = []
+
+    @staticmethod
+    def _dos_time(zinfo):
+        year, month, day, hour, minute, second = zinfo.date_time
+        return hour << 11 | minute << 5 | second // 2, (year - 1980) << 9 | month << 5 | day
+
+    @staticmethod
+    def _encoded_name(zinfo):
+        try:
+            return zinfo.filename.encode('ascii'), zinfo.flag_bits
+        except UnicodeEncodeError:
+            return zinfo.filename.encode('utf-8'), zinfo.flag_bits | 0x800
+
+    def add(self, zinfo, payload):
+        """Escribir cabecera local y datos comprimidos (payload: archivo abierto en la posición 0)"""
+        zinfo.header_offset = self.fp.tell()
+        name, flag_bits = self._encoded_name(zinfo)
+        dostime, dosdate = self._dos_time(zinfo)
+        file_size, compress_size = zinfo.file_size, zinfo.compress_size
+        extra = b""
+        version = 20
+        if file_size > self.ZIP64_LIMIT or compress_size > self.ZIP64_LIMIT:
+            extra = struct.pack('<HHQQ', 1, 16, file_size, compress_size)
+            file_size = compress_size = 0xFFFFFFFF
+            version = zipfile.ZIP64_VERSION
+        zinfo.extract_version = max(version, zinfo.extract_version)
+        self.fp.write(struct.pack(
+            '<4s2B4HL2L2H', b"PK\003\004", zinfo.extract_version, 0, flag_bits, zinfo.compress_type,
+            dostime, dosdate, zinfo.CRC, compress_size, file_size, len(name), len(extra)
+        ))
+        self.fp.write(name)
+        self.fp.write(extra)
+        shutil.copyfileobj(payload, self.fp, 1024 * 1024)
+        self.members.append(zinfo)
+
+    def close(self):
+        """Escribir el directorio central y el registro final (ZIP64 si hace falta)"""
+        start = self.fp.tell()
+        for zinfo in self.members:
+            name, flag_bits = self._encoded_name(zinfo)
+            dostime, dosdate = self._dos_time(zinfo)
+            file_size, compress_size, offset = zinfo.file_size, zinfo.compress_size, zinfo.header_offset
+            values = []
+            if file_size > self.ZIP64_LIMIT or compress_size > self.ZIP64_LIMIT:
+                values += [file_size, compress_size]
+                file_size = compress_size = 0xFFFFFFFF
+            if offset > self.ZIP64_LIMIT:
+                values.append(offset)
+                offset = 0xFFFFFFFF
+            extra = struct.pack(f'<HH{len(values)}Q', 1, 8 * len(values), *values) if values else b""
+            version = max(zipfile.ZIP64_VERSION if values else 20, zinfo.extract_version)
+            self.fp.write(struct.pack(
+                '<4s4B4HL2L5H2L', b"PK\001\002", version, zinfo.create_system, version, 0,
+                flag_bits, zinfo.compress_type, dostime, dosdate, zinfo.CRC, compress_size, file_size,
+                len(name), len(extra), 0, 0, zinfo.internal_attr, zinfo.external_attr, offset
+            ))
+            self.fp.write(name)
+            self.fp.write(extra)
+        end = self.fp.tell()
+
+        count, size, offset = len(self.members), end - start, start
+        if count > self.FILECOUNT_LIMIT or size > self.ZIP64_LIMIT or offset > self.ZIP64_LIMIT:
+            self.fp.write(struct.pack(
+                '<4sQ2H2L4Q', b"PK\006\006", 44, zipfile.ZIP64_VERSION, zipfile.ZIP64_VERSION,
+                0, 0, count, count, size, offset
+            ))
+            self.fp.write(struct.pack('<4sLQL', b"PK\006\007", 0, end, 1))
+            count = min(count, 0xFFFF)
+            size = min(size, 0xFFFFFFFF)
+            offset = min(offset, 0xFFFFFFFF)
+        self.fp.write(struct.pack('<4s4H2LH', b"PK\005\006", 0, 0, count, count, size, offset, 0))
+        self.fp.close()
+
+    def abort(self):
+        self.fp.close()
+
+def write_zip_parallel(source_dir, archive_path, workers=None, policy=DEFAULT_BACKUP_POLICY):
+    """Comprimir un directorio en un ZIP usando varios núcleos.
+
+    Los archivos se comprimen en un pool de hilos según la política por extensión (a
+    temporales que solo pasan a disco por encima de ZIP_SPOOL_MAX) y se escriben en el
+    ZIP en orden desde un único hilo. Devuelve estadísticas
+    (archivos, bytes, segundos, MB/s).
+    """
+    source_dir = Path(source_dir)
+    workers = workers or os.cpu_count() or 4
+    start = time.perf_counter()
+    files = 0
+    bytes_in = 0
+
+    members = []
+    for root, dirs, filenames in os.walk(source_dir):
+        dirs.sort()
+        for filename in sorted(filenames):
+            file_path = Path(root) / filename
+            members.append((file_path, file_path.relative_to(source_dir.parent).as_posix()))
+
+    writer = _ZipStreamWriter(archive_path)
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            # Ventana acotada por bytes de entrada en vuelo para limitar memoria y disco temporal
+            pending = deque()
+            inflight = 0
+
+            def drain(limit):
+                nonlocal files, bytes_in, inflight
+                while pending and (inflight > limit or len(pending) > workers * 4):
+                    future, weight = pending.popleft()
+                    zinfo, payload = future.result()
+                    with payload:
+                        writer.add(zinfo, payload)
+                    inflight -= weight
+                    files += 1
+                    bytes_in += zinfo.file_size
+
+            for file_path, arcname in members:
+                method, level = compression_for(file_path, policy)
+                weight = file_path.stat().st_size
+                # Un archivo mayor que la ventana entra solo
+                drain(max(0, ZIP_MAX_INFLIGHT_BYTES - weight))
+                pending.append((pool.submit(_compress_member, file_path, arcname, method, level), weight))
+                inflight += weight
+            drain(-1)
+        writer.close()
+    except BaseException:
+        writer.abort()
+        raise
+
+    seconds = time.perf_counter() - start
+    return {
+        "files": files,
+        "bytes_in": bytes_in,
+        "bytes_out": Path(archive_path).stat().st_size,
+        "seconds": seconds,
+        "mb_per_s": (bytes_in / (1024 * 1024)) / seconds if seconds > 0 else 0.0
+    }
+
+def extract_zip_parallel(archive_path, target_dir, workers=None):
+    """Descomprimir un backup ZIP dentro de target_dir usando varios hilos.
+
+    Se quita la carpeta raíz de cada miembro ("world/...") para poder extraer en una
+    carpeta temporal. Devuelve los bytes escritos.
+    """
+    target_dir = Path(target_dir).resolve()
+
+    with zipfile.ZipFile(archive_path, 'r') as zipf:
+        def extract_member(info):
+            parts = PurePosixPath(info.filename).parts[1:]
+            if not parts or ".." in parts:
+                return 0
+            dest = target_dir.joinpath(*parts)
+            if info.is_dir():
+                dest.mkdir(parents=True, exist_ok=True)
+                return 0
+            dest.parent.mkdir(parents=True, exist_ok=True)
+            # ZipFile admite lecturas concurrentes; la descompresión ocurre fuera del lock
+            with zipf.open(info) as src, open(dest, 'wb') as dst:
+                shutil.copyfileobj(src, dst, 1024 * 1024)
+            mtime = time.mktime(info.date_time + (0, 0, -1))
+            os.utime(dest, (mtime, mtime))
+            return info.file_size
+
+        with ThreadPoolExecutor(max_workers=workers or os.cpu_count() or 4) as pool:
+            return sum(pool.map(extract_member, zipf.infolist()))
+
+def benchmark_backup_policies(world_dir, workers=None):
+    """Comparar tiempo y tamaño de cada política de compresión sobre un mundo"""
+    results = []
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for policy in BACKUP_COMPRESSION_POLICIES:
+            archive_path = Path(tmp_dir) / f"bench_{policy}.zip"
+            stats = write_zip_parallel(world_dir, archive_path, workers=workers, policy=policy)
+            results.append(dict(stats, policy=policy))
+            archive_path.unlink()
+    return results
+
+def print_backup_benchmark(results):
+    """Mostrar los resultados del benchmark de compresión"""
+    table = Table(show_header=True, header_style="bold magenta")
+    table.add_column("Política", style="cyan")
+    table.add_column("Tiempo", style="yellow")
+    table.add_column("Tamaño", style="green")
+    table.add_column("Ratio", style="white")
+    table.add_column("Velocidad", style="blue")
+
+    for result in results:
+        ratio = result["bytes_out"] / result["bytes_in"] if result["bytes_in"] else 0.0
+        table.add_row(
+            result["policy"],
+            f"{result['seconds'] * 1000:.0f} ms",
+            f"{result['bytes_out'] / (1024 * 1024):.2f} MB",
+            f"{ratio:.1%}",
+            f"{result['mb_per_s']:.1f} MB/s"
+        )
+
+    console.print(table)
+
+def _lz4_block_decompress(src, uncompressed_size):
+    """Descompresor LZ4 de bloque en Python puro (respaldo si no está el paquete lz4)"""
+    out = bytearray()
+    i = 0
+    n = len(src)
+    while i < n:
+        token = src[i]
+        i += 1
+        literal_len = token >> 4
+        if literal_len == 15:
+            while True:
+                extra = src[i]
+                i += 1
+                literal_len += extra
+                if extra != 255:
+                    break
+        out += src[i:i + literal_len]
+        i += literal_len
+        if i >= n:
+            break
+        offset = src[i] | (src[i + 1] << 8)
+        i += 2
+        match_len = token & 0x0F
+        if match_len == 15:
+            while True:
+                extra = src[i]
+                i += 1
+                match_len += extra
+                if extra != 255:
+                    break
+        match_len += 4
+        start = len(out) - offset
+        if offset >= match_len:
+            out += out[start:start + match_len]
+        else:
+            for k in range(match_len):
+                out.append(out[start + k])
+    if len(out) != uncompressed_size:
+        raise ValueError("Bloque LZ4 corrupto")
+    return bytes(out)
+
+def decode_lz4_block_stream(data):
+    """Decodificar el formato LZ4BlockOutputStream de lz4-java que usa el servidor"""
+    try:
+        import lz4.block as lz4_block
+        decompress = lambda block, size: lz4_block.decompress(block, uncompressed_size=size)
+    except ImportError:
+        decompress = _lz4_block_decompress
+
+    out = bytearray()
+    pos = 0
+    while pos + 21 <= len(data):
+        if data[pos:pos + 8] != b"LZ4Block":
+            raise ValueError("Cabecera LZ4Block inválida")
+        token = data[pos + 8]
+        compressed_len, decompressed_len, _checksum = struct.unpack_from("<iii", data, pos + 9)
+        pos += 21
+        if decompressed_len == 0:
+            break
+        block = bytes(data[pos:pos + compressed_len])
+        pos += compressed_len
+        if token & 0xF0 == 0x10:
+            out += block
+        else:
+            out += decompress(block, decompressed_len)
+    return bytes(out)
+
+class RegionFile:
+    """Lector de archivos de región Anvil (.mca) sobre mmap.
+
+    La cabecera de 8 KiB (ubicaciones y marcas de tiempo) se decodifica en dos arrays de
+    1024 enteros; los chunks solo se descomprimen cuando se piden.
+    """
+
+    SECTOR_SIZE = 4096
+    COMPRESSION_GZIP = 1
+    COMPRESSION_ZLIB = 2
+    COMPRESSION_NONE = 3
+    COMPRESSION_LZ4 = 4
+    COMPRESSION_CUSTOM = 127
+    EXTERNAL_FLAG = 0x80
+
+    NAME_PATTERN = re.compile(r"^r\.(-?\d+)\.(-?\d+)\.mca$")
+
+    def __init__(self, path):
+        self.path = Path(path)
+        match = self.NAME_PATTERN.match(self.path.name)
+        self.region_x, self.region_z = (int(match.group(1)), int(match.group(2))) if match else (0, 0)
+
+        self._file = open(self.path, 'rb')
+        self.file_size = os.fstat(self._file.fileno()).st_size
+        self._map = None
+        self.locations = array('I', bytes(4096))
+        self.timestamps = array('I', bytes(4096))
+
+        # Un archivo vacío o truncado no tiene chunks (no se puede mapear en Windows)
+        if self.file_size >= 2 * self.SECTOR_SIZE:
+            self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self.locations = array('I', self._map[0:4096])
+            self.timestamps = array('I', self._map[4096:8192])
+            if sys.byteorder == "little":
+                self.locations.byteswap()
+                self.timestamps.byteswap()
+
+    def close(self):
+        if self._map is not None:
+            try:
+                self._map.close()
+            except BufferError:
+                pass  # Aún hay vistas de read_raw vivas; el mapa se libera con ellas
+            self._map = None
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    @staticmethod
+    def index(x, z):
+        """Índice en la cabecera de un chunk (coordenadas locales o absolutas)"""
+        return (x & 31) + (z & 31) * 32
+
+    def location(self, x, z):
+        """(primer sector, número de sectores) de un chunk; (0, 0) si no existe"""
+        loc = self.locations[self.index(x, z)]
+        return loc >> 8, loc & 0xFF
+
+    def timestamp(self, x, z):
+        """Última modificación del chunk (segundos Unix)"""
+        return self.timestamps[self.index(x, z)]
+
+    def has_chunk(self, x, z):
+        return self.locations[self.index(x, z)] != 0
+
+    def chunks(self):
+        """Iterar (x, z, sector, sectores, timestamp) de los chunks presentes (x, z locales)"""
+        for i, loc in enumerate(self.locations):
+            if loc:
+                yield i & 31, i >> 5, loc >> 8, loc & 0xFF, self.timestamps[i]
+
+    def chunk_count(self):
+        return sum(1 for loc in self.locations if loc)
+
+    def used_sectors(self):
+        """Sectores ocupados por chunks más los dos de cabecera"""
+        if self._map is None:
+            return 0
+        return 2 + sum(loc & 0xFF for loc in self.locations if loc)
+
+    def total_sectors(self):
+        return (self.file_size + self.SECTOR_SIZE - 1) // self.SECTOR_SIZE
+
+    def fragmentation(self):
+        """Fracción de sectores del archivo que no pertenecen a ningún chunk"""
+        total = self.total_sectors()
+        return 1 - self.used_sectors() / total if total else 0.0
+
+    def read_raw(self, x, z):
+        """(tipo de compresión, payload) de un chunk sin descomprimir, o None.
+
+        El payload es un memoryview sobre el mmap (sin copia) salvo en chunks externos.
+        """
+        sector, count = self.location(x, z)
+        if not sector or self._map is None:
+            return None
+        start = sector * self.SECTOR_SIZE
+        if start + 5 > self.file_size:
+            raise ValueError(f"Chunk ({x}, {z}) fuera del archivo {self.path.name}")
+        length, compression = struct.unpack_from(">IB", self._map, start)
+        if compression & self.EXTERNAL_FLAG:
+            chunk_x = self.region_x * 32 + (x & 31)
+            chunk_z = self.region_z * 32 + (z & 31)
+            external = self.path.with_name(f"c.{chunk_x}.{chunk_z}.mcc")
+            return compression & ~self.EXTERNAL_FLAG, memoryview(external.read_bytes())
+        return compression, memoryview(self._map)[start + 5:start + 4 + length]
+
+    def read_record(self, x, z):
+        """Registro completo del chunk tal como está en disco (longitud, compresión y datos)"""
+        sector, count = self.location(x, z)
+        if not sector or self._map is None:
+            return None
+        start = sector * self.SECTOR_SIZE
+        length = struct.unpack_from(">I", self._map, start)[0]
+        if length == 0 or start + 4 + length > self.file_size:
+            raise ValueError(f"Chunk ({x}, {z}) corrupto en {self.path.name}")
+        return memoryview(self._map)[start:start + 4 + length]
+
+    def read_chunk(self, x, z):
+        """Datos NBT descomprimidos de un chunk, o None si no existe"""
+        raw = self.read_raw(x, z)
+        if raw is None:
+            return None
+        compression, payload = raw
+        if compression == self.COMPRESSION_ZLIB:
+            return zlib.decompress(payload)
+        if compression == self.COMPRESSION_GZIP:
+            return gzip.decompress(payload)
+        if compression == self.COMPRESSION_NONE:
+            return bytes(payload)
+        if compression == self.COMPRESSION_LZ4:
+            return decode_lz4_block_stream(payload)
+        raise ValueError(f"Compresión de chunk no soportada: {compression}")
+
+    def read_chunk_nbt(self, x, z):
+        """NBT perezoso de un chunk, o None si no existe"""
+        data = self.read_chunk(x, z)
+        return parse_nbt(data) if data is not None else None
+
+# Tipos de etiqueta NBT
+TAG_END = 0
+TAG_BYTE = 1
+TAG_SHORT = 2
+TAG_INT = 3
+TAG_LONG = 4
+TAG_FLOAT = 5
+TAG_DOUBLE = 6
+TAG_BYTE_ARRAY = 7
+TAG_STRING = 8
+TAG_LIST = 9
+TAG_COMPOUND = 10
+TAG_INT_ARRAY = 11
+TAG_LONG_ARRAY = 12
+
+# Formato struct y tamaño de las etiquetas de tamaño fijo
+NBT_FIXED = {
+    TAG_BYTE: (">b", 1),
+    TAG_SHORT: (">h", 2),
+    TAG_INT: (">i", 4),
+    TAG_LONG: (">q", 8),
+    TAG_FLOAT: (">f", 4),
+    TAG_DOUBLE: (">d", 8)
+}
+# Arrays numéricos: (código de array, tamaño del elemento)
+NBT_ARRAYS = {
+    TAG_BYTE_ARRAY: ("b", 1),
+    TAG_INT_ARRAY: ("i", 4),
+    TAG_LONG_ARRAY: ("q", 8)
+}
+
+def _nbt_skip(buf, tag, pos):
+    """Posición tras el valor de una etiqueta, usando los prefijos de longitud sin decodificar"""
+    fixed = NBT_FIXED.get(tag)
+    if fixed:
+        return pos + fixed[1]
+    if tag == TAG_STRING:
+        return pos + 2 + struct.unpack_from(">H", buf, pos)[0]
+    if tag in NBT_ARRAYS:
+        return pos + 4 + struct.unpack_from(">i", buf, pos)[0] * NBT_ARRAYS[tag][1]
+    if tag == TAG_LIST:
+        item_tag, count = struct.unpack_from(">bi", buf, pos)
+        pos += 5
+        if count <= 0:
+            return pos
+        if item_tag in NBT_FIXED:
+            return pos + count * NBT_FIXED[item_tag][1]
+        for _ in range(count):
+            pos = _nbt_skip(buf, item_tag, pos)
+        return pos
+    if tag == TAG_COMPOUND:
+        while True:
+            child_tag = buf[pos]
+            pos += 1
+            if child_tag == TAG_END:
+                return pos
+            pos += 2 + struct.unpack_from(">H", buf, pos)[0]
+            pos = _nbt_skip(buf, child_tag, pos)
+    raise ValueError(f"Etiqueta NBT desconocida: {tag}")
+
+def _nbt_string(buf, pos):
+    length = struct.unpack_from(">H", buf, pos)[0]
+    raw = bytes(buf[pos + 2:pos + 2 + length])
+    try:
+        return raw.decode("utf-8")
+    except UnicodeDecodeError:
+        # UTF-8 modificado de Java (nulos como C0 80, pares sustitutos)
+        return raw.decode("utf-8", errors="replace")
+
+def _nbt_value(buf, tag, pos):
+    """Decodificar un valor. Compuestos y listas se devuelven como vistas perezosas"""
+    fixed = NBT_FIXED.get(tag)
+    if fixed:
+        return struct.unpack_from(fixed[0], buf, pos)[0]
+    if tag == TAG_STRING:
+        return _nbt_string(buf, pos)
+    if tag == TAG_COMPOUND:
+        return NBTCompound(buf, pos)
+    if tag == TAG_LIST:
+        return NBTList(buf, pos)
+    if tag in NBT_ARRAYS:
+        typecode, size = NBT_ARRAYS[tag]
+        count = struct.unpack_from(">i", buf, pos)[0]
+        start = pos + 4
+        view = buf[start:start + count * size]
+        if tag == TAG_BYTE_ARRAY:
+            return view.cast("b")
+        # NBT es big-endian: copia en un array nativo (una sola pasada en C)
+        values = array(typecode)
+        values.frombytes(view)
+        if sys.byteorder == "little":
+            values.byteswap()
+        return values
+    raise ValueError(f"Etiqueta NBT desconocida: {tag}")
+
+class NBTCompound:
+    """Compuesto NBT perezoso sobre un memoryview.
+
+    La primera consulta recorre las claves del compuesto saltando los valores por sus
+    prefijos de longitud; solo se decodifican los valores que se piden.
+    """
+
+    __slots__ = ("_buf", "_start", "_index", "name")
+
+    def __init__(self, buf, start, name=""):
+        self._buf = buf
+        self._start = start
+        self._index = None
+        self.name = name
+
+    def _entries(self):
+        if self._index is None:
+            index = {}
+            buf = self._buf
+            pos = self._start
+            while True:
+                tag = buf[pos]
+                pos += 1
+                if tag == TAG_END:
+                    break
+                key = _nbt_string(buf, pos)
+                pos += 2 + struct.unpack_from(">H", buf, pos)[0]
+                index[key] = (tag, pos)
+                pos = _nbt_skip(buf, tag, pos)
+            self._index = index
+        return self._index
+
+    def __getitem__(self, key):
+        tag, pos = self._entries()[key]
+        return _nbt_value(self._buf, tag, pos)
+
+    def get(self, key, default=None):
+        entry = self._entries().get(key)
+        return default if entry is None else _nbt_value(self._buf, entry[0], entry[1])
+
+    def find(self, *path, default=None):
+        """Acceder a un valor anidado: find("Data", "Version", "Name")"""
+        node = self
+        for key in path:
+            if isinstance(node, NBTList) and isinstance(key, int):
+                if not 0 <= key < len(node):
+                    return default
+                node = node[key]
+            elif isinstance(node, NBTCompound) and key in node:
+                node = node[key]
+            else:
+                return default
+        return node
+
+    def tag_of(self, key):
+        return self._entries()[key][0]
+
+    def __contains__(self, key):
+        return key in self._entries()
+
+    def __iter__(self):
+        return iter(self._entries())
+
+    def __len__(self):
+        return len(self._entries())
+
+    def keys(self):
+        return self._entries().keys()
+
+    def items(self):
+        for key in self._entries():
+            yield key, self[key]
+
+    def to_python(self):
+        """Decodificar el compuesto completo a tipos de Python"""
+        return {key: _nbt_to_python(value) for key, value in self.items()}
+
+    def __repr__(self):
+        return f"NBTCompound({list(self._entries())})"
+
+class NBTList:
+    """Lista NBT perezosa: los elementos de tamaño variable se indexan al primer acceso"""
+
+    __slots__ = ("_buf", "_start", "item_tag", "_count", "_offsets")
+
+    def __init__(self, buf, pos):
+        self._buf = buf
+        self.item_tag, count = struct.unpack_from(">bi", buf, pos)
+        self._count = max(count, 0)
+        self._start = pos + 5
+        self._offsets = None
+
+    def __len__(self):
+        return self._count
+
+    def _offset(self, i):
+        fixed = NBT_FIXED.get(self.item_tag)
+        if fixed:
+            return self._start + i * fixed[1]
+        if self._offsets is None:
+            offsets = []
+            pos = self._start
+            for _ in range(self._count):
+                offsets.append(pos)
+                pos = _nbt_skip(self._buf, self.item_tag, pos)
+            self._offsets = offsets
+        return self._offsets[i]
+
+    def __getitem__(self, i):
+        if i < 0:
+            i += self._count
+        if not 0 <= i < self._count:
+            raise IndexError(i)
+        return _nbt_value(self._buf, self.item_tag, self._offset(i))
+
+    def __iter__(self):
+        for i in range(self._count):
+            yield self[i]
+
+    def to_python(self):
+        return [_nbt_to_python(value) for value in self]
+
+    def __repr__(self):
+        return f"NBTList(tag={self.item_tag}, len={self._count})"
+
+def _nbt_to_python(value):
+    if isinstance(value, (NBTCompound, NBTList)):
+        return value.to_python()
+    if isinstance(value, memoryview):
+        return value.tolist()
+    if isinstance(value, array):
+        return value.tolist()
+    return value
+
+def parse_nbt(data):
+    """Abrir un documento NBT sin comprimir. Devuelve el compuesto raíz (perezoso)"""
+    buf = memoryview(data)
+    if not buf or buf[0] != TAG_COMPOUND:
+        raise ValueError("El documento NBT no empieza con un compuesto")
+    name = _nbt_string(buf, 1)
+    return NBTCompound(buf, 3 + struct.unpack_from(">H", buf, 1)[0], name)
+
+def load_nbt_file(path):
+    """Leer un archivo .dat (gzip, zlib o sin comprimir) como NBT perezoso"""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if data[:2] == b"\x1f\x8b":
+        data = gzip.decompress(data)
+    elif data[:1] == b"\x78":
+        data = zlib.decompress(data)
+    return parse_nbt(data)
+
+def morton_index(x, z):
+    """Orden Z (Morton) de un chunk dentro de su región: entrelaza los bits de x y z"""
+    key = 0
+    for bit in range(5):
+        key |= ((x >> bit) & 1) << (2 * bit) | ((z >> bit) & 1) << (2 * bit + 1)
+    return key
+
+def compact_region_file(path, drop=(), dry_run=False):
+    """Reescribir un .mca con los chunks contiguos en orden Z, sin sectores libres.
+
+    drop: índices de cabecera (x + z * 32) de los chunks a eliminar. Con dry_run solo se
+    calcula el tamaño resultante (new_fragmentation es None). Si no queda ningún chunk
+    se elimina el archivo. Devuelve un dict con tamaños y recuentos.
+    """
+    path = Path(path)
+    drop = set(drop)
+    sector_size = RegionFile.SECTOR_SIZE
+
+    with RegionFile(path) as region:
+        old_size = region.file_size
+        old_fragmentation = region.fragmentation()
+        kept = []
+        disk_order = []
+        dropped = 0
+        external_dropped = []
+        for x, z, sector, count, timestamp in region.chunks():
+            index = RegionFile.index(x, z)
+            if index in drop:
+                dropped += 1
+                compression = region._map[sector * sector_size + 4]
+                if compression & RegionFile.EXTERNAL_FLAG:
+                    external_dropped.append(path.with_name(
+                        f"c.{region.region_x * 32 + x}.{region.region_z * 32 + z}.mcc"
+                    ))
+                continue
+            kept.append((index, timestamp, bytes(region.read_record(x, z))))
+            disk_order.append((sector, index))
+
+        # Chunks vecinos quedan cerca en disco: mejor localidad al cargar el mundo
+        kept.sort(key=lambda item: morton_index(item[0] & 31, item[0] >> 5))
+        reordered = [index for _, index in sorted(disk_order)] != [item[0] for item in kept]
+
+        new_size = 0
+        if kept:
+            new_size = 2 * sector_size + sum(
+                -(-len(record) // sector_size) * sector_size for _, _, record in kept
+            )
+
+        needs_write = not dry_run and (dropped or new_size != old_size or reordered)
+        tmp_path = path.with_name(path.name + ".tmp")
+        if needs_write and kept:
+            locations = array('I', bytes(4096))
+            timestamps = array('I', bytes(4096))
+            with open(tmp_path, 'wb') as f:
+                f.seek(2 * sector_size)
+                sector = 2
+                for index, timestamp, record in kept:
+                    sectors = -(-len(record) // sector_size)
+                    if sectors > 255:
+                        raise ValueError(f"Chunk demasiado grande en {path.name}")
+                    locations[index] = (sector << 8) | sectors
+                    timestamps[index] = timestamp
+                    f.write(record)
+                    f.write(bytes(sectors * sector_size - len(record)))
+                    sector += sectors
+                if sys.byteorder == "little":
+                    locations.byteswap()
+                    timestamps.byteswap()
+                f.seek(0)
+                f.write(locations.tobytes())
+                f.write(timestamps.tobytes())
+    # Reemplazar con el mmap ya cerrado (Windows no permite sustituir un archivo mapeado)
+    if needs_write:
+        if tmp_path.exists():
+            os.replace(tmp_path, path)
+        else:
+            path.unlink()
+        for external in external_dropped:
+            if external.exists():
+                external.unlink()
+
+    # Medir el archivo resultante en vez de suponer una disposición perfecta
+    new_fragmentation = None
+    if not dry_run:
+        new_fragmentation = 0.0
+        if path.exists():
+            with RegionFile(path) as region:
+                new_fragmentation = region.fragmentation()
+
+    return {
+        "path": str(path),
+        "old_size": old_size,
+        "new_size": new_size,
+        "dropped": dropped,
+        "old_fragmentation": old_fragmentation,
+        "new_fragmentation": new_fragmentation
+    }
+
+def _scan_region_inhabited(path, min_inhabited_ticks):
+    """Índices de los chunks con InhabitedTime por debajo del umbral (proceso del pool)"""
+    drop = []
+    with RegionFile(path) as region:
+        for x, z, sector, count, timestamp in region.chunks():
+            try:
+                chunk = region.read_chunk_nbt(x, z)
+            except Exception:
+                continue  # Chunk ilegible: no se toca
+            inhabited = chunk.get("InhabitedTime")
+            if inhabited is None:
+                inhabited = chunk.find("Level", "InhabitedTime", default=0)  # Formato anterior a 1.18
+            if inhabited < min_inhabited_ticks:
+                drop.append(RegionFile.index(x, z))
+    return str(path), drop
+
+class ServerEvent:
+    """Evento tipado extraído de una línea de la consola"""
+
+    __slots__ = ("kind", "pattern", "time", "level", "logger", "message", "line", "data")
+
+    def __init__(self, kind, pattern, level, logger, message, line, data):
+        self.kind = kind
+        self.pattern = pattern
+        self.time = time.time()
+        self.level = level
+        self.logger = logger
+        self.message = message
+        self.line = line
+        self.data = data
+
+    def get(self, key, default=None):
+        return self.data.get(key, default)
+
+    def __repr__(self):
+        return f"ServerEvent({self.kind!r}, {self.data!r})"
+
+
+class ServerEventStream:
+    """Clasificador único de la salida del servidor con suscriptores.
+
+    Cada línea se parte una vez en cabecera (hora, hilo/nivel) y mensaje, y el
+    mensaje se compara con la tabla de patrones en orden hasta la primera
+    coincidencia. Cada entrada tiene una pista literal que se comprueba antes
+    de la expresión regular. El coste por línea no depende de cuántos
+    suscriptores haya: todos reciben el mismo ServerEvent.
+    """
+
+    # Vanilla: "[12:00:00] [Server thread/INFO]: msg"; Paper: "[12:00:00 INFO]: msg"
+    HEADER = re.compile(
+        r"^\[(?P<clock>\d{2}:\d{2}:\d{2})(?: (?P<level>[A-Z]+))?\]"
+        r"(?: \[(?P<thread>[^\]]*?)/(?P<thread_level>[A-Z]+)\])?: (?P<message>.*)$"
+    )
+    PLUGIN_LOGGER = re.compile(r"^\[([\w .-]+)\] ")
+    PLAYER = r"(?P<player>[\w.]{1,32})"
+
+    # (nombre, tipo de evento, pista literal o None, patrón sobre el mensaje)
+    PATTERNS = (
+        ("uuid", "uuid", "UUID of player", r"^UUID of player " + PLAYER + r" is (?P<uuid>[0-9a-fA-F-]{36})$"),
+        ("login", "login", "logged in with entity id",
+         r"^" + PLAYER + r"\[/(?P<address>[^\]]*)\] logged in with entity id (?P<entity>\d+)"),
+        ("join", "join", "joined the game", r"^" + PLAYER + r" joined the game$"),
+        ("leave", "leave", "left the game", r"^" + PLAYER + r" left the game$"),
+        ("disconnect", "leave", "lost connection", r"^" + PLAYER + r" lost connection: (?P<reason>.*)$"),
+        ("chat", "chat", "<", r"^(?:\[Not Secure\] )?<" + PLAYER + r"> (?P<text>.*)$"),
+        ("command", "command", "issued server command", r"^" + PLAYER + r" issued server command: (?P<text>.*)$"),
+        ("command_feedback", "command", "[", r"^\[" + PLAYER + r": (?P<text>.*)\]$"),
+        ("advancement", "advancement", " has ",
+         r"^" + PLAYER + r" has (?:made the advancement|completed the challenge|reached the goal) \[(?P<text>.+)\]$"),
+        ("lag", "lag", "Can't keep up",
+         r"^Can't keep up! Is the server overloaded\? Running (?P<ms>\d+)ms or (?P<ticks>\d+) ticks behind"),
+        ("tick", "tick", "tick", r"^(?:Target tick rate|Average time per tick)"),
+        ("tick_percentiles", "tick", "P50", r"^Percentiles: P50"),
+        ("save", "save", None, r"^(?:Saved the game|Saving the game|Automatic saving is now)"),
+        ("done", "done", "Done (", r'^Done \((?P<seconds>[\d.]+)s\)! For help, type "help"'),
+        ("list", "list", "players online",
+         r"^There are (?P<count>\d+) of a max of (?P<max>\d+) players online:(?P<names>.*)$"),
+        ("death", "death", None,
+         r"^" + PLAYER + r" (?P<text>(?:was |died|drowned|blew up|hit the ground|fell |fell$|went up in flames|"
+         r"burned to death|tried to swim|suffocated|starved|froze to death|withered|experienced kinetic|"
+         r"discovered the floor|walked into|didn't want to live|left the confines|went off with a bang|"
+         r"was killed|was slain|was shot|was blown up|was pricked|was squashed|was impaled).*)$")
+    )
+
+    def __init__(self):
+        self._table = [
+            (name, kind, hint, re.compile(pattern)) for name, kind, hint, pattern in self.PATTERNS
+        ]
+        self._subscribers = {}   # tipo -> tupla de callbacks ("*" = todos)
+        self._lock = threading.Lock()
+        self.counters = {name: {"hits": 0, "tries": 0, "ns": 0} for name, _, _, _ in self.PATTERNS}
+        self.counters["_header"] = {"hits": 0, "tries": 0, "ns": 0}
+        self.lines = 0
+
+    def subscribe(self, callback, kinds=None):
+        """callback(event) para los tipos indicados (None = todos). Se llama en el hilo lector"""
+        with self._lock:
+            for kind in kinds or ("*",):
+                self._subscribers[kind] = self._subscribers.get(kind, ()) + (callback,)
+        return callback
+
+    def unsubscribe(self, callback):
+        with self._lock:
+            for kind, callbacks in list(self._subscribers.items()):
+                self._subscribers[kind] = tuple(c for c in callbacks if c is not callback)
+
+    def subscribe_queue(self, kinds=None, maxsize=1000):
+        """queue.Queue con los eventos; si se llena, los eventos nuevos se descartan"""
+        events = queue.Queue(maxsize=maxsize)
+
+        def put(event):
+            try:
+                events.put_nowait(event)
+            except queue.Full:
+                pass
+
+        events.callback = self.subscribe(put, kinds)
+        return events
+
+    def subscribe_async(self, loop, kinds=None, maxsize=1000):
+        """asyncio.Queue alimentada desde el hilo lector con call_soon_threadsafe"""
+        events = asyncio.Queue(maxsize=maxsize)
+
+        def put(event):
+            if events.full():
+                return
+            loop.call_soon_threadsafe(events.put_nowait, event)
+
+        events.callback = self.subscribe(put, kinds)
+        return events
+
+    def classify(self, line):
+        """Convertir una línea en ServerEvent (tipo "line" si no coincide nada)"""
+        counters = self.counters
+        started = time.perf_counter_ns()
+        header = self.HEADER.match(line)
+        counters["_header"]["tries"] += 1
+        if header:
+            counters["_header"]["hits"] += 1
+            message = header.group("message")
+            level = header.group("level") or header.group("thread_level") or "INFO"
+            logger = header.group("thread")
+            plugin = self.PLUGIN_LOGGER.match(message)
+            if plugin and logger is None:
+                logger = plugin.group(1)
+        else:
+            message, level, logger = line, "INFO", None
+        counters["_header"]["ns"] += time.perf_counter_ns() - started
+
+        for name, kind, hint, pattern in self._table:
+            if hint is not None and hint not in message:
+                continue
+            started = time.perf_counter_ns()
+            match = pattern.match(message)
+            counter = counters[name]
+            counter["tries"] += 1
+            counter["ns"] += time.perf_counter_ns() - started
+            if match:
+                counter["hits"] += 1
+                return ServerEvent(kind, name, level, logger, message, line, match.groupdict())
+
+        if level in ("WARN", "WARNING"):
+            return ServerEvent("warn", None, level, logger, message, line, {})
+        if level in ("ERROR", "SEVERE", "FATAL"):
+            return ServerEvent("error", None, level, logger, message, line, {})
+        return ServerEvent("line", None, level, logger, message, line, {})
+
+    def publish_line(self, line):
+        """Clasificar una línea y entregarla a los suscriptores. Devuelve el evento"""
+        self.lines += 1
+        event = self.classify(line)
+        subscribers = self._subscribers
+        for callback in subscribers.get(event.kind, ()) + subscribers.get("*", ()):
+            callback(event)
+        return event
+
+    def stats(self):
+        """Contadores por patrón: aciertos, intentos y tiempo medio por intento (µs)"""
+        return {
+            name: dict(counter, avg_us=counter["ns"] / counter["tries"] / 1000 if counter["tries"] else 0.0)
+            for name, counter in self.counters.items()
+        }
+
+
+class PlayerTracker:
+    """Jugadores conectados, alimentado por los eventos de ServerEventStream"""
+
+    KINDS = ("uuid", "login", "join", "leave", "list")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._online = {}
+        self._pending = {}
+
+    def handle_event(self, event):
+        """Aplicar un evento de jugador. Devuelve True si cambió el estado"""
+        with self._lock:
+            if event.kind == "uuid":
+                self._pending.setdefault(event.data["player"], {})["uuid"] = event.data["uuid"]
+                return False
+
+            if event.kind == "login":
+                self._pending.setdefault(event.data["player"], {})["address"] = event.data["address"]
+                return False
+
+            if event.kind == "join":
+                name = event.data["player"]
+                pending = self._pending.pop(name, {})
+                self._online[name] = {
+                    "since": datetime.now(),
+                    "uuid": pending.get("uuid"),
+                    "address": pending.get("address")
+                }
+                return True
+
+            if event.kind == "leave":
+                self._pending.pop(event.data["player"], None)
+                return self._online.pop(event.data["player"], None) is not None
+
+            # Respuesta a "list" (de cualquier origen): resincronizar el conjunto
+            if event.kind == "list":
+                names = [n.strip() for n in event.data["names"].split(",") if n.strip()]
+                for name in list(self._online):
+                    if name not in names:
+                        del self._online[name]
+                for name in names:
+                    self._online.setdefault(name, {"since": datetime.now(), "uuid": None, "address": None})
+                return True
+
+        return False
+
+    def reset(self):
+        with self._lock:
+            self._online.clear()
+            self._pending.clear()
+
+    def players(self):
+        """Nombres de los jugadores conectados, por orden de entrada"""
+        with self._lock:
+            return sorted(self._online, key=lambda name: self._online[name]["since"])
+
+    def sessions(self):
+        """Copia de las sesiones: nombre -> {since, uuid, address}"""
+        with self._lock:
+            return {name: dict(info) for name, info in self._online.items()}
+
+    def is_online(self, name):
+        return name in self._online
+
+    def __len__(self):
+        return len(self._online)
+
+class RconError(Exception):
+    """Error de protocolo o de autenticación RCON"""
+
+
+class RconUnconfirmedError(RconError):
+    """El comando llegó a enviarse pero su respuesta no: no se sabe si se ejecutó"""
+
+
+class RconClient:
+    """Cliente RCON con conexión persistente y peticiones en tubería.
+
+    Cada comando se envía seguido de un paquete terminador con otro ID: el
+    servidor responde en orden, así que la respuesta al terminador marca el
+    final de una respuesta repartida en varios paquetes. Un hilo lector
+    reparte los paquetes entre los Future pendientes por ID.
+    """
+
+    TYPE_RESPONSE = 0
+    TYPE_COMMAND = 2
+    TYPE_LOGIN = 3
+    MAX_PAYLOAD = 1446
+
+    def __init__(self, host, port, password, timeout=5.0, max_in_flight=32):
+        self.host = host
+        self.port = int(port)
+        self.password = password
+        self.timeout = timeout
+        self.max_in_flight = max_in_flight
+        self._sock = None
+        self._reader = None
+        self._send_lock = threading.Lock()
+        self._state_lock = threading.Lock()
+        self._window = threading.BoundedSemaphore(max_in_flight)
+        self._pending = {}      # id de comando -> [Future, fragmentos]
+        self._terminators = {}  # id de terminador -> id de comando
+        self._next_id = 1
+
+    @staticmethod
+    def _pack(request_id, packet_type, payload):
+        body = struct.pack("<ii", request_id, packet_type) + payload + b"\x00\x00"
+        return struct.pack("<i", len(body)) + body
+
+    @staticmethod
+    def _recv_exact(sock, size):
+        data = bytearray()
+        while len(data) < size:
+            chunk = sock.recv(size - len(data))
+            if not chunk:
+                raise ConnectionError("Conexión RCON cerrada por el servidor")
+            data += chunk
+        return bytes(data)
+
+    def _read_packet(self, sock):
+        length, = struct.unpack("<i", self._recv_exact(sock, 4))
+        if length < 10 or length > 1 << 20:
+            raise RconError(f"Longitud de paquete RCON inválida: {length}")
+        body = self._recv_exact(sock, length)
+        request_id, packet_type = struct.unpack_from("<ii", body)
+        return request_id, packet_type, body[8:-2]
+
+    @property
+    def connected(self):
+        return self._sock is not None
+
+    def connect(self):
+        """Abrir la conexión y autenticarse (idempotente)"""
+        with self._state_lock:
+            if self._sock is not None:
+                return
+            sock = socket.create_connection((self.host, self.port), timeout=self.timeout)
+            try:
+                sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+                sock.sendall(self._pack(0, self.TYPE_LOGIN, self.password.encode("utf-8")))
+                # Algunos servidores envían un RESPONSE_VALUE vacío antes del resultado
+                while True:
+                    request_id, packet_type, _ = self._read_packet(sock)
+                    if packet_type == self.TYPE_COMMAND:
+                        break
+                if request_id == -1:
+                    raise RconError("Contraseña RCON incorrecta")
+                sock.settimeout(None)
+            except Exception:
+                sock.close()
+                raise
+            self._sock = sock
+            self._reader = threading.Thread(target=self._read_loop, args=(sock,), daemon=True)
+            self._reader.start()
+
+    def _read_loop(self, sock):
+        error = None
+        try:
+            while True:
+                request_id, _, payload = self._read_packet(sock)
+                with self._state_lock:
+                    command_id = self._terminators.pop(request_id, None)
+                    if command_id is not None:
+                        entry = self._pending.pop(command_id, None)
+                    else:
+                        entry = self._pending.get(request_id)
+                        if entry is not None:
+                            entry[1].append(payload)
+                        continue
+                if entry is not None:
+                    self._window.release()
+                    if not entry[0].done():
+                        entry[0].set_result(b"".join(entry[1]).decode("utf-8", errors="replace"))
+        except Exception as e:
+            error = e
+        self._drop_connection(sock, error)
+
+    def _drop_connection(self, sock, error=None):
+        with self._state_lock:
+            if self._sock is sock:
+                self._sock = None
+            pending = list(self._pending.values())
+            self._pending.clear()
+            self._terminators.clear()
+        try:
+            sock.close()
+        except OSError:
+            pass
+        for future, _ in pending:
+            self._window.release()
+            if not future.done():
+                future.set_exception(RconUnconfirmedError(f"Conexión RCON perdida sin respuesta: {error}"))
+
+    def submit(self, command):
+        """Enviar un comando sin esperar; devuelve un Future con la respuesta.
+
+        Si el comando no llegó a escribirse en el socket lanza la excepción aquí
+        mismo; los fallos posteriores llegan por el Future (el servidor pudo
+        haberlo ejecutado).
+        """
+        payload = command.encode("utf-8")
+        if len(payload) > self.MAX_PAYLOAD:
+            raise RconError(f"Comando demasiado largo para RCON ({len(payload)} bytes)")
+
+        # Reconexión automática si el servidor cerró la conexión
+        self.connect()
+        if not self._window.acquire(timeout=self.timeout):
+            raise TimeoutError("Demasiadas peticiones RCON pendientes")
+
+        future = Future()
+        with self._state_lock:
+            sock = self._sock
+            command_id = self._next_id
+            terminator_id = command_id + 1
+            self._next_id = terminator_id + 1 if terminator_id < 0x7FFFFFFE else 1
+            self._pending[command_id] = [future, []]
+            self._terminators[terminator_id] = command_id
+
+        if sock is None:
+            with self._state_lock:
+                self._pending.pop(command_id, None)
+                self._terminators.pop(terminator_id, None)
+            self._window.release()
+            raise ConnectionError("Conexión RCON no disponible")
+        with self._send_lock:
+            try:
+                sock.sendall(self._pack(command_id, self.TYPE_COMMAND, payload))
+            except OSError as e:
+                # Un paquete incompleto no se ejecuta: el comando no se envió
+                with self._state_lock:
+                    entry = self._pending.pop(command_id, None)
+                    self._terminators.pop(terminator_id, None)
+                if entry is not None:
+                    self._window.release()
+                self._drop_connection(sock, e)
+                raise
+            try:
+                sock.sendall(self._pack(terminator_id, self.TYPE_RESPONSE, b""))
+            except OSError as e:
+                self._drop_connection(sock, e)
+        return future
+
+    def command(self, command, timeout=None):
+        """Ejecutar un comando y devolver la respuesta del servidor"""
+        return self.submit(command).result(timeout if timeout is not None else self.timeout)
+
+    def pipeline(self, commands, timeout=None):
+        """Enviar muchos comandos a la vez; devuelve las respuestas en el mismo orden"""
+        # submit() se bloquea cuando la ventana está llena, así que el lector
+        # va liberando hueco mientras se siguen enviando comandos
+        futures = [self.submit(command) for command in commands]
+        timeout = timeout if timeout is not None else self.timeout
+        return [future.result(timeout) for future in futures]
+
+    def close(self):
+        sock = self._sock
+        if sock is not None:
+            self._drop_connection(sock, "cerrada por el panel")
+
+SPARK_CHARS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values, width=None):
+    """Dibujar una serie como sparkline de texto (los huecos NaN quedan en blanco)"""
+    values = list(values)[-width:] if width else list(values)
+    present = [v for v in values if not math.isnan(v)]
+    if not present:
+        return " " * len(values)
+    low, high = min(present), max(present)
+    scale = (len(SPARK_CHARS) - 1) / (high - low) if high > low else 0
+    return "".join(
+        " " if math.isnan(v) else SPARK_CHARS[int((v - low) * scale)]
+        for v in values
+    )
+
+
+class TimeSeriesStore:
+    """Series temporales en buffers circulares de tamaño fijo con tres niveles.
+
+    Cada muestra se acumula en el cubo actual de cada nivel (1 s, 1 min, 1 h) y al
+    cambiar de cubo se guarda su media. La memoria es fija: metrics x (300 + 1440
+    + 720) doubles, sin importar cuánto tiempo lleve el servidor encendido.
+    """
+
+    MAGIC = b"MCTS"
+    VERSION = 2  # v2 guarda también cuántas muestras lleva el cubo en curso
+    # (segundos por cubo, cubos guardados): 5 minutos, 24 horas y 30 días
+    TIERS = ((1, 300), (60, 1440), (3600, 720))
+
+    def __init__(self, path, metrics):
+        self.path = Path(path)
+        self.metrics = tuple(metrics)
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        nan = float("nan")
+        self._buffers = [
+            {name: array('d', [nan]) * capacity for name in self.metrics}
+            for _, capacity in self.TIERS
+        ]
+        self._buckets = [None] * len(self.TIERS)
+        self._sums = [dict.fromkeys(self.metrics, 0.0) for _ in self.TIERS]
+        self._counts = [dict.fromkeys(self.metrics, 0) for _ in self.TIERS]
+
+    def _flush_bucket(self, tier):
+        """Escribir la media del cubo en curso en su posición del buffer"""
+        bucket = self._buckets[tier]
+        if bucket is None:
+            return
+        capacity = self.TIERS[tier][1]
+        sums, counts = self._sums[tier], self._counts[tier]
+        for name in self.metrics:
+            if counts[name]:
+                self._buffers[tier][name][bucket % capacity] = sums[name] / counts[name]
+
+    def _advance(self, tier, bucket):
+        current = self._buckets[tier]
+        if current == bucket:
+            return
+        self._flush_bucket(tier)
+        capacity = self.TIERS[tier][1]
+        if current is not None and bucket > current:
+            # Los cubos sin muestras quedan como huecos
+            nan = float("nan")
+            for missing in range(current + 1, min(bucket, current + capacity + 1)):
+                for name in self.metrics:
+                    self._buffers[tier][name][missing % capacity] = nan
+        for name in self.metrics:
+            self._buffers[tier][name][bucket % capacity] = float("nan")
+            self._sums[tier][name] = 0.0
+            self._counts[tier][name] = 0
+        self._buckets[tier] = bucket
+
+    def record(self, values, timestamp=None):
+        """Añadir una muestra {métrica: valor}; los valores None se ignoran"""
+        timestamp = time.time() if timestamp is None else timestamp
+        with self._lock:
+            for tier, (step, _) in enumerate(self.TIERS):
+                bucket = int(timestamp // step)
+                if self._buckets[tier] is not None and bucket < self._buckets[tier]:
+                    continue  # reloj hacia atrás: descartar
+                self._advance(tier, bucket)
+                for name, value in values.items():
+                    if value is None or name not in self._sums[tier]:
+                        continue
+                    self._sums[tier][name] += value
+                    self._counts[tier][name] += 1
+
+    def series(self, metric, tier=0, count=None):
+        """Últimos `count` valores (del más antiguo al más reciente) de un nivel"""
+        step, capacity = self.TIERS[tier]
+        count = min(count or capacity, capacity)
+        with self._lock:
+            bucket = self._buckets[tier]
+            if bucket is None:
+                return [float("nan")] * count
+            self._flush_bucket(tier)
+            buffer = self._buffers[tier][metric]
+            return [buffer[b % capacity] for b in range(bucket - count + 1, bucket + 1)]
+
+    def save(self):
+        """Guardar en disco de forma atómica (archivo temporal + os.replace)"""
+        with self._lock:
+            for tier in range(len(self.TIERS)):
+                self._flush_bucket(tier)
+            names = [name.encode("utf-8") for name in self.metrics]
+            parts = [struct.pack("<4sHH", self.MAGIC, self.VERSION, len(names))]
+            parts.extend(struct.pack("<B", len(name)) + name for name in names)
+            for tier, (step, capacity) in enumerate(self.TIERS):
+                bucket = self._buckets[tier]
+                parts.append(struct.pack("<qII", -1 if bucket is None else bucket, step, capacity))
+                parts.extend(self._buffers[tier][name].tobytes() for name in self.metrics)
+                parts.append(struct.pack(f"<{len(self.metrics)}I", *(self._counts[tier][name] for name in self.metrics)))
+        
+        tmp_path = self.path.with_name(self.path.name + ".tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(b"".join(parts))
+        os.replace(tmp_path, self.path)
+
+    def load(self):
+        """Cargar el archivo si existe y coincide el formato. Devuelve True si se cargó"""
+        try:
+            data = self.path.read_bytes()
+        except OSError:
+            return False
+        
+        try:
+            magic, version, count = struct.unpack_from("<4sHH", data, 0)
+            offset = 8
+            if magic != self.MAGIC or version not in (1, self.VERSION):
+                return False
+            names = []
+            for _ in range(count):
+                length = data[offset]
+                names.append(data[offset + 1:offset + 1 + length].decode("utf-8"))
+                offset += 1 + length
+            
+            buffers, buckets, counts = [], [], []
+            for step, capacity in self.TIERS:
+                bucket, file_step, file_capacity = struct.unpack_from("<qII", data, offset)
+                offset += 16
+                if (file_step, file_capacity) != (step, capacity):
+                    return False
+                tier_buffers = {}
+                for name in names:
+                    values = array('d')
+                    values.frombytes(data[offset:offset + capacity * 8])
+                    offset += capacity * 8
+                    tier_buffers[name] = values
+                if version >= 2:
+                    tier_counts = dict(zip(names, struct.unpack_from(f"<{count}I", data, offset)))
+                    offset += 4 * count
+                else:
+                    tier_counts = dict.fromkeys(names, 1)
+                buffers.append(tier_buffers)
+                buckets.append(None if bucket < 0 else bucket)
+                counts.append(tier_counts)
+        except (struct.error, IndexError, ValueError):
+            return False
+        
+        with self._lock:
+            self._reset()
+            for tier, tier_buffers in enumerate(buffers):
+                for name in self.metrics:
+                    if name in tier_buffers and len(tier_buffers[name]) == self.TIERS[tier][1]:
+                        self._buffers[tier][name] = tier_buffers[name]
+                self._buckets[tier] = buckets[tier]
+                if buckets[tier] is None:
+                    continue
+                # Retomar la media del cubo en curso con su peso, no empezarla de cero
+                capacity = self.TIERS[tier][1]
+                for name in self.metrics:
+                    value = self._buffers[tier][name][buckets[tier] % capacity]
+                    if not math.isnan(value):
+                        self._counts[tier][name] = counts[tier].get(name, 1) or 1
+                        self._sums[tier][name] = value * self._counts[tier][name]
+        return True
+
+
+class MetricsSampler:
+    """Muestreo de métricas en segundo plano con un intervalo por fuente.
+
+    Cada fuente corre en su propio hilo, así que una consulta lenta (zerotier-cli,
+    DNS) no retrasa a las demás. Los resultados se publican como un snapshot
+    inmutable que se reemplaza entero: quien lo lee nunca espera ni ve un estado
+    a medio actualizar. El intervalo de las fuentes lentas hace de TTL de caché.
+    """
+
+    def __init__(self):
+        self._sources = {}
+        self._threads = []
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._snapshot = MappingProxyType({})
+
+    def add_source(self, name, interval, func):
+        """Registrar una fuente: func() se llama cada `interval` segundos"""
+        self._sources[name] = (interval, func)
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def get(self, name, default=None):
+        return self._snapshot.get(name, default)
+
+    def sample(self, name):
+        """Muestrear una fuente ya mismo (bloqueante) y publicar el resultado"""
+        _, func = self._sources[name]
+        try:
+            value = func()
+        except Exception:
+            value = None
+        if isinstance(value, dict):
+            value = MappingProxyType(value)
+        with self._lock:
+            values = dict(self._snapshot)
+            values[name] = value
+            values["sampled_at"] = time.time()
+            self._snapshot = MappingProxyType(values)
+        return value
+
+    def _run_source(self, name, interval):
+        while not self._stop.is_set():
+            self.sample(name)
+            self._stop.wait(interval)
+
+    def start(self):
+        if self._threads:
+            return
+        self._stop.clear()
+        for name, (interval, _) in self._sources.items():
+            thread = threading.Thread(target=self._run_source, args=(name, interval), daemon=True)
+            thread.start()
+            self._threads.append(thread)
+
+    def stop(self):
+        self._stop.set()
+        self._threads = []
+
+class TickProbe:
+    """Salud del tick a partir de lo que reporta el propio servidor.
+
+    Lee los avisos "Can't keep up!" y las respuestas de `tick query` (1.20.3+),
+    tanto líneas de consola como respuestas RCON completas. Cada actualización
+    publica un snapshot inmutable y avisa a los oyentes registrados.
+    """
+
+    CANT_KEEP_UP = re.compile(r"Can't keep up! Is the server overloaded\? Running (\d+)ms or (\d+) ticks behind")
+    TARGET = re.compile(r"Target tick rate: ([\d.]+) per second")
+    AVERAGE = re.compile(r"Average time per tick: ([\d.]+)ms")
+    PERCENTILES = re.compile(r"P50: ([\d.]+)ms P95: ([\d.]+)ms P99: ([\d.]+)ms, sample: (\d+)")
+    LAG_WINDOW = 60
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._listeners = []
+        self.lag_events = deque(maxlen=100)
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.target_rate = 20.0
+            self.lag_events.clear()
+            self._snapshot = MappingProxyType({
+                "tps": None, "mspt": None, "p50": None, "p95": None, "p99": None,
+                "sample": 0, "target": self.target_rate, "lag_ms": 0, "lag_ticks": 0,
+                "lagging": False, "updated": None
+            })
+
+    @property
+    def snapshot(self):
+        return self._snapshot
+
+    def add_listener(self, callback):
+        """callback(snapshot) se llama en cada actualización (desde el hilo que la produjo)"""
+        self._listeners.append(callback)
+
+    def remove_listener(self, callback):
+        if callback in self._listeners:
+            self._listeners.remove(callback)
+
+    def _publish(self, changes):
+        with self._lock:
+            values = dict(self._snapshot)
+            values.update(changes)
+            cutoff = time.time() - self.LAG_WINDOW
+            recent = [event for event in self.lag_events if event[0] >= cutoff]
+            values["lagging"] = bool(recent)
+            values["lag_ms"] = sum(event[1] for event in recent)
+            values["lag_ticks"] = sum(event[2] for event in recent)
+            values["updated"] = time.time()
+            snapshot = self._snapshot = MappingProxyType(values)
+        for callback in list(self._listeners):
+            try:
+                callback(snapshot)
+            except Exception:
+                pass
+
+    def handle_event(self, event):
+        """Suscriptor de ServerEventStream para los eventos de tipo lag y tick"""
+        self.feed(event.message)
+
+    def feed(self, text):
+        """Procesar una línea de consola o una respuesta RCON. Devuelve True si actualizó"""
+        if "tick" not in text and "P50" not in text:
+            return False
+
+        changes = {}
+        match = self.CANT_KEEP_UP.search(text)
+        if match:
+            self.lag_events.append((time.time(), int(match.group(1)), int(match.group(2))))
+
+        match = self.TARGET.search(text)
+        if match:
+            self.target_rate = float(match.group(1))
+            changes["target"] = self.target_rate
+
+        match = self.AVERAGE.search(text)
+        if match:
+            mspt = float(match.group(1))
+            changes["mspt"] = mspt
+            # Un tick no puede ir más rápido que la tasa objetivo
+            changes["tps"] = min(self.target_rate, 1000.0 / mspt) if mspt > 0 else self.target_rate
+
+        match = self.PERCENTILES.search(text)
+        if match:
+            changes["p50"] = float(match.group(1))
+            changes["p95"] = float(match.group(2))
+            changes["p99"] = float(match.group(3))
+            changes["sample"] = int(match.group(4))
+
+        if not changes and not self.CANT_KEEP_UP.search(text):
+            return False
+        self._publish(changes)
+        return True
+
+GC_SIZE_UNITS = {"B": 1, "K": 1024, "M": 1024 ** 2, "G": 1024 ** 3}
+
+def _percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, int(round(fraction * (len(sorted_values) - 1))))
+    return sorted_values[index]
+
+
+class GcLogParser:
+    """Analizador incremental del log unificado de la JVM (-Xlog:gc*) para G1.
+
+    Requiere el decorador `uptime` para calcular tasas. De cada "Pause" toma la
+    duración y el heap antes/después; de las líneas de regiones, lo promovido a
+    Old. La asignación se estima como heap antes de esta pausa menos heap
+    después de la anterior, dividido por el tiempo entre ambas.
+    """
+
+    UPTIME = re.compile(r"\[(\d+(?:\.\d+)?)s\]")
+    PAUSE = re.compile(
+        r"GC\((\d+)\) (Pause .*?) (\d+)([BKMG])->(\d+)([BKMG])\((\d+)([BKMG])\) ([\d.]+)ms"
+    )
+    REGIONS = re.compile(r"GC\((\d+)\) (Old|Humongous) regions: (\d+)->(\d+)")
+    REGION_SIZE = re.compile(r"Heap Region Size: (\d+)([BKMG])")
+
+    def __init__(self, max_pauses=2000):
+        self.pauses = deque(maxlen=max_pauses)  # (uptime, ms, tipo)
+        self.allocations = deque(maxlen=max_pauses)  # (uptime, bytes asignados desde la pausa anterior)
+        self.promotions = deque(maxlen=max_pauses)   # (uptime, bytes promovidos a Old)
+        self.region_size = None
+        self.heap_after = None
+        self.heap_total = None
+        self.full_gcs = 0
+        self._last_pause = None  # (uptime, heap después)
+        self._old_regions = {}
+
+    def feed(self, line):
+        """Procesar una línea del log. Devuelve True si era una pausa"""
+        if "GC(" not in line:
+            match = self.REGION_SIZE.search(line)
+            if match:
+                self.region_size = int(match.group(1)) * GC_SIZE_UNITS[match.group(2)]
+            return False
+
+        match = self.REGIONS.search(line)
+        if match:
+            gc_id = int(match.group(1))
+            before, after = int(match.group(3)), int(match.group(4))
+            if match.group(2) == "Old":
+                self._old_regions[gc_id] = after - before
+            return False
+
+        match = self.PAUSE.search(line)
+        if not match:
+            return False
+
+        uptime_match = self.UPTIME.search(line)
+        uptime = float(uptime_match.group(1)) if uptime_match else None
+        gc_id = int(match.group(1))
+        kind = match.group(2).strip()
+        before = int(match.group(3)) * GC_SIZE_UNITS[match.group(4)]
+        after = int(match.group(5)) * GC_SIZE_UNITS[match.group(6)]
+        self.heap_total = int(match.group(7)) * GC_SIZE_UNITS[match.group(8)]
+        self.heap_after = after
+        self.pauses.append((uptime, float(match.group(9)), kind))
+        if kind.startswith("Pause Full"):
+            self.full_gcs += 1
+
+        if uptime is not None:
+            if self._last_pause is not None and uptime > self._last_pause[0]:
+                self.allocations.append((uptime, max(0, before - self._last_pause[1])))
+            self._last_pause = (uptime, after)
+
+        promoted_regions = self._old_regions.pop(gc_id, None)
+        if promoted_regions is not None and promoted_regions > 0 and self.region_size and uptime is not None:
+            self.promotions.append((uptime, promoted_regions * self.region_size))
+        return True
+
+    @staticmethod
+    def _rate(samples, start, end):
+        """Bytes por segundo de las muestras posteriores a `start` hasta `end`"""
+        if end is None or start is None or end <= start:
+            return None
+        return sum(amount for uptime, amount in samples if start < uptime <= end) / (end - start)
+
+    def summary(self):
+        durations = sorted(ms for _, ms, _ in self.pauses)
+        uptimes = [uptime for uptime, _, _ in self.pauses if uptime is not None]
+        start = uptimes[0] if uptimes else None
+        end = uptimes[-1] if uptimes else None
+        span = end - start if uptimes else 0
+        return {
+            "pauses": len(durations),
+            "p50": _percentile(durations, 0.50),
+            "p95": _percentile(durations, 0.95),
+            "p99": _percentile(durations, 0.99),
+            "max": durations[-1] if durations else None,
+            "gc_time_pct": sum(durations) / (span * 10) if span > 0 else None,
+            "alloc_rate": self._rate(self.allocations, start, end),
+            "promotion_rate": self._rate(self.promotions, start, end),
+            "heap_after": self.heap_after,
+            "heap_total": self.heap_total,
+            "full_gcs": self.full_gcs
+        }
+
+
+class LogTail:
+    """Lectura incremental de un log que la JVM rota (detecta truncado o archivo nuevo).
+
+    since: instante de arranque del proceso que escribe el log; un archivo más
+    antiguo es de una ejecución anterior y se empieza a leer desde el final.
+    """
+
+    def __init__(self, path, on_line, since=None):
+        self.path = Path(path)
+        self.on_line = on_line
+        self.since = since
+        self._offset = 0
+        self._identity = None
+        self._partial = b""
+
+    def _emit(self, data, final=False):
+        lines = (self._partial + data).split(b"\n")
+        self._partial = lines.pop()
+        if final and self._partial:
+            lines.append(self._partial)
+            self._partial = b""
+        for line in lines:
+            self.on_line(line.decode("utf-8", errors="replace").rstrip("\r"))
+        return len(lines)
+
+    def _drain_rotated(self):
+        """Leer lo que faltaba del archivo anterior, que la JVM renombró a gc.log.N"""
+        for candidate in self.path.parent.glob(self.path.name + ".*"):
+            try:
+                stat = candidate.stat()
+            except OSError:
+                continue
+            if (stat.st_dev, stat.st_ino) != self._identity:
+                continue
+            with open(candidate, "rb") as f:
+                f.seek(self._offset)
+                return self._emit(f.read(), final=True)
+        return 0
+
+    def poll(self, max_bytes=4 * 1024 * 1024):
+        """Procesar las líneas nuevas. Devuelve cuántas se leyeron"""
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return 0
+
+        read = 0
+        identity = (stat.st_dev, stat.st_ino)
+        if self._identity is None and self.since is not None and stat.st_mtime < self.since:
+            # Log de una ejecución anterior: solo interesa lo que se escriba a partir de ahora
+            self._identity = identity
+            self._offset = stat.st_size
+        elif identity != self._identity or stat.st_size < self._offset:
+            if self._identity is not None and identity != self._identity:
+                read += self._drain_rotated()
+            # Rotación: empezar el archivo nuevo desde el principio
+            self._identity = identity
+            self._offset = 0
+            self._partial = b""
+        if stat.st_size == self._offset:
+            return read
+
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read(max_bytes)
+        self._offset += len(data)
+        return read + self._emit(data)
+
+class MetricsExporter:
+    """Endpoint HTTP /metrics en formato OpenMetrics.
+
+    `render` debe construir el texto solo con datos ya muestreados; aun así el
+    resultado se reutiliza durante `cache_seconds` para que scrapes frecuentes
+    (o varios Prometheus) no repitan el trabajo.
+    """
+
+    CONTENT_TYPE = "application/openmetrics-text; version=1.0.0; charset=utf-8"
+
+    def __init__(self, host, port, render, cache_seconds=0.5):
+        self.host = host
+        self.port = port
+        self.render = render
+        self.cache_seconds = cache_seconds
+        self._server = None
+        self._thread = None
+        self._cache = (0.0, b"")
+        self._cache_lock = threading.Lock()
+
+    @property
+    def running(self):
+        return self._server is not None
+
+    def body(self):
+        with self._cache_lock:
+            rendered_at, body = self._cache
+            now = time.monotonic()
+            if now - rendered_at >= self.cache_seconds:
+                body = self.render().encode("utf-8")
+                self._cache = (now, body)
+            return body
+
+    def start(self):
+        if self._server is not None:
+            return
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?", 1)[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                try:
+                    body = exporter.body()
+                except Exception as e:
+                    self.send_error(500, str(e))
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", exporter.CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass  # no ensuciar la interfaz con cada scrape
+
+        self._server = ThreadingHTTPServer((self.host, self.port), Handler)
+        self._server.daemon_threads = True
+        self._thread = threading.Thread(target=self._server.serve_forever, daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        if self._server is None:
+            return
+        self._server.shutdown()
+        self._server.server_close()
+        self._server = None
+        self._thread = None
+
+
+def _openmetrics_escape(text):
+    """Escapar \\, comillas y saltos de línea en valores de etiqueta y textos HELP"""
+    return str(text).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _openmetrics_number(value):
+    """Número en formato OpenMetrics (NaN, +Inf y -Inf en lugar de nan/inf de Python)"""
+    value = float(value)
+    if math.isnan(value):
+        return "NaN"
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(value)
+
+def _openmetrics_family(lines, name, kind, help_text, samples):
+    """Añadir una familia; samples es una lista de (etiquetas, valor) y se omiten los None"""
+    samples = [(labels, value) for labels, value in samples if value is not None]
+    if not samples:
+        return
+    lines.append(f"# TYPE {name} {kind}")
+    lines.append(f"# HELP {name} {_openmetrics_escape(help_text)}")
+    suffix = "_total" if kind == "counter" else ""
+    for labels, value in samples:
+        label_text = ""
+        if labels:
+            label_text = "{" + ",".join(f'{key}="{_openmetrics_escape(label)}"' for key, label in labels.items()) + "}"
+        lines.append(f"{name}{suffix}{label_text} {_openmetrics_number(value)}")
+
+class LogIndex:
+    """Índice de búsqueda sobre los logs archivados (logs/*.log.gz) en SQLite.
+
+    Usa FTS5 si la compilación de SQLite lo incluye y, si no, una tabla normal
+    con búsqueda LIKE. Cada archivo se lee una sola vez; en cada actualización
+    solo se (re)indexan los .log.gz nuevos o cuyo tamaño/mtime cambió.
+    """
+
+    LOG_DATE = re.compile(r"(\d{4}-\d{2}-\d{2})")
+    LINE_TIME = re.compile(r"^\[(\d{2}:\d{2}:\d{2})\]")
+    BATCH_SIZE = 5000
+
+    def __init__(self, db_path, logs_dir):
+        self.db_path = Path(db_path)
+        self.logs_dir = Path(logs_dir)
+        self._conn = None
+        self.fts = False
+
+    def connect(self):
+        if self._conn is not None:
+            return self._conn
+        conn = sqlite3.connect(str(self.db_path), check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.execute(
+            "CREATE TABLE IF NOT EXISTS files ("
+            "id INTEGER PRIMARY KEY, name TEXT UNIQUE, size INTEGER, mtime_ns INTEGER, "
+            "lines INTEGER, indexed_at REAL)"
+        )
+        existing = conn.execute(
+            "SELECT sql FROM sqlite_master WHERE name = 'log_lines'"
+        ).fetchone()
+        if existing is not None:
+            self.fts = "fts5" in existing[0].lower()
+        else:
+            try:
+                conn.execute(
+                    "CREATE VIRTUAL TABLE log_lines USING fts5("
+                    "message, file_id UNINDEXED, line_no UNINDEXED, logged_at UNINDEXED, "
+                    "tokenize = \"unicode61 tokenchars '_'\")"
+                )
+                self.fts = True
+            except sqlite3.OperationalError:
+                # SQLite sin FTS5: tabla normal y búsqueda con LIKE
+                conn.execute(
+                    "CREATE TABLE log_lines (message TEXT, file_id INTEGER, line_no INTEGER, logged_at TEXT)"
+                )
+                conn.execute("CREATE INDEX log_lines_time ON log_lines (logged_at)")
+                self.fts = False
+        conn.commit()
+        self._conn = conn
+        return conn
+
+    def close(self):
+        if self._conn is not None:
+            self._conn.close()
+            self._conn = None
+
+    def _index_file(self, conn, path, stat):
+        match = self.LOG_DATE.search(path.name)
+        day = match.group(1) if match else datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d")
+
+        row = conn.execute("SELECT id FROM files WHERE name = ?", (path.name,)).fetchone()
+        if row is not None:
+            conn.execute("DELETE FROM log_lines WHERE file_id = ?", (row[0],))
+            file_id = row[0]
+        else:
+            file_id = conn.execute("INSERT INTO files (name) VALUES (?)", (path.name,)).lastrowid
+
+        count = 0
+        batch = []
+        with gzip.open(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line_no, line in enumerate(f, 1):
+                line = line.rstrip("\r\n")
+                if not line:
+                    continue
+                time_match = self.LINE_TIME.match(line)
+                logged_at = f"{day} {time_match.group(1)}" if time_match else day
+                batch.append((line, file_id, line_no, logged_at))
+                if len(batch) >= self.BATCH_SIZE:
+                    conn.executemany("INSERT INTO log_lines VALUES (?, ?, ?, ?)", batch)
+                    count += len(batch)
+                    batch.clear()
+        if batch:
+            conn.executemany("INSERT INTO log_lines VALUES (?, ?, ?, ?)", batch)
+            count += len(batch)
+
+        conn.execute(
+            "UPDATE files SET size = ?, mtime_ns = ?, lines = ?, indexed_at = ? WHERE id = ?",
+            (stat.st_size, stat.st_mtime_ns, count, time.time(), file_id)
+        )
+        return count
+
+    def update(self):
+        """Indexar los archivos nuevos o modificados. Devuelve (archivos, líneas)"""
+        conn = self.connect()
+        known = {
+            name: (size, mtime_ns)
+            for name, size, mtime_ns in conn.execute("SELECT name, size, mtime_ns FROM files")
+        }
+        files_done = 0
+        lines_done = 0
+        for path in sorted(self.logs_dir.glob("*.log.gz")):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            if known.get(path.name) == (stat.st_size, stat.st_mtime_ns):
+                continue
+            try:
+                with conn:  # una transacción por archivo
+                    lines_done += self._index_file(conn, path, stat)
+                files_done += 1
+            except (OSError, EOFError, zlib.error) as e:
+                console.print(f"⚠️ No se pudo indexar {path.name}: {e}", style="yellow")
+        return files_done, lines_done
+
+    def _where(self, query):
+        """Condición SQL y parámetros: todos los términos deben aparecer"""
+        terms = query.split()
+        if not terms:
+            raise ValueError("búsqueda vacía")
+        if self.fts:
+            # Cada término como frase literal para no interpretar la sintaxis de FTS5
+            return "log_lines MATCH ?", [" ".join('"' + term.replace('"', '""') + '"' for term in terms)]
+        return " AND ".join("log_lines.message LIKE ?" for _ in terms), [f"%{term}%" for term in terms]
+
+    def search(self, query, limit=50, since=None):
+        """Líneas que contienen todos los términos, las más recientes primero"""
+        conn = self.connect()
+        where, params = self._where(query)
+        if since:
+            where += " AND log_lines.logged_at >= ?"
+            params.append(since)
+        rows = conn.execute(
+            "SELECT files.name, log_lines.line_no, log_lines.logged_at, log_lines.message "
+            "FROM log_lines JOIN files ON files.id = log_lines.file_id "
+            f"WHERE {where} ORDER BY log_lines.logged_at DESC, log_lines.line_no DESC LIMIT ?",
+            params + [limit]
+        )
+        return rows.fetchall()
+
+    def count_by_day(self, query, since=None):
+        """Cantidad de coincidencias por día: [(día, n)]"""
+        conn = self.connect()
+        where, params = self._where(query)
+        if since:
+            where += " AND log_lines.logged_at >= ?"
+            params.append(since)
+        rows = conn.execute(
+            f"SELECT substr(log_lines.logged_at, 1, 10) AS day, count(*) FROM log_lines "
+            f"WHERE {where} GROUP BY day ORDER BY day",
+            params
+        )
+        return rows.fetchall()
+
+    def stats(self):
+        conn = self.connect()
+        files, lines = conn.execute("SELECT count(*), coalesce(sum(lines), 0) FROM files").fetchone()
+        return {"files": files, "lines": lines, "fts": self.fts}
+
+class OutputPump:
+    """Lector de la consola del servidor que nunca hace esperar a la JVM.
+
+    Un hilo lector hace os.read() grandes sobre el pipe, decodifica por lotes,
+    guarda las líneas en el anillo `ring` (lo que se muestra) y pasa el lote a
+    una cola acotada. Un segundo hilo procesa la cola (jugadores, ticks,
+    esperas...). Si el procesado se retrasa y la cola se llena, los lotes van a
+    un archivo temporal en disco y se procesan después, en orden, como líneas
+    tardías. Solo si ese archivo supera `max_spill_bytes` se descartan líneas.
+    """
+
+    READ_SIZE = 64 * 1024
+    MAX_PARTIAL = 1024 * 1024
+
+    def __init__(self, stream, ring, handle_line, on_close=None,
+                 max_batches=1024, max_spill_bytes=64 * 1024 * 1024):
+        self.stream = stream
+        self.ring = ring
+        self.handle_line = handle_line
+        self.on_close = on_close
+        self.max_spill_bytes = max_spill_bytes
+        self.stats = {"lines": 0, "late": 0, "dropped": 0, "errors": 0, "spilled_bytes": 0}
+        self._queue = queue.Queue(maxsize=max_batches)
+        self._reader_done = threading.Event()
+        self._spill_lock = threading.Lock()
+        self._spill = None
+        self._spill_pending = False
+        self._spill_read = 0
+        self._spill_write = 0
+        self.finished = threading.Event()
+
+    def start(self):
+        threading.Thread(target=self._read_loop, daemon=True).start()
+        threading.Thread(target=self._process_loop, daemon=True).start()
+
+    def _read_loop(self):
+        fd = self.stream.fileno()
+        partial = b""
+        try:
+            while True:
+                try:
+                    data = os.read(fd, self.READ_SIZE)
+                except OSError:
+                    break
+                if not data:
+                    break
+                data = partial + data
+                cut = data.rfind(b"\n")
+                if cut < 0 and len(data) < self.MAX_PARTIAL:
+                    partial = data
+                    continue
+                if cut < 0:
+                    cut = len(data)  # línea gigantesca sin salto: cortarla
+                partial = data[cut + 1:]
+                self._publish(data[:cut])
+            if partial:
+                self._publish(partial)
+        finally:
+            self._reader_done.set()
+
+    def _publish(self, chunk):
+        # Un solo decode por lote en lugar de uno por línea
+        lines = [line.strip() for line in chunk.decode("utf-8", errors="replace").split("\n")]
+        lines = [line for line in lines if line]
+        if not lines:
+            return
+        stamp = datetime.now().strftime("[%H:%M:%S] ")
+        self.ring.extend(stamp + line for line in lines)
+        self.stats["lines"] += len(lines)
+
+        with self._spill_lock:
+            if not self._spill_pending:
+                try:
+                    self._queue.put_nowait(lines)
+                    return
+                except queue.Full:
+                    self._spill_pending = True
+            
+            # Desde aquí todo va al disco hasta que el procesador se ponga al día
+            payload = ("\n".join(lines) + "\n").encode("utf-8")
+            if self._spill_write - self._spill_read + len(payload) > self.max_spill_bytes:
+                self.stats["dropped"] += len(lines)
+                return
+            if self._spill is None:
+                self._spill = tempfile.TemporaryFile(prefix="mc_console_")
+            self._spill.seek(self._spill_write)
+            self._spill.write(payload)
+            self._spill_write += len(payload)
+            self.stats["spilled_bytes"] += len(payload)
+
+    def _read_spill(self, max_bytes=1024 * 1024):
+        """Siguiente lote del archivo de desbordamiento, o None si no queda nada"""
+        with self._spill_lock:
+            if not self._spill_pending:
+                return None
+            if self._spill_read >= self._spill_write:
+                # Al día: volver a la cola en memoria y reutilizar el archivo
+                if self._spill is not None:
+                    self._spill.seek(0)
+                    self._spill.truncate()
+                self._spill_read = self._spill_write = 0
+                self._spill_pending = False
+                return None
+            self._spill.seek(self._spill_read)
+            data = self._spill.read(min(max_bytes, self._spill_write - self._spill_read))
+            cut = data.rfind(b"\n") + 1
+            self._spill_read += cut
+        return data[:cut].decode("utf-8", errors="replace").split("\n")[:-1]
+
+    def _process_loop(self):
+        try:
+            while True:
+                try:
+                    # La cola siempre tiene lo más antiguo; con datos en disco no esperar
+                    if self._spill_pending:
+                        batch = self._queue.get_nowait()
+                    else:
+                        batch = self._queue.get(timeout=0.25)
+                except queue.Empty:
+                    batch = self._read_spill()
+                    if batch is None:
+                        if self._reader_done.is_set() and self._queue.empty() and not self._spill_pending:
+                            break
+                        continue
+                    self.stats["late"] += len(batch)
+
+                for line in batch:
+                    try:
+                        self.handle_line(line)
+                    except Exception:
+                        self.stats["errors"] += 1
+        finally:
+            if self._spill is not None:
+                self._spill.close()
+            if self.on_close:
+                self.on_close()
+            self.finished.set()
+
+class CommandError(Exception):
+    """El servidor rechazó un comando (la respuesta va en el mensaje)"""
+
+
+class CommandCorrelator:
+    """Asocia comandos enviados por stdin con sus respuestas en la consola.
+
+    El servidor ejecuta los comandos de la consola en orden, así que las
+    peticiones pendientes se guardan en una cola FIFO: cada línea resuelve la
+    petición más antigua cuyo patrón esperado (o de fallo) coincide. Una línea
+    de error genérica solo se atribuye si hay una única petición en vuelo y
+    nadie más ha escrito en la consola cerca de ella (note_foreign); si no, la
+    petición acaba por tiempo en vez de fallar con el error de otro comando.
+    Sin patrón no hay forma de distinguir la respuesta de cualquier otra línea
+    de la consola, así que esas peticiones solo se envían y se resuelven con
+    None. Las peticiones vencidas fallan con TimeoutError desde un único hilo
+    de caducidad.
+    """
+
+    ERROR_PATTERN = re.compile(
+        r"^(?:Unknown or incomplete command|Incorrect argument for command|Unknown (?:item|block|entity|function|effect)|"
+        r"Invalid (?:name or UUID|integer|float|boolean)|Expected (?:whitespace|integer|float|boolean)|"
+        r"You do not have permission)"
+    )
+    # Segundos sin comandos ajenos antes de una petición para atribuirle un error genérico
+    FOREIGN_GRACE = 2.0
+
+    def __init__(self, send_line):
+        self.send_line = send_line
+        # [Future, comando, patrón, vencimiento, patrón de fallo, nº de escrituras ajenas o None]
+        self._pending = deque()
+        self._cond = threading.Condition()
+        self._reaper = None
+        self._foreign_writes = 0
+        self._foreign_at = float("-inf")
+
+    def note_foreign(self):
+        """Otro remitente escribió en la consola: sus errores no son de nuestras peticiones"""
+        with self._cond:
+            self._foreign_writes += 1
+            self._foreign_at = time.monotonic()
+
+    def request(self, command, expect=None, timeout=5.0, fail=None):
+        """Enviar un comando; el Future se resuelve con la línea de respuesta.
+
+        Una línea que cumpla `fail` lo resuelve con CommandError. Sin `expect`
+        el comando solo se envía y el Future se resuelve con None.
+        """
+        future = Future()
+        if not expect:
+            self.note_foreign()
+            if self.send_line(command):
+                future.set_result(None)
+            else:
+                future.set_exception(CommandError("no se pudo enviar el comando"))
+            return future
+        
+        entry = [future, command, re.compile(expect), time.monotonic() + timeout, re.compile(fail) if fail else None, None]
+        with self._cond:
+            if time.monotonic() - self._foreign_at >= self.FOREIGN_GRACE:
+                entry[5] = self._foreign_writes
+            self._pending.append(entry)
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._expire_loop, daemon=True)
+                self._reaper.start()
+            self._cond.notify()
+        
+        # Enviar después de registrar: la respuesta puede llegar enseguida
+        if not self.send_line(command):
+            self._resolve(entry, error=CommandError("no se pudo enviar el comando"))
+        return future
+
+    def _resolve(self, entry, result=None, error=None):
+        with self._cond:
+            try:
+                self._pending.remove(entry)
+            except ValueError:
+                return
+        future = entry[0]
+        if future.done():
+            return
+        if error is not None:
+            future.set_exception(error)
+        else:
+            future.set_result(result)
+
+    def handle_event(self, event):
+        """Suscriptor de ServerEventStream: asignar la línea a una petición"""
+        if not self._pending:
+            return
+        message = event.message
+        is_error = self.ERROR_PATTERN.match(message) is not None
+        with self._cond:
+            target = None
+            error = None
+            for entry in self._pending:
+                if entry[4] is not None and entry[4].search(message):
+                    target, error = entry, CommandError(message)
+                    break
+                if entry[2].search(message):
+                    target = entry
+                    break
+            if target is None and is_error and len(self._pending) == 1:
+                only = self._pending[0]
+                if only[5] is not None and only[5] == self._foreign_writes:
+                    target, error = only, CommandError(message)
+        if target is not None:
+            self._resolve(target, result=message, error=error)
+
+    def _expire_loop(self):
+        while True:
+            expired = []
+            with self._cond:
+                while not self._pending:
+                    self._cond.wait()
+                now = time.monotonic()
+                for entry in self._pending:
+                    if entry[3] <= now:
+                        expired.append(entry)
+                if not expired:
+                    self._cond.wait(min(entry[3] for entry in self._pending) - now)
+            for entry in expired:
+                self._resolve(entry, error=TimeoutError(f"sin respuesta a '{entry[1]}'"))
+
+    def cancel_all(self, reason="servidor detenido"):
+        with self._cond:
+            pending = list(self._pending)
+        for entry in pending:
+            self._resolve(entry, error=CommandError(reason))
+
+class UuidResolver:
+    """Resolución nombre -> UUID con lotes de consulta y caché en usercache.json.
+
+    En modo online consulta el endpoint de perfiles de Mojang (hasta 10
+    nombres por petición, varias peticiones en paralelo sobre una sola
+    requests.Session). Los resultados se guardan en usercache.json con la
+    misma forma que usa el servidor y caducan según expiresOn. En modo
+    offline el UUID se calcula localmente igual que el servidor.
+
+    Un lote que falla no invalida los demás: sus nombres quedan en
+    last_failed ({nombre: error}) hasta la siguiente llamada a resolve().
+    """
+
+    PROFILES_URL = "https://api.mojang.com/profiles/minecraft"
+    BATCH_SIZE = 10
+    EXPIRES_FORMAT = "%Y-%m-%d %H:%M:%S %z"
+
+    def __init__(self, cache_path, profiles_url=None, online=True, session=None,
+                 workers=4, ttl=timedelta(days=30), timeout=10):
+        self.cache_path = Path(cache_path)
+        self.profiles_url = profiles_url or self.PROFILES_URL
+        self.online = online
+        self.workers = workers
+        self.ttl = ttl
+        self.timeout = timeout
+        self._session = session
+        self._lock = threading.Lock()
+        self._cache = None     # nombre en minúsculas -> {"name", "uuid", "expiresOn"}
+        self._missing = {}     # nombre en minúsculas -> instante hasta el que no reintentar
+        self.last_failed = {}
+
+    @property
+    def session(self):
+        if self._session is None:
+            session = requests.Session()
+            adapter = requests.adapters.HTTPAdapter(pool_connections=1, pool_maxsize=self.workers)
+            session.mount("https://", adapter)
+            session.mount("http://", adapter)
+            self._session = session
+        return self._session
+
+    @staticmethod
+    def offline_uuid(name):
+        """UUID de un jugador en modo offline: md5("OfflinePlayer:" + nombre), versión 3"""
+        digest = hashlib.md5(f"OfflinePlayer:{name}".encode("utf-8")).digest()
+        return str(uuid.UUID(bytes=digest, version=3))
+
+    @staticmethod
+    def _format_uuid(raw):
+        return str(uuid.UUID(raw))
+
+    def _load(self):
+        if self._cache is not None:
+            return self._cache
+        cache = {}
+        try:
+            with open(self.cache_path, "r", encoding="utf-8") as f:
+                entries = json.load(f)
+        except (OSError, ValueError):
+            entries = []
+        for entry in entries:
+            if isinstance(entry, dict) and entry.get("name") and entry.get("uuid"):
+                cache[entry["name"].lower()] = entry
+        self._cache = cache
+        return cache
+
+    def _expired(self, entry, now):
+        try:
+            return datetime.strptime(entry.get("expiresOn", ""), self.EXPIRES_FORMAT) <= now
+        except ValueError:
+            return True
+
+    def save(self):
+        """Escribir la caché en usercache.json (archivo temporal + os.replace)"""
+        with self._lock:
+            entries = list(self._load().values())
+        entries.sort(key=lambda entry: entry.get("expiresOn", ""), reverse=True)
+        tmp_path = self.cache_path.with_name(self.cache_path.name + ".tmp")
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(entries, f, separators=(",", ":"))
+        os.replace(tmp_path, self.cache_path)
+
+    def _lookup_batch(self, names):
+        """POST de hasta 10 nombres; reintenta con espera si hay límite de peticiones"""
+        for attempt in range(4):
+            response = self.session.post(self.profiles_url, json=names, timeout=self.timeout)
+            if response.status_code == 429:
+                time.sleep(float(response.headers.get("Retry-After", 2 ** attempt)))
+                continue
+            if response.status_code == 204:
+                return []
+            response.raise_for_status()
+            return response.json()
+        raise requests.HTTPError("límite de peticiones de la API de perfiles")
+
+    def resolve(self, names):
+        """Resolver muchos nombres. Devuelve {nombre en minúsculas: {"name", "uuid"}};
+        los que no existen no aparecen"""
+        names = list(dict.fromkeys(name.strip() for name in names if name and name.strip()))
+        self.last_failed = {}
+        if not self.online:
+            return {name.lower(): {"name": name, "uuid": self.offline_uuid(name)} for name in names}
+
+        now = datetime.now().astimezone()
+        results = {}
+        pending = []
+        with self._lock:
+            cache = self._load()
+            for name in names:
+                key = name.lower()
+                entry = cache.get(key)
+                if entry is not None and not self._expired(entry, now):
+                    results[key] = {"name": entry["name"], "uuid": entry["uuid"]}
+                elif self._missing.get(key, 0) > time.time():
+                    continue
+                else:
+                    pending.append(name)
+
+        if not pending:
+            return results
+
+        batches = [pending[i:i + self.BATCH_SIZE] for i in range(0, len(pending), self.BATCH_SIZE)]
+        expires = (now + self.ttl).strftime(self.EXPIRES_FORMAT)
+        failed = {}
+        with ThreadPoolExecutor(max_workers=self.workers) as executor:
+            futures = [(batch, executor.submit(self._lookup_batch, batch)) for batch in batches]
+            for batch, future in futures:
+                try:
+                    profiles = future.result()
+                except (requests.RequestException, ValueError) as e:
+                    # Se conservan los lotes que sí respondieron; estos se reintentan la próxima vez
+                    failed.update((name, e) for name in batch)
+                    continue
+                found = set()
+                with self._lock:
+                    for profile in profiles:
+                        entry = {
+                            "name": profile["name"],
+                            "uuid": self._format_uuid(profile["id"]),
+                            "expiresOn": expires
+                        }
+                        key = profile["name"].lower()
+                        self._cache[key] = entry
+                        results[key] = {"name": entry["name"], "uuid": entry["uuid"]}
+                        found.add(key)
+                    # No volver a preguntar por nombres inexistentes durante un rato
+                    for name in batch:
+                        if name.lower() not in found:
+                            self._missing[name.lower()] = time.time() + 600
+
+        self.last_failed = failed
+        try:
+            self.save()
+        except OSError:
+            pass
+        return results
+
+    def resolve_one(self, name):
+        """UUID de un jugador o None si no existe; si falla la consulta lanza su error"""
+        entry = self.resolve([name]).get(name.strip().lower())
+        if entry is None and self.last_failed:
+            raise next(iter(self.last_failed.values()))
+        return entry["uuid"] if entry else None
+
+BAN_TIME_FORMAT = "%Y-%m-%d %H:%M:%S %z"
+
+def format_ban_time(moment=None):
+    """Fecha en el formato de los archivos de baneos del servidor (yyyy-MM-dd HH:mm:ss Z)"""
+    return (moment or datetime.now().astimezone()).strftime(BAN_TIME_FORMAT)
+
+def parse_ban_expiry(value):
+    """Instante (epoch) en que caduca un baneo, o None si es "forever" o no se entiende"""
+    if not value or value == "forever":
+        return None
+    try:
+        return datetime.strptime(value, BAN_TIME_FORMAT).timestamp()
+    except ValueError:
+        return None
+
+
+class TimerWheel:
+    """Rueda de temporizadores con ranuras por hash.
+
+    Cada clave cae en la ranura de su tick de vencimiento; avanzar solo mira
+    las ranuras de los ticks transcurridos, nunca todas las claves.
+    """
+
+    def __init__(self, tick_seconds=60, slots=1024, now=None):
+        self.tick_seconds = tick_seconds
+        self._slots = [dict() for _ in range(slots)]
+        self._slot_of = {}
+        self._tick = int((time.time() if now is None else now) // tick_seconds)
+
+    def __len__(self):
+        return len(self._slot_of)
+
+    def schedule(self, key, when):
+        self.cancel(key)
+        tick = max(int(when // self.tick_seconds), self._tick + 1)
+        slot = tick % len(self._slots)
+        self._slots[slot][key] = when
+        self._slot_of[key] = slot
+
+    def cancel(self, key):
+        slot = self._slot_of.pop(key, None)
+        if slot is not None:
+            self._slots[slot].pop(key, None)
+
+    def advance(self, now=None):
+        """Devolver las claves vencidas hasta `now`"""
+        now = time.time() if now is None else now
+        target = int(now // self.tick_seconds)
+        if target <= self._tick:
+            return []
+        # Tras una pausa larga basta con recorrer cada ranura una vez
+        ticks = range(self._tick + 1, min(target, self._tick + len(self._slots)) + 1)
+        due = []
+        for tick in ticks:
+            slot = self._slots[tick % len(self._slots)]
+            for key, when in list(slot.items()):
+                if when <= now:
+                    del slot[key]
+                    del self._slot_of[key]
+                    due.append(key)
+        self._tick = target
+        return due
+
+
+class BanEngine:
+    """Baneos de IP y rangos CIDR con índice de intervalos ordenado.
+
+    Las redes se guardan por objeto ipaddress; para consultar se mantiene, por
+    familia, la unión de intervalos [inicio, fin] ordenada, y bisect da la
+    pertenencia en O(log n). Las IP sueltas son las que entiende el servidor
+    (banned-ips.json); los rangos los aplica el panel al conectarse un jugador.
+    """
+
+    def __init__(self):
+        self.entries = {}
+        self._index = None
+        self._lock = threading.Lock()
+        self.wheel = TimerWheel()
+
+    def __len__(self):
+        return len(self.entries)
+
+    @staticmethod
+    def parse_network(text):
+        return ipaddress.ip_network(text.strip(), strict=False)
+
+    @staticmethod
+    def is_single(network):
+        return network.prefixlen == network.max_prefixlen
+
+    def _make_entry(self, target, reason="Baneado por un operador.", source="Panel de Administración",
+                    expires="forever", created=None):
+        network = self.parse_network(target) if isinstance(target, str) else target
+        entry = {
+            "ip" if self.is_single(network) else "cidr": str(network.network_address if self.is_single(network) else network),
+            "created": created or format_ban_time(),
+            "source": source,
+            "expires": expires or "forever",
+            "reason": reason
+        }
+        return network, entry
+
+    @staticmethod
+    def _place(entries, wheel, network, entry):
+        entries[network] = entry
+        expiry = parse_ban_expiry(entry["expires"])
+        if expiry is not None:
+            wheel.schedule(network, expiry)
+        else:
+            wheel.cancel(network)
+
+    def add(self, target, **fields):
+        network, entry = self._make_entry(target, **fields)
+        with self._lock:
+            self._place(self.entries, self.wheel, network, entry)
+            self._index = None
+        return network
+
+    def add_many(self, targets, **fields):
+        """Añadir muchas IP/rangos; devuelve (añadidos, inválidos)"""
+        added, invalid = 0, []
+        for target in targets:
+            try:
+                network = self.parse_network(target)
+            except ValueError:
+                invalid.append(target)
+                continue
+            with self._lock:
+                is_new = network not in self.entries
+            added += is_new
+            self.add(network, **fields)
+        return added, invalid
+
+    def remove(self, target):
+        network = self.parse_network(target) if isinstance(target, str) else target
+        with self._lock:
+            entry = self.entries.pop(network, None)
+            if entry is not None:
+                self._index = None
+                self.wheel.cancel(network)
+        return entry
+
+    def _build_index(self):
+        index = {4: ([], []), 6: ([], [])}
+        networks = sorted(self.entries, key=lambda n: (n.version, int(n.network_address), -n.prefixlen))
+        for network in networks:
+            starts, ends = index[network.version]
+            start, end = int(network.network_address), int(network.broadcast_address)
+            if ends and start <= ends[-1] + 1:
+                ends[-1] = max(ends[-1], end)
+            else:
+                starts.append(start)
+                ends.append(end)
+        self._index = index
+        return index
+
+    def match(self, ip):
+        """Entrada que cubre la IP (la más específica), o None"""
+        try:
+            address = ipaddress.ip_address(ip.strip().strip("[]"))
+        except ValueError:
+            return None
+        if address.version == 6 and address.ipv4_mapped:
+            address = address.ipv4_mapped
+        with self._lock:
+            index = self._index or self._build_index()
+            starts, ends = index[address.version]
+            value = int(address)
+            position = bisect.bisect_right(starts, value) - 1
+            if position < 0 or ends[position] < value:
+                return None
+            # Dentro de la unión: buscar la red concreta de más específica a menos
+            for prefix in range(address.max_prefixlen, -1, -1):
+                network = ipaddress.ip_network((address, prefix), strict=False)
+                entry = self.entries.get(network)
+                if entry is not None:
+                    return entry
+        return None
+
+    def snapshot(self):
+        """Copia de las entradas {red: entrada}, coherente aunque otro hilo recargue"""
+        with self._lock:
+            return dict(self.entries)
+
+    def singles(self):
+        return [entry for network, entry in self.snapshot().items() if self.is_single(network)]
+
+    def ranges(self):
+        return [entry for network, entry in self.snapshot().items() if not self.is_single(network)]
+
+    def load(self, single_entries, range_entries):
+        """Sustituir todas las entradas. Se construye aparte y se cambia de golpe bajo el lock"""
+        entries = {}
+        wheel = TimerWheel()
+        for entry in list(single_entries) + list(range_entries):
+            target = entry.get("ip") or entry.get("cidr")
+            if not target:
+                continue
+            try:
+                network, entry = self._make_entry(
+                    target,
+                    reason=entry.get("reason", "Baneado por un operador."),
+                    source=entry.get("source", "Server"),
+                    expires=entry.get("expires", "forever"),
+                    created=entry.get("created")
+                )
+            except ValueError:
+                continue
+            self._place(entries, wheel, network, entry)
+        with self._lock:
+            self.entries = entries
+            self.wheel = wheel
+            self._index = None
+
+    def diff(self, server_entries):
+        """Diferencias con la lista del servidor: (entradas a banear, IP a perdonar)"""
+        server_ips = {entry.get("ip") for entry in server_entries if entry.get("ip")}
+        ours = {entry["ip"]: entry for entry in self.singles()}
+        to_ban = [entry for ip, entry in ours.items() if ip not in server_ips]
+        to_pardon = sorted(server_ips - set(ours))
+        return to_ban, to_pardon
+
+    def expire(self, now=None):
+        """Quitar los baneos vencidos; devuelve sus entradas"""
+        with self._lock:
+            due = self.wheel.advance(now)
+        expired = []
+        for network in due:
+            entry = self.remove(network)
+            if entry is not None:
+                expired.append(entry)
+        return expired
+
+    @staticmethod
+    def read_blocklist(path):
+        """Leer una lista de bloqueo: JSON (banned-ips.json) o texto con una IP/CIDR por línea"""
+        with open(path, "r", encoding="utf-8") as f:
+            content = f.read()
+        if content.lstrip().startswith("["):
+            return [entry.get("ip") or entry.get("cidr") for entry in json.loads(content) if isinstance(entry, dict)]
+        targets = []
+        for line in content.splitlines():
+            line = line.split("#", 1)[0].strip()
+            if line:
+                targets.append(line.split()[0].rstrip(",;"))
+        return targets
+
+    def export_lines(self):
+        return "\n".join(entry.get("ip") or entry.get("cidr") for entry in self.snapshot().values()) + "\n"
+
+def atomic_write_text(path, text, encoding="utf-8"):
+    """Escribir un archivo de texto de forma atómica (archivo temporal + os.replace)"""
+    path = Path(path)
+    fd, tmp_name = tempfile.mkstemp(prefix=path.name + ".", suffix=".tmp", dir=path.parent)
+    try:
+        with os.fdopen(fd, "w", encoding=encoding, newline="") as f:
+            f.write(text)
+            f.flush()
+            os.fsync(f.fileno())
+        if path.exists():
+            # mkstemp crea el archivo con permisos 0600: conservar los del original
+            shutil.copymode(path, tmp_name)
+        os.replace(tmp_name, path)
+    except BaseException:
+        try:
+            os.unlink(tmp_name)
+        except OSError:
+            pass
+        raise
+
+
+class JsonConfigList:
+    """Lista JSON del servidor (ops, whitelist, baneos) parseada en memoria.
+
+    Se indexa por los campos de `keys` (sin distinguir mayúsculas) y solo se
+    vuelve a leer cuando cambian el mtime o el tamaño del archivo. Cada cambio
+    relee, modifica y escribe con reemplazo atómico, y devuelve qué cambió para
+    que al servidor solo se le envíe la diferencia.
+    """
+
+    def __init__(self, path, keys=("name", "uuid")):
+        self.path = Path(path)
+        self.keys = keys
+        self._entries = []
+        self._index = {key: {} for key in keys}
+        self._stat = None
+        self.loaded = False
+        self._lock = threading.RLock()
+
+    def _file_stat(self):
+        try:
+            stat = self.path.stat()
+        except OSError:
+            return None
+        return (stat.st_mtime_ns, stat.st_size)
+
+    def _reindex(self):
+        self._index = {key: {} for key in self.keys}
+        for entry in self._entries:
+            for key in self.keys:
+                value = entry.get(key)
+                if value:
+                    self._index[key][str(value).lower()] = entry
+
+    def refresh(self):
+        """Releer si el archivo cambió. Devuelve True si se recargó"""
+        stat = self._file_stat()
+        with self._lock:
+            if stat == self._stat:
+                self.loaded = True
+                return False
+            if stat is None:
+                entries = []
+            else:
+                try:
+                    with open(self.path, "r", encoding="utf-8") as f:
+                        entries = json.load(f)
+                except (OSError, ValueError):
+                    # Probablemente el servidor lo está escribiendo: se reintenta en el próximo sondeo
+                    return False
+            self._entries = [entry for entry in entries if isinstance(entry, dict)] if isinstance(entries, list) else []
+            self._reindex()
+            self._stat = stat
+            self.loaded = True
+            return True
+
+    def entries(self):
+        with self._lock:
+            self.refresh()
+            return [dict(entry) for entry in self._entries]
+
+    def __len__(self):
+        with self._lock:
+            self.refresh()
+            return len(self._entries)
+
+    def get(self, value, key=None):
+        key = key or self.keys[0]
+        with self._lock:
+            self.refresh()
+            entry = self._index[key].get(str(value).lower())
+            return dict(entry) if entry is not None else None
+
+    def _write(self):
+        atomic_write_text(self.path, json.dumps(self._entries, indent=2, ensure_ascii=False))
+        self._stat = self._file_stat()
+
+    def upsert_many(self, new_entries):
+        """Añadir o actualizar entradas por la primera clave. Devuelve (añadidas, modificadas)"""
+        key = self.keys[0]
+        added, changed = [], []
+        with self._lock:
+            self.refresh()
+            for entry in new_entries:
+                current = self._index[key].get(str(entry.get(key, "")).lower())
+                if current is None:
+                    self._entries.append(dict(entry))
+                    added.append(entry)
+                elif any(current.get(field) != value for field, value in entry.items()):
+                    current.update(entry)
+                    changed.append(entry)
+            if added or changed:
+                self._reindex()
+                self._write()
+        return added, changed
+
+    def upsert(self, entry):
+        """Añadir o actualizar una entrada. Devuelve "added", "changed" o None si no cambió nada"""
+        added, changed = self.upsert_many([entry])
+        return "added" if added else "changed" if changed else None
+
+    def remove_many(self, values, key=None):
+        key = key or self.keys[0]
+        wanted = {str(value).lower() for value in values}
+        with self._lock:
+            self.refresh()
+            removed = [entry for entry in self._entries if str(entry.get(key, "")).lower() in wanted]
+            if removed:
+                self._entries = [entry for entry in self._entries if str(entry.get(key, "")).lower() not in wanted]
+                self._reindex()
+                self._write()
+        return removed
+
+    def remove(self, value, key=None):
+        removed = self.remove_many([value], key)
+        return removed[0] if removed else None
+
+    def replace(self, new_entries):
+        """Sustituir la lista entera. Devuelve (añadidas, eliminadas) según la primera clave"""
+        key = self.keys[0]
+        with self._lock:
+            self.refresh()
+            before = {str(entry.get(key, "")).lower(): entry for entry in self._entries}
+            after = {str(entry.get(key, "")).lower(): entry for entry in new_entries}
+            if list(before.values()) == list(after.values()):
+                return [], []
+            self._entries = [dict(entry) for entry in new_entries]
+            self._reindex()
+            self._write()
+        added = [entry for name, entry in after.items() if name not in before]
+        removed = [entry for name, entry in before.items() if name not in after]
+        return added, removed
+
+
+class PropertiesFile:
+    """server.properties editable sin perder comentarios, orden ni escapes.
+
+    Se guardan las líneas originales; al cambiar un valor solo se reescribe su
+    línea lógica (incluidas las continuaciones con barra invertida), y las
+    propiedades nuevas se añaden al final.
+    """
+
+    ESCAPES = {"t": "\t", "n": "\n", "r": "\r", "f": "\f"}
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._lines = []
+        self._spans = {}
+        self._values = {}
+        self._encoding = "utf-8"
+        self._stat = None
+        self.loaded = False
+        self._lock = threading.RLock()
+
+    @classmethod
+    def unescape(cls, text):
+        out = []
+        i = 0
+        while i < len(text):
+            char = text[i]
+            if char == "\\" and i + 1 < len(text):
+                following = text[i + 1]
+                if following == "u" and re.fullmatch(r"[0-9a-fA-F]{4}", text[i + 2:i + 6]):
+                    out.append(chr(int(text[i + 2:i + 6], 16)))
+                    i += 6
+                    continue
+                out.append(cls.ESCAPES.get(following, following))
+                i += 2
+                continue
+            out.append(char)
+            i += 1
+        return "".join(out)
+
+    @staticmethod
+    def escape(text, is_key=False):
+        out = []
+        for position, char in enumerate(text):
+            if char == "\\":
+                out.append("\\\\")
+            elif char in "=:" or (is_key and char == " ") or (position == 0 and char in " #!"):
+                out.append("\\" + char)
+            elif char == "\n":
+                out.append("\\n")
+            elif char == "\r":
+                out.append("\\r")
+            elif char == "\t":
+                out.append("\\t")
+            else:
+                out.append(char)
+        return "".join(out)
+
+    @classmethod
+    def parse_logical(cls, logical):
+        """Separar clave y valor de una línea lógica (sin continuaciones)"""
+        text = logical.lstrip(" \t\f")
+        i = 0
+        while i < len(text) and text[i] not in "=: \t\f":
+            i += 2 if text[i] == "\\" else 1
+        key = text[:i]
+        rest = text[i:].lstrip(" \t\f")
+        if rest[:1] in ("=", ":"):
+            rest = rest[1:].lstrip(" \t\f")
+        return cls.unescape(key), cls.unescape(rest)
+
+    @staticmethod
+    def _continues(line):
+        stripped = line.rstrip("\r\n")
+        return (len(stripped) - len(stripped.rstrip("\\"))) % 2 == 1
+
+    def _parse(self, text):
+        self._lines = text.splitlines(keepends=True)
+        self._spans = {}
+        self._values = {}
+        i = 0
+        while i < len(self._lines):
+            start = i
+            stripped = self._lines[i].lstrip(" \t\f")
+            if not stripped.strip() or stripped[0] in "#!":
+                i += 1
+                continue
+            parts = [self._lines[i].rstrip("\r\n")]
+            while self._continues(self._lines[i]) and i + 1 < len(self._lines):
+                i += 1
+                parts[-1] = parts[-1][:-1]
+                parts.append(self._lines[i].rstrip("\r\n").lstrip(" \t\f"))
+            i += 1
+            key, value = self.parse_logical("".join(parts))
+            self._spans[key] = (start, i)
+            self._values[key] = value
+
+    def refresh(self):
+        """Releer si el archivo cambió. Devuelve True si se recargó"""
+        try:
+            stat = self.path.stat()
+            stat = (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            stat = None
+        with self._lock:
+            if stat == self._stat:
+                self.loaded = True
+                return False
+            if stat is None:
+                self._parse("")
+            else:
+                data = self.path.read_bytes()
+                try:
+                    text, self._encoding = data.decode("utf-8"), "utf-8"
+                except UnicodeDecodeError:
+                    # Java guarda Properties en ISO-8859-1
+                    text, self._encoding = data.decode("latin-1"), "latin-1"
+                self._parse(text)
+            self._stat = stat
+            self.loaded = True
+            return True
+
+    def as_dict(self):
+        with self._lock:
+            self.refresh()
+            return dict(self._values)
+
+    def get(self, key, default=None):
+        with self._lock:
+            self.refresh()
+            return self._values.get(key, default)
+
+    def __contains__(self, key):
+        with self._lock:
+            self.refresh()
+            return key in self._values
+
+    def update(self, changes):
+        """Aplicar {clave: valor}; solo se tocan las líneas que cambian. Devuelve las claves cambiadas"""
+        with self._lock:
+            self.refresh()
+            changed = [key for key, value in changes.items() if self._values.get(key) != str(value)]
+            if not changed:
+                return []
+            newline = "\r\n" if self._lines and self._lines[0].endswith("\r\n") else "\n"
+            # De abajo arriba para que los tramos anteriores sigan siendo válidos
+            for key in sorted((k for k in changed if k in self._spans), key=lambda k: self._spans[k][0], reverse=True):
+                start, end = self._spans[key]
+                self._lines[start:end] = [f"{self.escape(key, True)}={self.escape(str(changes[key]))}{newline}"]
+            if self._lines and not self._lines[-1].endswith(("\n", "\r")):
+                self._lines[-1] += newline
+            for key in changed:
+                if key not in self._spans:
+                    self._lines.append(f"{self.escape(key, True)}={self.escape(str(changes[key]))}{newline}")
+            text = "".join(self._lines)
+            encoding = self._encoding
+            if encoding == "latin-1":
+                text = "".join(char if ord(char) < 256 else f"\\u{ord(char):04x}" for char in text)
+            atomic_write_text(self.path, text, encoding)
+            self._stat = None
+            self.refresh()
+            return changed
+
+
+class ConfigStore:
+    """Archivos de configuración del servidor en memoria, con vigilancia por mtime"""
+
+    LIST_KEYS = {
+        "ops.json": ("name", "uuid"),
+        "whitelist.json": ("name", "uuid"),
+        "banned-players.json": ("name", "uuid"),
+        "banned-ips.json": ("ip",),
+        "banned-ip-ranges.json": ("cidr",),
+        "banned-ip-expiries.json": ("ip",),
+    }
+
+    def __init__(self, config_files):
+        self.lists = {
+            name: JsonConfigList(config_files[name], keys)
+            for name, keys in self.LIST_KEYS.items() if name in config_files
+        }
+        self.properties = PropertiesFile(config_files["server.properties"])
+        self._listeners = []
+
+    def __getitem__(self, name):
+        return self.lists[name]
+
+    def add_listener(self, callback):
+        """callback(nombre) cuando un archivo cambia por fuera del panel"""
+        self._listeners.append(callback)
+
+    def poll(self):
+        """Comprobar mtimes y recargar lo que haya cambiado. Devuelve los nombres recargados"""
+        # La primera lectura de cada archivo no cuenta como cambio
+        files = list(self.lists.items()) + [("server.properties", self.properties)]
+        changed = []
+        for name, config in files:
+            was_loaded = config.loaded
+            if config.refresh() and was_loaded:
+                changed.append(name)
+        for name in changed:
+            for callback in list(self._listeners):
+                try:
+                    callback(name)
+                except Exception:
+                    pass
+        return changed
+
+class OutputWaiter:
+    """Espera a que aparezca en la salida del servidor una línea que cumpla un patrón"""
+
+    def __init__(self, pattern):
+        self.pattern = re.compile(pattern)
+        self.event = threading.Event()
+        self.line = None
+
+    def matches(self, line):
+        return self.pattern.search(line) is not None
+
 class MinecraftServerManager:
     def __init__(self):
         self.server_dir = Path("C:/MinecraftServer")
@@ -46,6 +3363,7 @@ class MinecraftServerManager:
         self.world_dir = self.server_dir / "world"
         self.plugins_dir = self.server_dir / "plugins"
         self.backups_dir = self.server_dir / "backups"
+        self.backup_store = IncrementalBackupStore(self.backups_dir)
         
         # Archivos de configuración
         self.config_files = {
@@ -53,8 +3371,12 @@ class MinecraftServerManager:
             "ops.json": self.server_dir / "ops.json",
             "whitelist.json": self.server_dir / "whitelist.json",
             "banned-players.json": self.server_dir / "banned-players.json",
-            "banned-ips.json": self.server_dir / "banned-ips.json"
+            "banned-ips.json": self.server_dir / "banned-ips.json",
+            "banned-ip-ranges.json": self.server_dir / "banned-ip-ranges.json",
+            "banned-ip-expiries.json": self.server_dir / "banned-ip-expiries.json"
         }
+        self.config_store = ConfigStore(self.config_files)
+        self.config_store.add_listener(self._config_file_changed)
         
         # Parámetros Java optimizados para Ryzen 7 5700 con 32GB RAM
         self.java_args = [
@@ -73,11 +3395,98 @@ class MinecraftServerManager:
         
         self.server_process = None
         self.server_running = False
-        self.last_output = []
+        self.events = ServerEventStream()
+        self.player_tracker = PlayerTracker()
+        self.events.subscribe(self.player_tracker.handle_event, PlayerTracker.KINDS)
+        self._server_psutil = None
+        self.metrics = MetricsSampler()
+        self.metrics.add_source("cpu", 1, self._sample_cpu)
+        self.metrics.add_source("memory", 2, psutil.virtual_memory)
+        self.metrics.add_source("disk", 30, self._sample_disk)
+        self.metrics.add_source("process", 2, self._sample_server_process)
+        self.metrics.add_source("local_ip", 300, self._lookup_local_ip)
+        self.metrics.add_source("zerotier_ip", 60, self._lookup_zerotier_ip)
+        
+        # Historial de métricas (1 s / 1 min / 1 h) que sobrevive a reinicios del panel
+        self.timeseries = TimeSeriesStore(
+            self.server_dir / "panel_metrics.tsdb",
+            ("tps", "mspt", "players", "rss", "cpu", "disk_read", "disk_write")
+        )
+        self.timeseries_save_interval = 60
+        self._timeseries_saved_at = time.time()
+        self._last_disk_io = None
+
+        # Tareas periódicas con efectos (historial, tick query, baneos, config):
+        # MetricsSampler solo muestrea, estas corren en su propio hilo
+        self.jobs = schedule.Scheduler()
+        self._jobs_stop = threading.Event()
+        self._jobs_thread = None
+        self.add_job(1, self._record_history)
+        
+        # Salud del tick (TPS/MSPT): avisos de consola + "tick query" periódico
+        self.tick_probe = TickProbe()
+        self.events.subscribe(self.tick_probe.handle_event, ("lag", "tick"))
+        self.tick_query_interval = 15
+        self.tick_query_supported = None
+        self.add_job(self.tick_query_interval, self._poll_tick_query)
+        
+        # Registro de GC de la JVM (opcional): se activa al arrancar el servidor
+        self.gc_logging = False
+        self.gc_log_file = self.server_dir / "logs" / "gc.log"
+        self.gc_parser = GcLogParser()
+        self.gc_tail = LogTail(self.gc_log_file, self.gc_parser.feed)
+        self.metrics.add_source("gc", 2, self._poll_gc_log)
+        
+        # Exportador OpenMetrics opcional (Prometheus)
+        self.metrics_exporter = None
+        self.metrics_exporter_host = "127.0.0.1"
+        self.metrics_exporter_port = 9225
+        
+        # Índice de búsqueda de logs archivados
+        self.log_index = LogIndex(self.server_dir / "logs" / "panel_log_index.db", self.server_dir / "logs")
+        self.rcon = None
+        self._rcon_settings = None
+        self._rcon_retry_at = 0
         self.max_output_lines = 100
+        self.last_output = deque(maxlen=self.max_output_lines)
+        self.output_pump = None
         self.admin_pin = None
         self.security_enabled = False
         
+        # Backups: "incremental" (almacén deduplicado) o "zip" (archivo completo)
+        self.backup_mode = "incremental"
+        self.max_backups = 10
+        self.backup_workers = os.cpu_count() or 4
+        self.backup_policy = DEFAULT_BACKUP_POLICY
+        self.last_backup_stats = None
+        self.backup_results = {"ok": 0, "error": 0}
+        self.backup_flush_timeout = 120
+        self.max_pre_restore_copies = 3
+        self.world_tool_workers = os.cpu_count() or 4
+        self._backup_lock = threading.Lock()
+        
+        # Esperas activas sobre la salida del servidor (ver expect_output)
+        self._output_waiters = []
+        self._output_lock = threading.Lock()
+        self._stdin_lock = threading.Lock()
+        self.events.subscribe(self._notify_output_waiters)
+        
+        # Peticiones comando -> respuesta por la consola
+        self.command_correlator = CommandCorrelator(self._write_console_command)
+        self.events.subscribe(self.command_correlator.handle_event)
+        self.command_window = 64
+        
+        # Baneos de IP/CIDR con caducidad; los rangos se aplican al conectarse
+        self.ban_engine = BanEngine()
+        self.load_ban_engine()
+        self.events.subscribe(self._enforce_ip_bans, ("login",))
+        self.add_job(60, self._expire_bans)
+        self.add_job(2, self.config_store.poll)
+        
+        # UUID de jugadores (API de perfiles de Mojang o cálculo offline)
+        self.profiles_url = UuidResolver.PROFILES_URL
+        self._uuid_resolver = None
+        
         # Crear directorios necesarios
         self.create_directories()
         
@@ -106,6 +3515,34 @@ class MinecraftServerManager:
         scheduler_thread = threading.Thread(target=run_scheduler, daemon=True)
         scheduler_thread.start()
     
+    def add_job(self, interval, func):
+        """Registrar una tarea periódica: func() se llama cada `interval` segundos"""
+        def run():
+            # Como en MetricsSampler: un fallo puntual no debe parar el hilo ni ensuciar el menú
+            try:
+                func()
+            except Exception:
+                pass
+        self.jobs.every(interval).seconds.do(run)
+    
+    def start_jobs(self):
+        """Arrancar el hilo de tareas periódicas"""
+        if self._jobs_thread is not None:
+            return
+        self._jobs_stop.clear()
+        
+        def run_jobs():
+            while not self._jobs_stop.is_set():
+                self.jobs.run_pending()
+                self._jobs_stop.wait(max(0.0, min(self.jobs.idle_seconds or 1.0, 1.0)))
+        
+        self._jobs_thread = threading.Thread(target=run_jobs, daemon=True)
+        self._jobs_thread.start()
+    
+    def stop_jobs(self):
+        self._jobs_stop.set()
+        self._jobs_thread = None
+    
     def authenticate(self):
         """Sistema de autenticación con PIN"""
         if not self.security_enabled:
@@ -128,15 +3565,15 @@ class MinecraftServerManager:
         console.print("🚫 Acceso denegado", style="bold red")
         return False
     
-    def get_local_ip(self):
-        """Obtener IP local"""
+    def _lookup_local_ip(self):
+        """Resolver la IP local (lento: consulta DNS)"""
         try:
             return socket.gethostbyname(socket.gethostname())
         except:
             return "No disponible"
     
-    def get_zerotier_ip(self):
-        """Obtener IP de ZeroTier"""
+    def _lookup_zerotier_ip(self):
+        """Consultar la IP de ZeroTier (lento: lanza zerotier-cli)"""
         try:
             result = subprocess.run(
                 ["zerotier-cli", "listnetworks"],
@@ -149,7 +3586,6 @@ class MinecraftServerManager:
                 for line in lines:
                     if "OK" in line:
                         # Buscar IP en la línea
-                        import re
                         ip_match = re.search(r'(\d+\.\d+\.\d+\.\d+)', line)
                         if ip_match:
                             return ip_match.group(1)
@@ -157,24 +3593,240 @@ class MinecraftServerManager:
         except:
             return "ZeroTier no disponible"
     
-    def get_system_stats(self):
-        """Obtener estadísticas del sistema"""
-        try:
-            cpu_percent = psutil.cpu_percent(interval=1)
-            memory = psutil.virtual_memory()
-            disk = psutil.disk_usage('C:/')
-            
+    # Valor mostrado hasta que el hilo del muestreador complete la consulta
+    IP_PENDING = "Consultando…"
+    
+    def get_local_ip(self):
+        """Obtener IP local (cacheada por el muestreador; nunca bloquea)"""
+        ip = self.metrics.get("local_ip")
+        return ip if ip is not None else self.IP_PENDING
+    
+    def get_zerotier_ip(self):
+        """Obtener IP de ZeroTier (cacheada por el muestreador; nunca bloquea)"""
+        ip = self.metrics.get("zerotier_ip")
+        return ip if ip is not None else self.IP_PENDING
+    
+    def _sample_cpu(self):
+        # interval=None compara con la llamada anterior en lugar de dormir
+        return psutil.cpu_percent(interval=None)
+    
+    def _sample_disk(self):
+        path = self.server_dir if self.server_dir.exists() else Path(self.server_dir.anchor or os.sep)
+        return psutil.disk_usage(str(path))
+    
+    def _sample_server_process(self):
+        """Estadísticas del proceso Java del servidor"""
+        if not self.server_running or not self.server_process:
+            self._server_psutil = None
+            return None
+        
+        # Reutilizar el mismo psutil.Process para que cpu_percent tenga referencia
+        if self._server_psutil is None or self._server_psutil.pid != self.server_process.pid:
+            self._server_psutil = psutil.Process(self.server_process.pid)
+            self._server_psutil.cpu_percent(interval=None)
+        
+        process = self._server_psutil
+        with process.oneshot():
             return {
-                "cpu": cpu_percent,
-                "memory_used": memory.used,
-                "memory_total": memory.total,
-                "memory_percent": memory.percent,
-                "disk_used": disk.used,
-                "disk_total": disk.total,
-                "disk_percent": (disk.used / disk.total) * 100
+                "pid": process.pid,
+                "cpu": process.cpu_percent(interval=None),
+                "rss": process.memory_info().rss,
+                "threads": process.num_threads(),
+                "started": process.create_time()
             }
-        except:
+    
+    def _record_history(self):
+        """Guardar en la serie temporal el último snapshot de métricas"""
+        snapshot = self.metrics.snapshot
+        process = snapshot.get("process")
+        tick = self.tick_probe.snapshot
+        values = {
+            "tps": tick["tps"] if self.server_running else None,
+            "mspt": tick["mspt"] if self.server_running else None,
+            "cpu": snapshot.get("cpu"),
+            "players": len(self.player_tracker) if self.server_running else 0,
+            "rss": process["rss"] / (1024 * 1024) if process else None
+        }
+        
+        # Tasa de E/S de disco a partir de la diferencia de contadores
+        try:
+            io = psutil.disk_io_counters()
+        except Exception:
+            io = None
+        now = time.monotonic()
+        if io is not None and self._last_disk_io is not None:
+            prev_io, prev_time = self._last_disk_io
+            elapsed = now - prev_time
+            if elapsed > 0:
+                values["disk_read"] = (io.read_bytes - prev_io.read_bytes) / elapsed / (1024 * 1024)
+                values["disk_write"] = (io.write_bytes - prev_io.write_bytes) / elapsed / (1024 * 1024)
+        self._last_disk_io = (io, now) if io is not None else None
+        
+        self.timeseries.record(values)
+        if time.time() - self._timeseries_saved_at >= self.timeseries_save_interval:
+            self.save_timeseries()
+        return None
+    
+    def _poll_tick_query(self):
+        """Pedir "tick query" al servidor por RCON; su respuesta la procesa la sonda de ticks.
+
+        Sin RCON no se pregunta: escribirlo en la consola cada pocos segundos la
+        llenaría de ruido. Quedan los avisos "Can't keep up!".
+        """
+        if not self.server_running or self.tick_query_supported is False:
+            return None
+        
+        rcon = self.get_rcon()
+        if rcon is None:
+            return None
+        try:
+            response = rcon.command("tick query")
+        except (OSError, RconError, TimeoutError, FuturesTimeoutError):
+            return None
+        
+        # Versiones anteriores a 1.20.3 no tienen el comando: dejar de preguntar
+        if "Unknown or incomplete command" in response:
+            self.tick_query_supported = False
+        elif self.tick_probe.feed(response):
+            self.tick_query_supported = True
+        return None
+    
+    def get_java_command(self):
+        """Línea de comandos de Java, con -Xlog:gc* si el registro de GC está activo"""
+        args = list(self.java_args)
+        if self.gc_logging:
+            log_path = self.gc_log_file.relative_to(self.server_dir).as_posix()
+            gc_option = f"-Xlog:gc*:file={log_path}:uptime,level,tags:filecount=5,filesize=20M"
+            args.insert(args.index("-jar") if "-jar" in args else 1, gc_option)
+        return args
+    
+    def _poll_gc_log(self):
+        """Leer las líneas nuevas del log de GC y publicar el resumen"""
+        if not self.gc_logging:
+            return None
+        self.gc_tail.poll()
+        return self.gc_parser.summary()
+    
+    def render_openmetrics(self):
+        """Texto OpenMetrics a partir de los snapshots ya muestreados (no bloquea)"""
+        snapshot = self.metrics.snapshot
+        lines = []
+        
+        memory = snapshot.get("memory")
+        disk = snapshot.get("disk")
+        _openmetrics_family(lines, "minecraft_host_cpu_percent", "gauge", "Host CPU usage", [({}, snapshot.get("cpu"))])
+        if memory is not None:
+            _openmetrics_family(lines, "minecraft_host_memory_used_bytes", "gauge", "Host memory in use", [({}, memory.used)])
+            _openmetrics_family(lines, "minecraft_host_memory_total_bytes", "gauge", "Host memory size", [({}, memory.total)])
+        if disk is not None:
+            _openmetrics_family(lines, "minecraft_host_disk_used_bytes", "gauge", "Used space on the server disk", [({}, disk.used)])
+            _openmetrics_family(lines, "minecraft_host_disk_total_bytes", "gauge", "Size of the server disk", [({}, disk.total)])
+        
+        _openmetrics_family(lines, "minecraft_server_up", "gauge", "Whether the server process is running",
+                            [({}, 1 if self.server_running else 0)])
+        _openmetrics_family(lines, "minecraft_players_online", "gauge", "Players currently connected",
+                            [({}, len(self.player_tracker) if self.server_running else 0)])
+        
+        pump = self.output_pump
+        if pump is not None:
+            _openmetrics_family(lines, "minecraft_console_lines", "counter", "Console lines read by the panel", [
+                ({"state": "read"}, pump.stats["lines"]),
+                ({"state": "late"}, pump.stats["late"]),
+                ({"state": "dropped"}, pump.stats["dropped"])
+            ])
+        
+        event_stats = self.events.stats()
+        _openmetrics_family(lines, "minecraft_event_pattern_hits", "counter", "Console lines matched per pattern",
+                            [({"pattern": name}, counter["hits"]) for name, counter in event_stats.items()])
+        _openmetrics_family(lines, "minecraft_event_pattern_seconds", "counter", "Time spent matching per pattern",
+                            [({"pattern": name}, counter["ns"] / 1e9) for name, counter in event_stats.items()])
+        
+        process = snapshot.get("process")
+        if process:
+            _openmetrics_family(lines, "minecraft_jvm_cpu_percent", "gauge", "Java process CPU usage", [({}, process["cpu"])])
+            _openmetrics_family(lines, "minecraft_jvm_resident_memory_bytes", "gauge", "Java process resident memory", [({}, process["rss"])])
+            _openmetrics_family(lines, "minecraft_jvm_threads", "gauge", "Java process threads", [({}, process["threads"])])
+            _openmetrics_family(lines, "minecraft_jvm_start_time_seconds", "gauge", "Java process start time", [({}, process["started"])])
+        
+        tick = self.tick_probe.snapshot
+        if self.server_running:
+            _openmetrics_family(lines, "minecraft_tick_tps", "gauge", "Ticks per second", [({}, tick["tps"])])
+            _openmetrics_family(lines, "minecraft_tick_mspt_milliseconds", "gauge", "Milliseconds per tick", [
+                ({"stat": "avg"}, tick["mspt"]),
+                ({"stat": "p50"}, tick["p50"]),
+                ({"stat": "p95"}, tick["p95"]),
+                ({"stat": "p99"}, tick["p99"])
+            ])
+            _openmetrics_family(lines, "minecraft_tick_lag_ticks", "gauge",
+                                "Ticks skipped in the last minute (Can't keep up)", [({}, tick["lag_ticks"])])
+        
+        gc = snapshot.get("gc")
+        if gc and gc["pauses"]:
+            # "quantile" solo está definida para summary; como gauge se usa "stat" (igual que el tick)
+            _openmetrics_family(lines, "minecraft_gc_pause_milliseconds", "gauge", "GC pause time percentiles", [
+                ({"stat": "p50"}, gc["p50"]),
+                ({"stat": "p95"}, gc["p95"]),
+                ({"stat": "p99"}, gc["p99"]),
+                ({"stat": "max"}, gc["max"])
+            ])
+            _openmetrics_family(lines, "minecraft_gc_allocation_rate_bytes", "gauge", "Allocation rate per second", [({}, gc["alloc_rate"])])
+            _openmetrics_family(lines, "minecraft_gc_promotion_rate_bytes", "gauge", "Promotion rate per second", [({}, gc["promotion_rate"])])
+            _openmetrics_family(lines, "minecraft_gc_heap_after_bytes", "gauge", "Heap occupancy after the last GC", [({}, gc["heap_after"])])
+            _openmetrics_family(lines, "minecraft_gc_full", "counter", "Full GCs since server start", [({}, gc["full_gcs"])])
+        
+        _openmetrics_family(lines, "minecraft_backups", "counter", "Backups attempted by result",
+                            [({"result": result}, count) for result, count in self.backup_results.items()])
+        stats = self.last_backup_stats
+        if stats:
+            labels = {"type": stats["type"]}
+            _openmetrics_family(lines, "minecraft_backup_last_duration_seconds", "gauge", "Duration of the last backup", [(labels, stats["seconds"])])
+            _openmetrics_family(lines, "minecraft_backup_last_pause_milliseconds", "gauge", "World save pause of the last backup", [(labels, stats.get("pause_ms"))])
+            _openmetrics_family(lines, "minecraft_backup_last_input_bytes", "gauge", "World bytes read by the last backup", [(labels, stats["bytes_in"])])
+            _openmetrics_family(lines, "minecraft_backup_last_output_bytes", "gauge", "Bytes written by the last backup", [(labels, stats["bytes_out"])])
+            _openmetrics_family(lines, "minecraft_backup_last_timestamp_seconds", "gauge", "Completion time of the last backup", [(labels, stats.get("finished"))])
+        
+        lines.append("# EOF")
+        return "\n".join(lines) + "\n"
+    
+    def start_metrics_exporter(self):
+        if self.metrics_exporter is None:
+            self.metrics_exporter = MetricsExporter(
+                self.metrics_exporter_host,
+                self.metrics_exporter_port,
+                self.render_openmetrics
+            )
+        self.metrics_exporter.start()
+    
+    def stop_metrics_exporter(self):
+        if self.metrics_exporter is not None:
+            self.metrics_exporter.stop()
+            self.metrics_exporter = None
+    
+    def save_timeseries(self):
+        try:
+            self.timeseries.save()
+        except OSError:
+            pass
+        self._timeseries_saved_at = time.time()
+    
+    def get_system_stats(self):
+        """Obtener estadísticas del sistema (último snapshot, sin bloquear)"""
+        snapshot = self.metrics.snapshot
+        memory = snapshot.get("memory")
+        disk = snapshot.get("disk")
+        if memory is None or disk is None:
             return None
+        
+        return {
+            "cpu": snapshot.get("cpu") or 0.0,
+            "memory_used": memory.used,
+            "memory_total": memory.total,
+            "memory_percent": memory.percent,
+            "disk_used": disk.used,
+            "disk_total": disk.total,
+            "disk_percent": (disk.used / disk.total) * 100,
+            "process": snapshot.get("process")
+        }
     
     def get_server_uptime(self):
         """Obtener tiempo de actividad del servidor"""
@@ -182,8 +3834,9 @@ class MinecraftServerManager:
             return "No ejecutándose"
         
         try:
-            process = psutil.Process(self.server_process.pid)
-            start_time = datetime.fromtimestamp(process.create_time())
+            process = self.metrics.get("process")
+            started = process["started"] if process else psutil.Process(self.server_process.pid).create_time()
+            start_time = datetime.fromtimestamp(started)
             uptime = datetime.now() - start_time
             return str(uptime).split('.')[0]  # Remover microsegundos
         except:
@@ -193,26 +3846,7 @@ class MinecraftServerManager:
         """Obtener jugadores conectados"""
         if not self.server_running:
             return []
-        
-        try:
-            # Enviar comando list al servidor
-            if self.server_process and self.server_process.stdin:
-                self.server_process.stdin.write("list\n")
-                self.server_process.stdin.flush()
-                time.sleep(0.5)
-                
-                # Buscar en la salida reciente
-                for line in reversed(self.last_output[-10:]):
-                    if "players online:" in line.lower():
-                        # Extraer nombres de jugadores
-                        if ":" in line:
-                            players_part = line.split(":", 1)[1].strip()
-                            if players_part:
-                                return [p.strip() for p in players_part.split(",")]
-                        return []
-            return []
-        except:
-            return []
+        return self.player_tracker.players()
     
     def start_server(self):
         """Iniciar el servidor"""
@@ -227,109 +3861,430 @@ class MinecraftServerManager:
             os.chdir(self.server_dir)
             
             # Iniciar proceso del servidor
+            if self.gc_logging:
+                # Análisis desde cero: el log anterior es de otra JVM
+                self.gc_parser = GcLogParser()
+                self.gc_tail = LogTail(self.gc_log_file, self.gc_parser.feed, since=time.time())
             self.server_process = subprocess.Popen(
-                self.java_args,
+                self.get_java_command(),
                 stdin=subprocess.PIPE,
                 stdout=subprocess.PIPE,
                 stderr=subprocess.STDOUT,
-                universal_newlines=True,
                 cwd=self.server_dir,
-                bufsize=1
+                bufsize=0
             )
             
             self.server_running = True
+            self.player_tracker.reset()
+            self.tick_probe.reset()
+            self.tick_query_supported = None
             
             # Iniciar hilo para leer output
-            output_thread = threading.Thread(target=self._read_server_output, daemon=True)
-            output_thread.start()
+            self.output_pump = OutputPump(
+                self.server_process.stdout,
+                self.last_output,
+                self._handle_output_line,
+                on_close=self.player_tracker.reset
+            )
+            self.output_pump.start()
             
             console.print("✅ Servidor iniciado correctamente", style="green")
             return True
-            
+            
+        except Exception as e:
+            console.print(f"❌ Error iniciando servidor: {e}", style="red")
+            self.server_running = False
+            return False
+    
+    def stop_server(self):
+        """Detener el servidor"""
+        if not self.server_running:
+            console.print("⚠️ El servidor no está ejecutándose", style="yellow")
+            return False
+        
+        try:
+            console.print("🛑 Deteniendo servidor...", style="yellow")
+            
+            # Enviar comando stop
+            if self.server_process and self.server_process.stdin:
+                self.server_process.stdin.write(b"stop\n")
+                self.server_process.stdin.flush()
+            
+            # Esperar que termine
+            if self.server_process:
+                self.server_process.wait(timeout=30)
+            
+            self.server_running = False
+            self.server_process = None
+            self.player_tracker.reset()
+            self.command_correlator.cancel_all()
+            self.close_rcon()
+            
+            console.print("✅ Servidor detenido correctamente", style="green")
+            return True
+            
+        except subprocess.TimeoutExpired:
+            console.print("⚠️ Forzando cierre del servidor...", style="yellow")
+            if self.server_process:
+                self.server_process.kill()
+                self.server_running = False
+                self.server_process = None
+            self.player_tracker.reset()
+            self.command_correlator.cancel_all()
+            self.close_rcon()
+            console.print("✅ Servidor detenido forzadamente", style="green")
+            return True
+        except Exception as e:
+            console.print(f"❌ Error deteniendo servidor: {e}", style="red")
+            return False
+    
+    def restart_server(self):
+        """Reiniciar el servidor"""
+        console.print("🔄 Reiniciando servidor...", style="yellow")
+        if self.stop_server():
+            time.sleep(2)
+            return self.start_server()
+        return False
+    
+    def _handle_output_line(self, line):
+        """Procesar una línea de la consola (hilo de procesado de OutputPump)"""
+        self.events.publish_line(line)
+    
+    def expect_output(self, pattern):
+        """Registrar una espera sobre la salida ANTES de enviar el comando que la provoca"""
+        waiter = OutputWaiter(pattern)
+        with self._output_lock:
+            self._output_waiters.append(waiter)
+        return waiter
+    
+    def wait_output(self, waiter, timeout):
+        """Esperar a una línea registrada con expect_output. Devuelve la línea o None"""
+        if not waiter.event.wait(timeout):
+            with self._output_lock:
+                if waiter in self._output_waiters:
+                    self._output_waiters.remove(waiter)
+            return None
+        return waiter.line
+    
+    def _notify_output_waiters(self, event):
+        """Despertar las esperas cuyo patrón coincide con la línea del evento"""
+        if not self._output_waiters:
+            return
+        line = event.line
+        
+        with self._output_lock:
+            matched = [waiter for waiter in self._output_waiters if waiter.matches(line)]
+            for waiter in matched:
+                self._output_waiters.remove(waiter)
+        
+        for waiter in matched:
+            waiter.line = line
+            waiter.event.set()
+    
+    def read_server_properties(self):
+        """Leer server.properties como diccionario (sin escribir nada)"""
+        try:
+            return self.config_store.properties.as_dict()
+        except OSError:
+            return {}
+    
+    def _config_file_changed(self, name):
+        """El servidor (u otro programa) cambió un archivo de configuración"""
+        if name in ("banned-ips.json", "banned-ip-ranges.json", "banned-ip-expiries.json"):
+            self.load_ban_engine()
+    
+    def get_rcon(self):
+        """Cliente RCON conectado si enable-rcon está activo y hay contraseña, o None"""
+        properties = self.read_server_properties()
+        if properties.get("enable-rcon", "false").lower() != "true" or not properties.get("rcon.password"):
+            self.close_rcon()
+            return None
+        
+        settings = (
+            properties.get("server-ip") or "127.0.0.1",
+            int(properties.get("rcon.port", "25575") or 25575),
+            properties["rcon.password"]
+        )
+        if self.rcon is None or settings != self._rcon_settings:
+            self.close_rcon()
+            self.rcon = RconClient(*settings)
+            self._rcon_settings = settings
+        
+        if not self.rcon.connected:
+            # No reintentar en cada comando si el puerto RCON no responde
+            if time.time() < self._rcon_retry_at:
+                return None
+            try:
+                self.rcon.connect()
+            except RconError as e:
+                console.print(f"⚠️ RCON: {e}", style="yellow")
+                self._rcon_retry_at = time.time() + 30
+                return None
+            except OSError:
+                self._rcon_retry_at = time.time() + 5
+                return None
+        return self.rcon
+    
+    def close_rcon(self):
+        if self.rcon is not None:
+            self.rcon.close()
+        self.rcon = None
+        self._rcon_settings = None
+    
+    def get_uuid_resolver(self):
+        """Resolutor de UUID acorde a online-mode de server.properties"""
+        online = self.read_server_properties().get("online-mode", "true").lower() != "false"
+        resolver = self._uuid_resolver
+        if resolver is None or resolver.online != online or resolver.profiles_url != self.profiles_url:
+            resolver = self._uuid_resolver = UuidResolver(
+                self.server_dir / "usercache.json",
+                profiles_url=self.profiles_url,
+                online=online
+            )
+        return resolver
+    
+    def resolve_player_uuid(self, name):
+        """UUID real de un jugador, o None (con aviso) si no existe o falla la consulta"""
+        try:
+            player_uuid = self.get_uuid_resolver().resolve_one(name)
+        except (requests.RequestException, ValueError) as e:
+            console.print(f"❌ No se pudo consultar el UUID de {name}: {e}", style="red")
+            return None
+        if player_uuid is None:
+            console.print(f"❌ El jugador {name} no existe", style="red")
+        return player_uuid
+    
+    def load_ban_engine(self):
+        """Cargar banned-ips.json y banned-ip-ranges.json en el motor de baneos.
+
+        ban-ip no admite caducidad, así que el servidor guarda "forever"; la
+        caducidad puesta desde el panel se toma de banned-ip-expiries.json.
+        """
+        expiries_config = self.config_store["banned-ip-expiries.json"]
+        expiries = {entry["ip"]: entry.get("expires", "forever") for entry in expiries_config.entries() if entry.get("ip")}
+        singles = []
+        for entry in self.config_store["banned-ips.json"].entries():
+            panel_expiry = expiries.pop(entry.get("ip"), None)
+            if panel_expiry and entry.get("expires", "forever") == "forever":
+                entry = dict(entry, expires=panel_expiry)
+            singles.append(entry)
+        # Las que sobran (IP ya perdonadas) se descartan en el próximo save_ban_expiries
+        self.ban_engine.load(singles, self.config_store["banned-ip-ranges.json"].entries())
+        return self.ban_engine
+    
+    def save_ban_expiries(self):
+        """Guardar las caducidades de las IP sueltas, que el servidor no conserva"""
+        try:
+            self.config_store["banned-ip-expiries.json"].replace([
+                {"ip": entry["ip"], "expires": entry["expires"]}
+                for entry in self.ban_engine.singles() if entry.get("expires", "forever") != "forever"
+            ])
+            return True
+        except OSError as e:
+            console.print(f"❌ Error guardando banned-ip-expiries.json: {e}", style="red")
+            return False
+    
+    def save_ban_ranges(self):
+        try:
+            self.config_store["banned-ip-ranges.json"].replace(self.ban_engine.ranges())
+            return True
+        except OSError as e:
+            console.print(f"❌ Error guardando banned-ip-ranges.json: {e}", style="red")
+            return False
+    
+    def sync_ip_bans(self):
+        """Llevar al servidor las IP sueltas del motor: diff contra banned-ips.json y comandos en lote.
+
+        Con el servidor parado se escribe banned-ips.json directamente.
+        Devuelve (baneadas, perdonadas, errores).
+        """
+        self.save_ban_expiries()
+        banned_ips = self.config_store["banned-ips.json"]
+        to_ban, to_pardon = self.ban_engine.diff(banned_ips.entries())
+        if not to_ban and not to_pardon:
+            return 0, 0, []
+        
+        if not self.server_running:
+            banned_ips.replace(self.ban_engine.singles())
+            return len(to_ban), len(to_pardon), []
+        
+        requests_list = [
+            (f"ban-ip {entry['ip']} {entry['reason']}", r"Banned IP|Nothing changed|Invalid IP")
+            for entry in to_ban
+        ] + [
+            (f"pardon-ip {ip}", r"Unbanned IP|Nothing changed|Invalid IP")
+            for ip in to_pardon
+        ]
+        results = self.run_commands(requests_list)
+        errors = [(command, error) for command, _, error in results if error is not None]
+        return len(to_ban), len(to_pardon), errors
+    
+    def _enforce_ip_bans(self, event):
+        """Expulsar a quien entra desde una IP cubierta por un rango baneado"""
+        if not len(self.ban_engine):
+            return
+        address = event.data.get("address", "")
+        if address.count(":") == 1 or address.startswith("["):
+            address = address.rsplit(":", 1)[0]
+        ip = address.strip("[]").split("%", 1)[0]
+        entry = self.ban_engine.match(ip)
+        if entry is not None and "cidr" in entry:
+            # Sin bloquear el hilo de eventos: la respuesta no hace falta
+            self.request_command(f"kick {event.data['player']} {entry['reason']}", r"Kicked|No player")
+    
+    def _expire_bans(self):
+        """Tarea periódica: quitar los baneos temporales vencidos"""
+        expired = self.ban_engine.expire()
+        if expired:
+            if any("cidr" in entry for entry in expired):
+                self.save_ban_ranges()
+            if any("ip" in entry for entry in expired):
+                self.sync_ip_bans()
+        return len(expired)
+    
+    def send_command(self, command, quiet=False):
+        """Enviar comando al servidor (por RCON si está disponible, si no por stdin)"""
+        rcon = self.get_rcon()
+        if rcon is not None:
+            try:
+                future = rcon.submit(command)
+            except (OSError, RconError, TimeoutError) as e:
+                # No llegó al servidor: se puede reenviar por stdin sin duplicarlo
+                if not self.server_process:
+                    console.print(f"❌ Error enviando comando por RCON: {e}", style="red")
+                    return False
+            else:
+                try:
+                    response = future.result(rcon.timeout)
+                except (OSError, RconError, TimeoutError, FuturesTimeoutError) as e:
+                    # Ya se envió: reenviarlo por stdin podría ejecutarlo dos veces
+                    console.print(
+                        f"⚠️ '{command}' se envió por RCON pero no hubo confirmación ({e or 'tiempo agotado'}); "
+                        "revisa la consola antes de repetirlo",
+                        style="yellow"
+                    )
+                    return False
+                if not quiet:
+                    console.print(f"📤 Comando enviado: {command}", style="green")
+                    if response:
+                        console.print(f"📥 {response}", style="dim")
+                return True
+        
+        if not self.server_running or not self.server_process:
+            if not quiet:
+                console.print("❌ El servidor no está ejecutándose", style="red")
+            return False
+        
+        try:
+            # Sus posibles errores no deben atribuirse a peticiones del correlador
+            self.command_correlator.note_foreign()
+            self._write_console_command(command, raise_errors=True)
+            if not quiet:
+                console.print(f"📤 Comando enviado: {command}", style="green")
+            return True
         except Exception as e:
-            console.print(f"❌ Error iniciando servidor: {e}", style="red")
-            self.server_running = False
+            console.print(f"❌ Error enviando comando: {e}", style="red")
             return False
     
-    def stop_server(self):
-        """Detener el servidor"""
-        if not self.server_running:
-            console.print("⚠️ El servidor no está ejecutándose", style="yellow")
+    def _write_console_command(self, command, raise_errors=False):
+        """Escribir un comando en la consola del servidor (stdin)"""
+        process = self.server_process
+        if not self.server_running or not process:
             return False
-        
         try:
-            console.print("🛑 Deteniendo servidor...", style="yellow")
-            
-            # Enviar comando stop
-            if self.server_process and self.server_process.stdin:
-                self.server_process.stdin.write("stop\n")
-                self.server_process.stdin.flush()
-            
-            # Esperar que termine
-            if self.server_process:
-                self.server_process.wait(timeout=30)
-            
-            self.server_running = False
-            self.server_process = None
-            
-            console.print("✅ Servidor detenido correctamente", style="green")
-            return True
-            
-        except subprocess.TimeoutExpired:
-            console.print("⚠️ Forzando cierre del servidor...", style="yellow")
-            if self.server_process:
-                self.server_process.kill()
-                self.server_running = False
-                self.server_process = None
-            console.print("✅ Servidor detenido forzadamente", style="green")
+            with self._stdin_lock:
+                process.stdin.write(f"{command}\n".encode("utf-8"))
+                process.stdin.flush()
             return True
-        except Exception as e:
-            console.print(f"❌ Error deteniendo servidor: {e}", style="red")
+        except (OSError, ValueError):
+            if raise_errors:
+                raise
             return False
     
-    def restart_server(self):
-        """Reiniciar el servidor"""
-        console.print("🔄 Reiniciando servidor...", style="yellow")
-        if self.stop_server():
-            time.sleep(2)
-            return self.start_server()
-        return False
-    
-    def _read_server_output(self):
-        """Leer output del servidor en hilo separado"""
-        if not self.server_process:
-            return
+    def request_command(self, command, expect=None, timeout=5.0, fail=None):
+        """Enviar un comando y devolver un Future con su respuesta.
+
+        Por RCON el Future lleva la respuesta completa; por consola, la primera
+        línea que cumpla `expect`, o None si no se indica (solo se envía). Si la
+        respuesta cumple `fail`, no cumple `expect` o es un error, falla con
+        CommandError.
+        """
+        rcon = self.get_rcon()
+        if rcon is None:
+            return self.command_correlator.request(command, expect, timeout, fail)
+        
+        result = Future()
+        pattern = re.compile(expect) if expect else None
+        fail_pattern = re.compile(fail) if fail else None
+        
+        def finish(inner):
+            error = inner.exception()
+            if error is not None:
+                result.set_exception(error)
+                return
+            response = inner.result()
+            if (fail_pattern is not None and fail_pattern.search(response)) or \
+                    (pattern is not None and not pattern.search(response)):
+                result.set_exception(CommandError(response))
+            else:
+                result.set_result(response)
         
         try:
-            for line in iter(self.server_process.stdout.readline, ''):
-                if not line:
-                    break
-                
-                line = line.strip()
-                if line:
-                    self.last_output.append(f"[{datetime.now().strftime('%H:%M:%S')}] {line}")
-                    
-                    # Mantener solo las últimas líneas
-                    if len(self.last_output) > self.max_output_lines:
-                        self.last_output = self.last_output[-self.max_output_lines:]
-                
-        except Exception:
-            pass
+            rcon.submit(command).add_done_callback(finish)
+        except (OSError, RconError, TimeoutError) as e:
+            result.set_exception(e)
+        return result
     
-    def send_command(self, command):
-        """Enviar comando al servidor"""
-        if not self.server_running or not self.server_process:
-            console.print("❌ El servidor no está ejecutándose", style="red")
-            return False
+    def run_commands(self, requests_list, timeout=10.0):
+        """Ejecutar muchos comandos [(comando, patrón esperado[, patrón de fallo])] con una ventana de peticiones en vuelo.
+
+        Devuelve [(comando, respuesta o None, error o None)] en el mismo orden.
+        """
+        window = threading.BoundedSemaphore(self.command_window)
+        futures = []
+        for command, expect, *fail in requests_list:
+            window.acquire()
+            future = self.request_command(command, expect, timeout, *fail)
+            future.add_done_callback(lambda _: window.release())
+            futures.append((command, future))
         
+        results = []
+        for command, future in futures:
+            try:
+                results.append((command, future.result(timeout), None))
+            except Exception as e:
+                results.append((command, None, e))
+        return results
+    
+    def whitelist_add_bulk(self, names):
+        """Añadir muchos jugadores a la whitelist tan rápido como responda el servidor"""
+        requests_list = [
+            (
+                f"whitelist add {name}",
+                rf"Added {re.escape(name)} to the whitelist|Player is already whitelisted",
+                r"That player does not exist"
+            )
+            for name in names
+        ]
+        return self.run_commands(requests_list)
+    
+    def show_command_result(self, command, expect=None, timeout=3.0):
+        """Enviar un comando y mostrar su respuesta (sin esperas fijas)"""
+        console.print(f"📤 Comando enviado: {command}", style="green")
         try:
-            self.server_process.stdin.write(f"{command}\n")
-            self.server_process.stdin.flush()
-            console.print(f"📤 Comando enviado: {command}", style="green")
+            response = self.request_command(command, expect, timeout).result(timeout + 1)
+            if response is None:
+                console.print("ℹ️ Sin respuesta esperada: revisa la salida en la consola del servidor", style="dim")
+            else:
+                console.print(f"📥 {response}", style="white")
             return True
+        except CommandError as e:
+            console.print(f"❌ {e}", style="red")
+        except (TimeoutError, FuturesTimeoutError):
+            console.print("⌛ Sin respuesta del servidor", style="yellow")
         except Exception as e:
             console.print(f"❌ Error enviando comando: {e}", style="red")
-            return False
+        return False
     
     def load_json_config(self, file_path):
         """Cargar archivo de configuración JSON"""
@@ -343,15 +4298,33 @@ class MinecraftServerManager:
             return []
     
     def save_json_config(self, file_path, data):
-        """Guardar archivo de configuración JSON"""
+        """Guardar archivo de configuración JSON (archivo temporal + os.replace)"""
         try:
-            with open(file_path, 'w', encoding='utf-8') as f:
-                json.dump(data, f, indent=2, ensure_ascii=False)
+            atomic_write_text(file_path, json.dumps(data, indent=2, ensure_ascii=False))
             return True
         except Exception as e:
             console.print(f"❌ Error guardando {file_path.name}: {e}", style="red")
             return False
     
+    def update_config_entry(self, config, entry):
+        """Añadir/actualizar una entrada en un archivo del almacén.
+
+        Devuelve "added", "changed", None si no cambió nada, o False si falló.
+        """
+        try:
+            return config.upsert(entry)
+        except OSError as e:
+            console.print(f"❌ Error guardando {config.path.name}: {e}", style="red")
+            return False
+    
+    def remove_config_entry(self, config, name):
+        """Quitar una entrada por nombre. Devuelve la entrada eliminada o None"""
+        try:
+            return config.remove(name)
+        except OSError as e:
+            console.print(f"❌ Error guardando {config.path.name}: {e}", style="red")
+            return None
+    
     def edit_server_properties(self):
         """Editar server.properties"""
         props_file = self.config_files["server.properties"]
@@ -361,14 +4334,9 @@ class MinecraftServerManager:
             return
         
         try:
-            # Leer propiedades actuales
-            properties = {}
-            with open(props_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    line = line.strip()
-                    if line and not line.startswith('#') and '=' in line:
-                        key, value = line.split('=', 1)
-                        properties[key] = value
+            # Leer propiedades actuales (se conservan comentarios, orden y escapes al guardar)
+            properties_file = self.config_store.properties
+            properties = properties_file.as_dict()
             
             # Mostrar propiedades editables principales
             console.clear()
@@ -422,16 +4390,14 @@ class MinecraftServerManager:
                         current_value = properties[prop_name]
                         console.print(f"Valor actual: [yellow]{current_value}[/yellow]")
                         new_value = Prompt.ask("Nuevo valor", default=current_value)
-                        properties[prop_name] = new_value
                         
-                        # Guardar cambios
+                        # Guardar cambios (solo se reescribe la línea de esta propiedad)
                         try:
-                            with open(props_file, 'w', encoding='utf-8') as f:
-                                f.write("# Minecraft server properties\n")
-                                f.write(f"# Editado por Panel de Administración - {datetime.now()}\n")
-                                for key, value in properties.items():
-                                    f.write(f"{key}={value}\n")
-                            console.print("✅ Propiedad actualizada", style="green")
+                            if properties_file.update({prop_name: new_value}):
+                                console.print("✅ Propiedad actualizada", style="green")
+                            else:
+                                console.print("ℹ️ Sin cambios", style="dim")
+                            properties = properties_file.as_dict()
                         except Exception as e:
                             console.print(f"❌ Error guardando: {e}", style="red")
                     else:
@@ -439,6 +4405,7 @@ class MinecraftServerManager:
                 
                 elif choice == "2":
                     # Mostrar todas las propiedades
+                    properties = properties_file.as_dict()
                     all_table = Table(show_header=True, header_style="bold magenta")
                     all_table.add_column("Propiedad", style="cyan")
                     all_table.add_column("Valor", style="white")
@@ -458,8 +4425,7 @@ class MinecraftServerManager:
     
     def manage_operators(self):
         """Gestionar operadores del servidor"""
-        ops_file = self.config_files["ops.json"]
-        ops_data = self.load_json_config(ops_file)
+        ops_config = self.config_store["ops.json"]
         
         console.clear()
         panel = Panel.fit(
@@ -469,7 +4435,8 @@ class MinecraftServerManager:
         console.print(panel)
         
         while True:
-            # Mostrar operadores actuales
+            # Mostrar operadores actuales (se releen solo si el archivo cambió)
+            ops_data = ops_config.entries()
             if ops_data:
                 table = Table(show_header=True, header_style="bold magenta")
                 table.add_column("UUID", style="cyan")
@@ -504,10 +4471,9 @@ class MinecraftServerManager:
                 level = IntPrompt.ask("Nivel de operador (1-4)", default=4)
                 bypass = Confirm.ask("¿Puede bypasear límite de jugadores?", default=False)
                 
-                # Aquí necesitarías obtener el UUID del jugador
-                # Por simplicidad, generamos uno temporal
-                import uuid
-                player_uuid = str(uuid.uuid4())
+                player_uuid = self.resolve_player_uuid(name)
+                if player_uuid is None:
+                    continue
                 
                 new_op = {
                     "uuid": player_uuid,
@@ -516,11 +4482,11 @@ class MinecraftServerManager:
                     "bypassesPlayerLimit": bypass
                 }
                 
-                ops_data.append(new_op)
-                if self.save_json_config(ops_file, ops_data):
-                    console.print("✅ Operador añadido", style="green")
-                    # Recargar ops en el servidor si está ejecutándose
-                    if self.server_running:
+                change = self.update_config_entry(ops_config, new_op)
+                if change:
+                    console.print("✅ Operador añadido" if change == "added" else "✅ Operador actualizado", style="green")
+                    # Solo se envía al servidor lo que cambia
+                    if self.server_running and change == "added":
                         self.send_command("op " + name)
             
             elif choice == "2":
@@ -531,8 +4497,7 @@ class MinecraftServerManager:
                 names = [op.get("name", "N/A") for op in ops_data]
                 name_to_remove = Prompt.ask("Nombre del operador a eliminar", choices=names)
                 
-                ops_data = [op for op in ops_data if op.get("name") != name_to_remove]
-                if self.save_json_config(ops_file, ops_data):
+                if self.remove_config_entry(ops_config, name_to_remove):
                     console.print("✅ Operador eliminado", style="green")
                     if self.server_running:
                         self.send_command("deop " + name_to_remove)
@@ -545,19 +4510,17 @@ class MinecraftServerManager:
                 names = [op.get("name", "N/A") for op in ops_data]
                 name_to_modify = Prompt.ask("Nombre del operador a modificar", choices=names)
                 
-                for op in ops_data:
-                    if op.get("name") == name_to_modify:
-                        new_level = IntPrompt.ask("Nuevo nivel (1-4)", default=op.get("level", 4))
-                        op["level"] = new_level
-                        break
+                op = ops_config.get(name_to_modify)
+                if op is None:
+                    continue
+                new_level = IntPrompt.ask("Nuevo nivel (1-4)", default=op.get("level", 4))
                 
-                if self.save_json_config(ops_file, ops_data):
+                if self.update_config_entry(ops_config, {"name": op["name"], "level": new_level}):
                     console.print("✅ Operador modificado", style="green")
     
     def manage_whitelist(self):
         """Gestionar lista blanca"""
-        whitelist_file = self.config_files["whitelist.json"]
-        whitelist_data = self.load_json_config(whitelist_file)
+        whitelist_config = self.config_store["whitelist.json"]
         
         console.clear()
         panel = Panel.fit(
@@ -568,6 +4531,7 @@ class MinecraftServerManager:
         
         while True:
             # Mostrar jugadores en whitelist
+            whitelist_data = whitelist_config.entries()
             if whitelist_data:
                 table = Table(show_header=True, header_style="bold magenta")
                 table.add_column("UUID", style="cyan")
@@ -587,27 +4551,31 @@ class MinecraftServerManager:
             console.print("1. Añadir jugador a whitelist")
             console.print("2. Eliminar jugador de whitelist")
             console.print("3. Activar/Desactivar whitelist")
+            console.print("4. Añadir varios jugadores")
             console.print("0. Volver")
             
-            choice = Prompt.ask("Selecciona una opción", choices=["0", "1", "2", "3"])
+            choice = Prompt.ask("Selecciona una opción", choices=["0", "1", "2", "3", "4"])
             
             if choice == "0":
                 break
             elif choice == "1":
                 name = Prompt.ask("Nombre del jugador")
-                import uuid
-                player_uuid = str(uuid.uuid4())
+                player_uuid = self.resolve_player_uuid(name)
+                if player_uuid is None:
+                    continue
                 
                 new_player = {
                     "uuid": player_uuid,
                     "name": name
                 }
                 
-                whitelist_data.append(new_player)
-                if self.save_json_config(whitelist_file, whitelist_data):
+                change = self.update_config_entry(whitelist_config, new_player)
+                if change:
                     console.print("✅ Jugador añadido a whitelist", style="green")
-                    if self.server_running:
+                    if self.server_running and change == "added":
                         self.send_command("whitelist add " + name)
+                elif change is None:
+                    console.print("ℹ️ El jugador ya estaba en la whitelist", style="dim")
             
             elif choice == "2":
                 if not whitelist_data:
@@ -617,22 +4585,15 @@ class MinecraftServerManager:
                 names = [player.get("name", "N/A") for player in whitelist_data]
                 name_to_remove = Prompt.ask("Nombre del jugador a eliminar", choices=names)
                 
-                whitelist_data = [player for player in whitelist_data if player.get("name") != name_to_remove]
-                if self.save_json_config(whitelist_file, whitelist_data):
+                if self.remove_config_entry(whitelist_config, name_to_remove):
                     console.print("✅ Jugador eliminado de whitelist", style="green")
                     if self.server_running:
                         self.send_command("whitelist remove " + name_to_remove)
             
             elif choice == "3":
                 # Verificar estado actual en server.properties
-                props_file = self.config_files["server.properties"]
-                current_state = False
-                
-                if props_file.exists():
-                    with open(props_file, 'r') as f:
-                        content = f.read()
-                        if "enable-whitelist=true" in content:
-                            current_state = True
+                properties_file = self.config_store.properties
+                current_state = properties_file.get("enable-whitelist", "false").lower() == "true"
                 
                 new_state = Confirm.ask(
                     f"Whitelist está {'activada' if current_state else 'desactivada'}. ¿Cambiar estado?",
@@ -640,139 +4601,804 @@ class MinecraftServerManager:
                 )
                 
                 if new_state != current_state:
-                    # Actualizar server.properties
-                    if props_file.exists():
-                        with open(props_file, 'r') as f:
-                            content = f.read()
-                        
-                        content = content.replace(
-                            f"enable-whitelist={'true' if current_state else 'false'}",
-                            f"enable-whitelist={'true' if new_state else 'false'}"
+                    # Actualizar server.properties (solo la línea enable-whitelist)
+                    try:
+                        properties_file.update({"enable-whitelist": "true" if new_state else "false"})
+                    except OSError as e:
+                        console.print(f"❌ Error guardando server.properties: {e}", style="red")
+                        continue
+                    
+                    console.print(f"✅ Whitelist {'activada' if new_state else 'desactivada'}", style="green")
+                    
+                    if self.server_running:
+                        self.send_command("whitelist " + ("on" if new_state else "off"))
+            
+            elif choice == "4":
+                source = Prompt.ask("Nombres separados por comas, o ruta de un archivo con un nombre por línea")
+                if Path(source).is_file():
+                    with open(source, 'r', encoding='utf-8') as f:
+                        names = [line.strip() for line in f if line.strip()]
+                else:
+                    names = [name.strip() for name in source.split(",") if name.strip()]
+                if not names:
+                    continue
+                
+                if self.server_running:
+                    start = time.perf_counter()
+                    with console.status(f"📝 Añadiendo {len(names)} jugadores..."):
+                        results = self.whitelist_add_bulk(names)
+                    elapsed = time.perf_counter() - start
+                    failed = [(command, error) for command, _, error in results if error is not None]
+                    console.print(
+                        f"✅ {len(results) - len(failed)}/{len(results)} comandos confirmados en {elapsed:.1f}s "
+                        f"({len(results) / elapsed if elapsed > 0 else 0:.0f}/s)",
+                        style="green"
+                    )
+                    for command, error in failed[:10]:
+                        console.print(f"   ❌ {command}: {error}", style="red")
+                    # El servidor escribe whitelist.json con los UUID reales; el sondeo lo recarga
+                else:
+                    existing = {player.get("name", "").lower() for player in whitelist_data}
+                    start = time.perf_counter()
+                    resolver = self.get_uuid_resolver()
+                    with console.status(f"🔎 Resolviendo {len(names)} UUID..."):
+                        profiles = resolver.resolve(names)
+                    failed = resolver.last_failed
+                    if failed:
+                        error = next(iter(failed.values()))
+                        console.print(
+                            f"❌ No se pudieron consultar {len(failed)} UUID ({error}): {', '.join(list(failed)[:20])}",
+                            style="red"
                         )
-                        
-                        with open(props_file, 'w') as f:
-                            f.write(content)
-                        
-                        console.print(f"✅ Whitelist {'activada' if new_state else 'desactivada'}", style="green")
-                        
-                        if self.server_running:
-                            self.send_command("whitelist " + ("on" if new_state else "off"))
-                            self.send_command("whitelist reload")
+                    new_players = []
+                    for name in names:
+                        profile = profiles.get(name.lower())
+                        if profile and name.lower() not in existing:
+                            new_players.append({"uuid": profile["uuid"], "name": profile["name"]})
+                            existing.add(name.lower())
+                    missing = [name for name in names if name.lower() not in profiles and name not in failed]
+                    try:
+                        added, _ = whitelist_config.upsert_many(new_players)
+                        console.print(
+                            f"✅ {len(added)} jugadores añadidos en {time.perf_counter() - start:.1f}s",
+                            style="green"
+                        )
+                    except OSError as e:
+                        console.print(f"❌ Error guardando whitelist.json: {e}", style="red")
+                    if missing:
+                        console.print(f"⚠️ No existen: {', '.join(missing[:20])}", style="yellow")
     
     def create_backup(self, auto=False):
         """Crear backup del mundo"""
+        if not self._backup_lock.acquire(blocking=False):
+            console.print("⚠️ Ya hay un backup en curso", style="yellow")
+            return False
+        
+        staging_root = None
         try:
             if not self.world_dir.exists():
                 console.print("❌ Directorio del mundo no encontrado", style="red")
                 return False
             
             timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-            backup_name = f"world_backup_{timestamp}.zip"
-            backup_path = self.backups_dir / backup_name
-            
             prefix = "🤖 [AUTO]" if auto else "📦"
-            console.print(f"{prefix} Creando backup: {backup_name}", style="yellow")
             
-            with zipfile.ZipFile(backup_path, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                for root, dirs, files in os.walk(self.world_dir):
-                    for file in files:
-                        file_path = Path(root) / file
-                        arcname = file_path.relative_to(self.world_dir.parent)
-                        zipf.write(file_path, arcname)
+            # Con el servidor en marcha se congela el guardado y se copian los archivos sucios
+            source_dir = self.world_dir
+            unchanged = None
+            pause_ms = None
+            if self.server_running:
+                source_dir, unchanged, pause_ms = self.stage_world_for_backup()
+                if self.backup_mode == "incremental":
+                    staging_root = source_dir.parent  # el espejo del modo ZIP se conserva
+            
+            if self.backup_mode == "incremental":
+                backup_name = f"world_backup_{timestamp}"
+                suffix = 1
+                while (self.backup_store.manifests_dir / f"{backup_name}.json").exists():
+                    backup_name = f"world_backup_{timestamp}_{suffix}"
+                    suffix += 1
+                console.print(f"{prefix} Creando backup incremental: {backup_name}", style="yellow")
+                
+                start = time.perf_counter()
+                manifest = self.backup_store.snapshot(source_dir, backup_name, auto=auto, unchanged=unchanged)
+                seconds = time.perf_counter() - start
+                self.last_backup_stats = {
+                    "name": backup_name,
+                    "type": "incremental",
+                    "bytes_in": manifest["total_bytes"],
+                    "bytes_out": manifest["stored_bytes"],
+                    "seconds": seconds,
+                    "mb_per_s": (manifest["total_bytes"] / (1024 * 1024)) / seconds if seconds > 0 else 0.0
+                }
+                
+                total_mb = manifest["total_bytes"] / (1024 * 1024)
+                new_mb = manifest["new_bytes"] / (1024 * 1024)
+                stored_mb = manifest["stored_bytes"] / (1024 * 1024)
+                console.print(
+                    f"✅ Backup creado: {backup_name} ({total_mb:.1f} MB de mundo, "
+                    f"{new_mb:.1f} MB nuevos, {stored_mb:.1f} MB escritos)",
+                    style="green"
+                )
+            else:
+                backup_name = f"world_backup_{timestamp}.zip"
+                backup_path = self.backups_dir / backup_name
+                console.print(f"{prefix} Creando backup: {backup_name}", style="yellow")
+                
+                stats = write_zip_parallel(
+                    source_dir,
+                    backup_path,
+                    workers=self.backup_workers,
+                    policy=self.backup_policy
+                )
+                self.last_backup_stats = dict(stats, name=backup_name, type="zip")
+                
+                # Verificar tamaño del backup
+                backup_size = stats["bytes_out"] / (1024 * 1024)  # MB
+                
+                console.print(
+                    f"✅ Backup creado: {backup_name} ({backup_size:.1f} MB, "
+                    f"{stats['mb_per_s']:.1f} MB/s con {self.backup_workers} hilos)",
+                    style="green"
+                )
+            
+            self.last_backup_stats["pause_ms"] = pause_ms
+            self.last_backup_stats["finished"] = time.time()
+            self.backup_results["ok"] += 1
+            
+            # Limpiar backups antiguos (mantener solo los últimos 10)
+            self.prune_backups(self.max_backups)
+            
+            return True
+            
+        except Exception as e:
+            console.print(f"❌ Error creando backup: {e}", style="red")
+            self.backup_results["error"] += 1
+            return False
+        finally:
+            if staging_root:
+                shutil.rmtree(staging_root, ignore_errors=True)
+            self._backup_lock.release()
+    
+    def stage_world_for_backup(self):
+        """Congelar el guardado del servidor y copiar solo los archivos modificados.
+
+        Envía save-off y save-all flush, espera "Saved the game", copia los archivos
+        que difieren de la referencia y reactiva save-on. En modo incremental la
+        referencia es el último snapshot y la copia va a una carpeta temporal; en
+        modo ZIP es un espejo persistente del mundo (backups/.zip_mirror) que se
+        pone al día y luego se comprime entero fuera de la pausa.
+        Devuelve (carpeta a respaldar, entradas sin cambios, pausa en ms).
+        """
+        mirror = self.backup_mode != "incremental"
+        baseline = {}
+        if mirror:
+            staging_world = self.backups_dir / ".zip_mirror" / self.world_dir.name
+            staging_world.mkdir(parents=True, exist_ok=True)
+            # El espejo se copia con copy2, así que tamaño y mtime identifican su versión
+            for root, dirs, files in os.walk(staging_world):
+                for file in files:
+                    file_path = Path(root) / file
+                    stat = file_path.stat()
+                    arcname = (Path(self.world_dir.name) / file_path.relative_to(staging_world)).as_posix()
+                    baseline[arcname] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+        else:
+            latest = self.backup_store.latest_manifest()
+            baseline = latest["files"] if latest else {}
+            
+            staging_root = self.backups_dir / ".staging"
+            if staging_root.exists():
+                shutil.rmtree(staging_root)
+            staging_world = staging_root / self.world_dir.name
+            staging_world.mkdir(parents=True)
+        
+        unchanged = {}
+        dirty_count = 0
+        dirty_bytes = 0
+        
+        rcon = self.get_rcon()
+        waiter = self.expect_output(r"Saved the game") if rcon is None else None
+        paused_at = time.perf_counter()
+        try:
+            if rcon is not None:
+                # Por RCON la respuesta de save-all llega cuando el guardado terminó
+                rcon.command("save-off")
+                if "Saved the game" not in rcon.command("save-all flush", timeout=self.backup_flush_timeout):
+                    raise RuntimeError("el servidor no confirmó 'Saved the game'")
+            else:
+                if not self.send_command("save-off", quiet=True):
+                    raise RuntimeError("no se pudo enviar save-off")
+                self.send_command("save-all flush", quiet=True)
+                
+                if self.wait_output(waiter, self.backup_flush_timeout) is None:
+                    raise TimeoutError("el servidor no confirmó 'Saved the game'")
+            flushed_at = time.perf_counter()
+            
+            for root, dirs, files in os.walk(self.world_dir):
+                for file in files:
+                    file_path = Path(root) / file
+                    arcname = file_path.relative_to(self.world_dir.parent).as_posix()
+                    stat = file_path.stat()
+                    
+                    prev = baseline.get(arcname)
+                    if prev and prev["size"] == stat.st_size and prev["mtime_ns"] == stat.st_mtime_ns:
+                        unchanged[arcname] = prev
+                        continue
+                    
+                    target = staging_world / file_path.relative_to(self.world_dir)
+                    target.parent.mkdir(parents=True, exist_ok=True)
+                    shutil.copy2(file_path, target)
+                    dirty_count += 1
+                    dirty_bytes += stat.st_size
+            
+            if mirror:
+                # Archivos borrados del mundo desde la última copia
+                for arcname in set(baseline) - set(unchanged):
+                    target = staging_world / Path(arcname).relative_to(self.world_dir.name)
+                    if not (self.world_dir / target.relative_to(staging_world)).exists():
+                        target.unlink(missing_ok=True)
+        finally:
+            self.send_command("save-on", quiet=True)
+            pause_ms = (time.perf_counter() - paused_at) * 1000
+        
+        console.print(
+            f"⏸️ Guardado pausado {pause_ms:.0f} ms (flush {(flushed_at - paused_at) * 1000:.0f} ms, "
+            f"{dirty_count} archivos modificados, {dirty_bytes / (1024 * 1024):.1f} MB copiados)",
+            style="dim"
+        )
+        return staging_world, {} if mirror else unchanged, pause_ms
+    
+    def get_backups(self):
+        """Obtener backups disponibles (incrementales y ZIP), más recientes primero"""
+        backups = []
+        
+        for manifest_path in self.backup_store.list_manifests():
+            try:
+                manifest = self.backup_store.load_manifest(manifest_path)
+            except Exception as e:
+                console.print(f"⚠️ Manifiesto ilegible {manifest_path.name}: {e}", style="yellow")
+                continue
+            backups.append({
+                "name": manifest_path.stem,
+                "path": manifest_path,
+                "type": "incremental",
+                "created": datetime.fromisoformat(manifest["created"]),
+                "size": manifest["total_bytes"],
+                "stored": manifest["stored_bytes"],
+                "auto": manifest.get("auto", False)
+            })
+        
+        for zip_path in self.backups_dir.glob("world_backup_*.zip"):
+            stat = zip_path.stat()
+            backups.append({
+                "name": zip_path.name,
+                "path": zip_path,
+                "type": "zip",
+                "created": datetime.fromtimestamp(stat.st_mtime),
+                "size": stat.st_size,
+                "stored": stat.st_size,
+                "auto": "auto" in zip_path.name.lower()
+            })
+        
+        return sorted(backups, key=lambda b: b["name"], reverse=True)
+    
+    def delete_backups(self, backups):
+        """Eliminar backups y recolectar bloques huérfanos. Devuelve (eliminados, bytes liberados)"""
+        deleted_count = 0
+        freed_space = 0
+        needs_gc = False
+        
+        for backup in backups:
+            try:
+                if backup["type"] == "incremental":
+                    self.backup_store.delete(backup["path"])
+                    needs_gc = True
+                else:
+                    freed_space += backup["path"].stat().st_size
+                    backup["path"].unlink()
+                deleted_count += 1
+            except Exception as e:
+                console.print(f"❌ Error eliminando {backup['name']}: {e}", style="red")
+        
+        if needs_gc:
+            removed, freed = self.backup_store.gc()
+            freed_space += freed
+            if removed:
+                console.print(f"🧹 {removed} bloques sin referencias eliminados del almacén", style="dim")
+        
+        return deleted_count, freed_space
+    
+    def prune_backups(self, keep_count):
+        """Mantener solo los backups más recientes"""
+        backups = self.get_backups()
+        if len(backups) <= keep_count:
+            return
+        
+        old_backups = backups[keep_count:]
+        self.delete_backups(old_backups)
+        for old_backup in old_backups:
+            console.print(f"🗑️ Backup antiguo eliminado: {old_backup['name']}", style="dim")
+    
+    def restore_backup(self):
+        """Restaurar backup del mundo"""
+        try:
+            backups = self.get_backups()
+            
+            if not backups:
+                console.print("❌ No hay backups disponibles", style="red")
+                return False
+            
+            console.print("📦 Backups disponibles:")
+            table = Table(show_header=True, header_style="bold magenta")
+            table.add_column("#", style="cyan", width=4)
+            table.add_column("Nombre", style="white")
+            table.add_column("Fecha", style="yellow")
+            table.add_column("Tamaño", style="green")
+            table.add_column("Tipo", style="blue")
+            
+            for i, backup in enumerate(backups[:10], 1):  # Mostrar últimos 10
+                size_mb = backup["size"] / (1024 * 1024)
+                date_str = backup["created"].strftime("%Y-%m-%d %H:%M")
+                backup_type = "Incremental" if backup["type"] == "incremental" else "ZIP"
+                table.add_row(str(i), backup["name"], date_str, f"{size_mb:.1f} MB", backup_type)
+            
+            console.print(table)
+            
+            choice = IntPrompt.ask("Selecciona el backup a restaurar (número)", default=1)
+            
+            if 1 <= choice <= len(backups):
+                selected_backup = backups[choice - 1]
+                
+                if not Confirm.ask(f"⚠️ ¿Restaurar {selected_backup['name']}? Esto sobrescribirá el mundo actual"):
+                    return False
+                
+                # Detener servidor si está ejecutándose
+                was_running = self.server_running
+                if was_running:
+                    console.print("🛑 Deteniendo servidor para restaurar...", style="yellow")
+                    self.stop_server()
+                    time.sleep(2)
+                
+                self.restore_world(selected_backup)
+                
+                console.print("✅ Backup restaurado correctamente", style="green")
+                
+                # Reiniciar servidor si estaba ejecutándose
+                if was_running:
+                    console.print("🚀 Reiniciando servidor...", style="yellow")
+                    time.sleep(1)
+                    self.start_server()
+                
+                return True
+            else:
+                console.print("❌ Selección inválida", style="red")
+                return False
+                
+        except Exception as e:
+            console.print(f"❌ Error restaurando backup: {e}", style="red")
+            return False
+    
+    def restore_world(self, backup):
+        """Restaurar un backup con el servidor detenido.
+
+        El backup se descomprime en paralelo en una carpeta temporal junto al mundo y
+        después se intercambia con el mundo actual mediante renombrados (O(1)); el
+        mundo anterior queda en backups/world_pre_restore_<fecha> como copia de seguridad.
+        """
+        staging_dir = self.server_dir / f".{self.world_dir.name}_restore_tmp"
+        if staging_dir.exists():
+            shutil.rmtree(staging_dir)
+        staging_dir.mkdir()
+        
+        console.print(f"📤 Restaurando {backup['name']}...", style="yellow")
+        start = time.perf_counter()
+        try:
+            if backup["type"] == "incremental":
+                restored = self.backup_store.restore(backup["path"], staging_dir, workers=self.backup_workers)
+            else:
+                restored = extract_zip_parallel(backup["path"], staging_dir, workers=self.backup_workers)
+        except Exception:
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        seconds = time.perf_counter() - start
+        console.print(
+            f"   {restored / (1024 * 1024):.1f} MB en {seconds:.1f}s con {self.backup_workers} hilos",
+            style="dim"
+        )
+        
+        # Intercambio: mundo actual -> copia previa, carpeta temporal -> mundo
+        pre_restore_dir = None
+        try:
+            if self.world_dir.exists():
+                timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+                pre_restore_dir = self.backups_dir / f"world_pre_restore_{timestamp}"
+                taken = [self._pre_restore_order(p)[1] for p in self.backups_dir.glob(f"world_pre_restore_{timestamp}*")]
+                if taken:
+                    pre_restore_dir = self.backups_dir / f"world_pre_restore_{timestamp}_{max(taken) + 1}"
+                os.replace(self.world_dir, pre_restore_dir)
+                console.print(f"💾 Mundo actual conservado en: {pre_restore_dir.name}", style="blue")
+            os.replace(staging_dir, self.world_dir)
+        except Exception:
+            if pre_restore_dir and pre_restore_dir.exists() and not self.world_dir.exists():
+                os.replace(pre_restore_dir, self.world_dir)
+            shutil.rmtree(staging_dir, ignore_errors=True)
+            raise
+        
+        self.prune_pre_restore_copies(self.max_pre_restore_copies)
+        return True
+    
+    def _pre_restore_order(self, path):
+        """Clave de orden de world_pre_restore_<fecha>_<hora>[_n]: fecha y después sufijo"""
+        parts = path.stem.split("_")
+        return parts[3:5], int(parts[5]) if len(parts) > 5 and parts[5].isdigit() else 0
+    
+    def prune_pre_restore_copies(self, keep_count):
+        """Eliminar las copias previas a restauraciones más antiguas"""
+        copies = sorted(self.backups_dir.glob("world_pre_restore_*"), key=self._pre_restore_order, reverse=True)
+        for old_copy in copies[keep_count:]:
+            try:
+                if old_copy.is_dir():
+                    shutil.rmtree(old_copy)
+                else:
+                    old_copy.unlink()
+                console.print(f"🗑️ Copia previa antigua eliminada: {old_copy.name}", style="dim")
+            except Exception as e:
+                console.print(f"❌ Error eliminando {old_copy.name}: {e}", style="red")
+    
+    def world_tools_menu(self):
+        """Menú de herramientas del mundo"""
+        while True:
+            console.clear()
+            panel = Panel.fit(
+                "[bold blue]⚡ HERRAMIENTAS DEL MUNDO[/bold blue]",
+                border_style="blue"
+            )
+            console.print(panel)
+            
+            table = Table(show_header=True, header_style="bold magenta")
+            table.add_column("Opción", style="cyan", width=8)
+            table.add_column("Descripción", style="white")
+            
+            tools_options = [
+                ("1", "⚡ Comandos rápidos"),
+                ("2", "🗺️ Inspeccionar archivos de región"),
+                ("3", "📄 Ver datos del mundo y jugadores"),
+                ("4", "✂️ Recortar chunks poco visitados"),
+                ("5", "🧹 Desfragmentar archivos de región"),
+                ("0", "🔙 Volver al menú principal")
+            ]
+            
+            for option, desc in tools_options:
+                table.add_row(option, desc)
+            
+            console.print(table)
+            
+            choice = Prompt.ask("Selecciona una opción", choices=["0", "1", "2", "3", "4", "5"])
             
-            # Verificar tamaño del backup
-            backup_size = backup_path.stat().st_size / (1024 * 1024)  # MB
+            if choice == "0":
+                break
+            elif choice == "1":
+                self.quick_commands_menu()
+            elif choice == "2":
+                self.inspect_region_files()
+            elif choice == "3":
+                self.show_world_info()
+            elif choice == "4":
+                self.trim_world()
+            elif choice == "5":
+                self.defragment_world()
+    
+    def get_region_files(self):
+        """Archivos .mca del mundo agrupados por carpeta (region, entities, poi)"""
+        region_files = []
+        for folder in ("region", "entities", "poi"):
+            region_files.extend(sorted((self.world_dir / folder).glob("r.*.mca")))
+        return region_files
+    
+    def inspect_region_files(self):
+        """Mostrar el índice de chunks de los archivos de región"""
+        region_files = self.get_region_files()
+        
+        if not region_files:
+            console.print("❌ No se encontraron archivos de región", style="red")
+            Prompt.ask("Presiona Enter para continuar")
+            return
+        
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("#", style="cyan", width=4)
+        table.add_column("Archivo", style="white")
+        table.add_column("Chunks", style="yellow")
+        table.add_column("Sectores usados", style="green")
+        table.add_column("Tamaño", style="blue")
+        table.add_column("Última modificación", style="dim")
+        
+        for i, path in enumerate(region_files, 1):
+            try:
+                with RegionFile(path) as region:
+                    newest = max(region.timestamps) if region.chunk_count() else 0
+                    table.add_row(
+                        str(i),
+                        f"{path.parent.name}/{path.name}",
+                        str(region.chunk_count()),
+                        f"{region.used_sectors()}/{region.total_sectors()}",
+                        f"{region.file_size / 1024:.0f} KB",
+                        datetime.fromtimestamp(newest).strftime("%Y-%m-%d %H:%M") if newest else "-"
+                    )
+            except Exception as e:
+                table.add_row(str(i), f"{path.parent.name}/{path.name}", "❌", str(e), "", "")
+        
+        console.print(table)
+        
+        choice = IntPrompt.ask("Número de archivo para ver sus chunks (0 para volver)", default=0)
+        if not 1 <= choice <= len(region_files):
+            return
+        
+        path = region_files[choice - 1]
+        with RegionFile(path) as region:
+            chunk_table = Table(show_header=True, header_style="bold magenta")
+            chunk_table.add_column("Chunk (x, z)", style="cyan")
+            chunk_table.add_column("Sector", style="white")
+            chunk_table.add_column("Sectores", style="yellow")
+            chunk_table.add_column("Modificado", style="dim")
+            
+            chunks = list(region.chunks())
+            for x, z, sector, count, timestamp in chunks[:50]:
+                chunk_table.add_row(
+                    f"{region.region_x * 32 + x}, {region.region_z * 32 + z}",
+                    str(sector),
+                    str(count),
+                    datetime.fromtimestamp(timestamp).strftime("%Y-%m-%d %H:%M:%S")
+                )
             
-            console.print(f"✅ Backup creado: {backup_name} ({backup_size:.1f} MB)", style="green")
+            console.print(chunk_table)
+            if len(chunks) > 50:
+                console.print(f"... y {len(chunks) - 50} chunks más", style="dim")
             
-            # Limpiar backups antiguos (mantener solo los últimos 10)
-            backups = sorted(self.backups_dir.glob("world_backup_*.zip"))
-            if len(backups) > 10:
-                for old_backup in backups[:-10]:
-                    old_backup.unlink()
-                    console.print(f"🗑️ Backup antiguo eliminado: {old_backup.name}", style="dim")
+            if chunks and Confirm.ask("¿Descomprimir un chunk para comprobarlo?", default=False):
+                x = IntPrompt.ask("Chunk X (absoluto)")
+                z = IntPrompt.ask("Chunk Z (absoluto)")
+                try:
+                    in_region = (x >> 5, z >> 5) == (region.region_x, region.region_z)
+                    raw = region.read_raw(x, z) if in_region else None
+                    if raw is None:
+                        console.print("📭 El chunk no existe en este archivo", style="dim")
+                    else:
+                        data = region.read_chunk(x, z)
+                        console.print(
+                            f"✅ Compresión {raw[0]}: {len(raw[1])} bytes → {len(data)} bytes de NBT",
+                            style="green"
+                        )
+                        chunk = parse_nbt(data)
+                        console.print(
+                            f"   Estado: {chunk.get('Status', 'N/A')} | "
+                            f"InhabitedTime: {chunk.get('InhabitedTime', 'N/A')} ticks | "
+                            f"DataVersion: {chunk.get('DataVersion', 'N/A')}"
+                        )
+                except Exception as e:
+                    console.print(f"❌ Error leyendo chunk: {e}", style="red")
+        
+        Prompt.ask("Presiona Enter para continuar")
+    
+    def compact_regions(self, jobs, dry_run=False):
+        """Compactar archivos de región en paralelo (un proceso por archivo).
+
+        jobs: lista de (ruta, índices de chunks a eliminar). Devuelve los resultados.
+        """
+        paths = [str(path) for path, drop in jobs]
+        drops = [drop for path, drop in jobs]
+        with ProcessPoolExecutor(max_workers=self.world_tool_workers) as pool:
+            return list(pool.map(compact_region_file, paths, drops, [dry_run] * len(jobs)))
+    
+    def print_region_report(self, results):
+        """Tabla de tamaños antes/después por carpeta de región"""
+        table = Table(show_header=True, header_style="bold magenta")
+        table.add_column("Carpeta", style="cyan")
+        table.add_column("Archivos", style="white")
+        table.add_column("Chunks eliminados", style="red")
+        table.add_column("Tamaño actual", style="yellow")
+        table.add_column("Tamaño final", style="green")
+        table.add_column("Recuperable", style="bold green")
+        
+        totals = {}
+        for result in results:
+            folder = Path(result["path"]).parent.name
+            entry = totals.setdefault(folder, [0, 0, 0, 0])
+            entry[0] += 1
+            entry[1] += result["dropped"]
+            entry[2] += result["old_size"]
+            entry[3] += result["new_size"]
+        
+        for folder, (files, dropped, old_size, new_size) in totals.items():
+            table.add_row(
+                folder,
+                str(files),
+                str(dropped),
+                f"{old_size / (1024 * 1024):.1f} MB",
+                f"{new_size / (1024 * 1024):.1f} MB",
+                f"{(old_size - new_size) / (1024 * 1024):.1f} MB"
+            )
+        
+        console.print(table)
+        return sum(r["old_size"] - r["new_size"] for r in results)
+    
+    def trim_world(self):
+        """Eliminar chunks con poco InhabitedTime y compactar los archivos de región"""
+        console.clear()
+        panel = Panel.fit(
+            "[bold blue]✂️ RECORTE DE CHUNKS POCO VISITADOS[/bold blue]",
+            border_style="blue"
+        )
+        console.print(panel)
+        
+        if self.server_running:
+            console.print("❌ Detén el servidor antes de recortar el mundo", style="red")
+            Prompt.ask("Presiona Enter para continuar")
+            return
+        
+        region_dir = self.world_dir / "region"
+        region_files = sorted(region_dir.glob("r.*.mca"))
+        if not region_files:
+            console.print("❌ No se encontraron archivos de región", style="red")
+            Prompt.ask("Presiona Enter para continuar")
+            return
+        
+        seconds = IntPrompt.ask("Tiempo mínimo que un jugador estuvo en el chunk para conservarlo (segundos)", default=60)
+        min_ticks = max(0, seconds) * 20
+        
+        try:
+            console.print(f"🔍 Analizando {len(region_files)} regiones con {self.world_tool_workers} procesos...", style="yellow")
+            with ProcessPoolExecutor(max_workers=self.world_tool_workers) as pool:
+                scans = dict(pool.map(
+                    _scan_region_inhabited,
+                    [str(path) for path in region_files],
+                    [min_ticks] * len(region_files)
+                ))
+            
+            # Los chunks de entities/ y poi/ siguen la decisión del chunk de terreno
+            jobs = []
+            for folder in ("region", "entities", "poi"):
+                for path in sorted((self.world_dir / folder).glob("r.*.mca")):
+                    jobs.append((path, scans.get(str(region_dir / path.name), [])))
+            
+            console.print("📋 Simulación (no se ha modificado nada):")
+            reclaimable = self.print_region_report(self.compact_regions(jobs, dry_run=True))
+            console.print(f"💾 Espacio recuperable: [bold]{reclaimable / (1024 * 1024):.1f} MB[/bold]")
+            
+            if not Confirm.ask("⚠️ ¿Aplicar el recorte? Los chunks eliminados se regenerarán", default=False):
+                console.print("❌ Recorte cancelado", style="yellow")
+                Prompt.ask("Presiona Enter para continuar")
+                return
             
-            return True
+            if Confirm.ask("💾 ¿Crear un backup antes de recortar?", default=True):
+                if not self.create_backup():
+                    console.print("❌ Recorte cancelado: el backup falló", style="red")
+                    Prompt.ask("Presiona Enter para continuar")
+                    return
             
+            # Comprobar de nuevo: el servidor pudo arrancarse mientras tanto
+            if self.server_running:
+                console.print("❌ El servidor se está ejecutando, recorte cancelado", style="red")
+            else:
+                freed = self.print_region_report(self.compact_regions(jobs))
+                console.print(f"✅ Recorte completado: {freed / (1024 * 1024):.1f} MB liberados", style="green")
         except Exception as e:
-            console.print(f"❌ Error creando backup: {e}", style="red")
-            return False
+            console.print(f"❌ Error recortando el mundo: {e}", style="red")
+        
+        Prompt.ask("Presiona Enter para continuar")
     
-    def restore_backup(self):
-        """Restaurar backup del mundo"""
+    def defragment_world(self):
+        """Reescribir todos los archivos de región sin sectores libres y en orden Z"""
+        console.clear()
+        panel = Panel.fit(
+            "[bold blue]🧹 DESFRAGMENTAR ARCHIVOS DE REGIÓN[/bold blue]",
+            border_style="blue"
+        )
+        console.print(panel)
+        
+        if self.server_running:
+            console.print("❌ Detén el servidor antes de desfragmentar el mundo", style="red")
+            Prompt.ask("Presiona Enter para continuar")
+            return
+        
+        region_files = self.get_region_files()
+        if not region_files:
+            console.print("❌ No se encontraron archivos de región", style="red")
+            Prompt.ask("Presiona Enter para continuar")
+            return
+        
+        if not Confirm.ask(f"⚠️ ¿Reescribir {len(region_files)} archivos de región?", default=True):
+            return
+        
         try:
-            backups = sorted(self.backups_dir.glob("world_backup_*.zip"), reverse=True)
-            
-            if not backups:
-                console.print("❌ No hay backups disponibles", style="red")
-                return False
+            console.print(f"🧹 Compactando con {self.world_tool_workers} procesos...", style="yellow")
+            results = self.compact_regions([(path, []) for path in region_files])
             
-            console.print("📦 Backups disponibles:")
             table = Table(show_header=True, header_style="bold magenta")
-            table.add_column("#", style="cyan", width=4)
-            table.add_column("Nombre", style="white")
-            table.add_column("Fecha", style="yellow")
-            table.add_column("Tamaño", style="green")
-            
-            for i, backup in enumerate(backups[:10], 1):  # Mostrar últimos 10
-                stat = backup.stat()
-                size_mb = stat.st_size / (1024 * 1024)
-                date_str = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M")
-                table.add_row(str(i), backup.name, date_str, f"{size_mb:.1f} MB")
+            table.add_column("Archivo", style="white")
+            table.add_column("Fragmentación antes", style="red")
+            table.add_column("Fragmentación después", style="green")
+            table.add_column("Tamaño antes", style="yellow")
+            table.add_column("Tamaño después", style="green")
+            
+            for result in results:
+                path = Path(result["path"])
+                table.add_row(
+                    f"{path.parent.name}/{path.name}",
+                    f"{result['old_fragmentation']:.1%}",
+                    f"{result['new_fragmentation']:.1%}",
+                    f"{result['old_size'] / 1024:.0f} KB",
+                    f"{result['new_size'] / 1024:.0f} KB"
+                )
             
             console.print(table)
-            
-            choice = IntPrompt.ask("Selecciona el backup a restaurar (número)", default=1)
-            
-            if 1 <= choice <= len(backups):
-                selected_backup = backups[choice - 1]
-                
-                if not Confirm.ask(f"⚠️ ¿Restaurar {selected_backup.name}? Esto sobrescribirá el mundo actual"):
-                    return False
-                
-                # Detener servidor si está ejecutándose
-                was_running = self.server_running
-                if was_running:
-                    console.print("🛑 Deteniendo servidor para restaurar...", style="yellow")
-                    self.stop_server()
-                    time.sleep(2)
-                
-                # Respaldar mundo actual
-                if self.world_dir.exists():
-                    backup_current_name = f"world_pre_restore_{datetime.now().strftime('%Y%m%d_%H%M%S')}.zip"
-                    console.print(f"💾 Respaldando mundo actual como: {backup_current_name}", style="blue")
-                    
-                    with zipfile.ZipFile(self.backups_dir / backup_current_name, 'w', zipfile.ZIP_DEFLATED) as zipf:
-                        for root, dirs, files in os.walk(self.world_dir):
-                            for file in files:
-                                file_path = Path(root) / file
-                                arcname = file_path.relative_to(self.world_dir.parent)
-                                zipf.write(file_path, arcname)
-                    
-                    # Eliminar mundo actual
-                    shutil.rmtree(self.world_dir)
-                
-                # Extraer backup
-                console.print(f"📤 Restaurando {selected_backup.name}...", style="yellow")
-                with zipfile.ZipFile(selected_backup, 'r') as zipf:
-                    zipf.extractall(self.server_dir)
-                
-                console.print("✅ Backup restaurado correctamente", style="green")
-                
-                # Reiniciar servidor si estaba ejecutándose
-                if was_running:
-                    console.print("🚀 Reiniciando servidor...", style="yellow")
-                    time.sleep(1)
-                    self.start_server()
-                
-                return True
-            else:
-                console.print("❌ Selección inválida", style="red")
-                return False
-                
+            freed = sum(r["old_size"] - r["new_size"] for r in results)
+            console.print(f"✅ Desfragmentación completada: {freed / (1024 * 1024):.1f} MB liberados", style="green")
         except Exception as e:
-            console.print(f"❌ Error restaurando backup: {e}", style="red")
-            return False
+            console.print(f"❌ Error desfragmentando: {e}", style="red")
+        
+        Prompt.ask("Presiona Enter para continuar")
+    
+    def show_world_info(self):
+        """Mostrar datos de level.dat y de los jugadores guardados"""
+        level_file = self.world_dir / "level.dat"
+        if not level_file.exists():
+            console.print("❌ level.dat no encontrado", style="red")
+            Prompt.ask("Presiona Enter para continuar")
+            return
+        
+        try:
+            level = load_nbt_file(level_file)
+            data = level["Data"]
+            spawn = [data.get("SpawnX"), data.get("SpawnY"), data.get("SpawnZ")]
+            if "spawn" in data:
+                spawn = list(data.find("spawn", "pos", default=[]))
+            
+            world_table = Table(show_header=False)
+            world_table.add_column("Campo", style="cyan")
+            world_table.add_column("Valor", style="white")
+            world_table.add_row("Nombre", str(data.get("LevelName", "N/A")))
+            world_table.add_row("Versión", str(data.find("Version", "Name", default="N/A")))
+            world_table.add_row("DataVersion", str(data.get("DataVersion", "N/A")))
+            world_table.add_row("Semilla", str(data.find("WorldGenSettings", "seed", default="N/A")))
+            world_table.add_row("Días jugados", str(data.get("Time", 0) // 24000))
+            world_table.add_row("Spawn", ", ".join(str(v) for v in spawn))
+            world_table.add_row("Hardcore", "Sí" if data.get("hardcore") else "No")
+            console.print(world_table)
+        except Exception as e:
+            console.print(f"❌ Error leyendo level.dat: {e}", style="red")
+        
+        # Nombres de jugador conocidos por el servidor
+        names = {}
+        for entry in self.load_json_config(self.server_dir / "usercache.json"):
+            names[entry.get("uuid")] = entry.get("name")
+        
+        players_table = Table(show_header=True, header_style="bold magenta")
+        players_table.add_column("Jugador", style="cyan")
+        players_table.add_column("Posición", style="white")
+        players_table.add_column("Vida", style="red")
+        players_table.add_column("Nivel", style="green")
+        players_table.add_column("Inventario", style="yellow")
+        
+        for player_file in sorted((self.world_dir / "playerdata").glob("*.dat")):
+            try:
+                player = load_nbt_file(player_file)
+                pos = player.get("Pos")
+                position = ", ".join(f"{v:.0f}" for v in pos) if pos is not None else "N/A"
+                inventory = player.get("Inventory")
+                items = [item.get("id", "?").replace("minecraft:", "") for item in inventory] if inventory else []
+                summary = ", ".join(items[:4]) + (f" (+{len(items) - 4})" if len(items) > 4 else "")
+                players_table.add_row(
+                    names.get(player_file.stem, player_file.stem[:8] + "..."),
+                    position,
+                    f"{player.get('Health', 0):.0f}",
+                    str(player.get("XpLevel", 0)),
+                    summary or "Vacío"
+                )
+            except Exception as e:
+                players_table.add_row(player_file.stem[:8] + "...", f"❌ {e}", "", "", "")
+        
+        console.print(players_table)
+        Prompt.ask("Presiona Enter para continuar")
     
     def quick_commands_menu(self):
         """Menú de comandos rápidos"""
@@ -813,32 +5439,26 @@ class MinecraftServerManager:
             
             if choice == "0":
                 break
-            elif choice == "1":
-                self.send_command("weather clear")
-            elif choice == "2":
-                self.send_command("weather rain")
-            elif choice == "3":
-                self.send_command("time set day")
-            elif choice == "4":
-                self.send_command("time set night")
-            elif choice == "5":
-                self.send_command("kill @e[type=item]")
-            elif choice == "6":
-                self.send_command("kill @e[type=!player,type=!item,type=!armor_stand]")
-            elif choice == "7":
-                self.send_command("save-all")
-            elif choice == "8":
-                self.send_command("reload")
-            elif choice == "9":
-                self.send_command("list")
-                time.sleep(1)
-                self.send_command("tps")
-            elif choice == "10":
-                custom_cmd = Prompt.ask("Introduce el comando (sin /)")
-                self.send_command(custom_cmd)
             
-            if choice != "0":
-                time.sleep(1)  # Pausa para ver el resultado
+            # (comando, respuesta esperada) para poder asociarla por la consola
+            quick_commands = {
+                "1": [("weather clear", r"Set the weather|Changing to clear")],
+                "2": [("weather rain", r"Set the weather|Changing to rain")],
+                "3": [("time set day", r"Set the time")],
+                "4": [("time set night", r"Set the time")],
+                "5": [("kill @e[type=item]", r"Killed|No entity was found")],
+                "6": [("kill @e[type=!player,type=!item,type=!armor_stand]", r"Killed|No entity was found")],
+                "7": [("save-all", r"Saved the game")],
+                "8": [("reload", r"Reload")],
+                "9": [("list", r"players online"), ("tps", r"TPS from last")]
+            }
+            if choice == "10":
+                commands_to_run = [(Prompt.ask("Introduce el comando (sin /)"), None)]
+            else:
+                commands_to_run = quick_commands[choice]
+            
+            for command, expect in commands_to_run:
+                self.show_command_result(command, expect)
     
     def show_connection_instructions(self):
         """Mostrar instrucciones de conexión"""
@@ -853,14 +5473,7 @@ class MinecraftServerManager:
         zerotier_ip = self.get_zerotier_ip()
         
         # Leer puerto del server.properties
-        server_port = "25565"  # Puerto por defecto
-        props_file = self.config_files["server.properties"]
-        if props_file.exists():
-            with open(props_file, 'r') as f:
-                for line in f:
-                    if line.startswith("server-port="):
-                        server_port = line.split("=")[1].strip()
-                        break
+        server_port = self.read_server_properties().get("server-port") or "25565"  # Puerto por defecto
         
         # Tabla de conexiones
         conn_table = Table(show_header=True, header_style="bold magenta")
@@ -876,7 +5489,7 @@ class MinecraftServerManager:
             "Misma red WiFi/Ethernet"
         )
         
-        if zerotier_ip != "No conectado" and zerotier_ip != "ZeroTier no disponible":
+        if zerotier_ip not in ("No conectado", "ZeroTier no disponible", self.IP_PENDING):
             conn_table.add_row(
                 "ZeroTier (VPN)",
                 zerotier_ip,
@@ -896,7 +5509,7 @@ class MinecraftServerManager:
             f"4. En 'Dirección del servidor' introduce: [yellow]{local_ip}:{server_port}[/yellow] (LAN)",
         ]
         
-        if zerotier_ip != "No conectado" and zerotier_ip != "ZeroTier no disponible":
+        if zerotier_ip not in ("No conectado", "ZeroTier no disponible", self.IP_PENDING):
             instructions.append(f"   O para ZeroTier: [yellow]{zerotier_ip}:{server_port}[/yellow] (Remoto)")
         
         instructions.extend([
@@ -973,6 +5586,31 @@ class MinecraftServerManager:
                 f"⏱️ Tiempo activo: [yellow]{self.get_server_uptime()}[/yellow]"
             ]
             
+            tick = self.tick_probe.snapshot
+            if self.server_running and tick["mspt"] is not None:
+                tps_color = "green" if tick["tps"] >= tick["target"] * 0.95 else "yellow" if tick["tps"] >= tick["target"] * 0.75 else "red"
+                status_info.append(
+                    f"⚡ TPS: [{tps_color}]{tick['tps']:.1f}[/{tps_color}] | MSPT: [yellow]{tick['mspt']:.1f} ms[/yellow]"
+                    + (f" (p95 {tick['p95']:.1f}, p99 {tick['p99']:.1f})" if tick["p95"] is not None else "")
+                )
+                status_info.append(f"📈 MSPT 5m [yellow]{sparkline(self.timeseries.series('mspt', 0, 300)[::10], 30)}[/yellow]")
+            elif self.server_running and self.tick_query_supported is False:
+                status_info.append("⚡ TPS: [dim]sin 'tick query' (requiere 1.20.3+)[/dim]")
+            gc = self.metrics.get("gc")
+            if self.server_running and gc and gc["pauses"]:
+                gc_info = f"🗑️ GC: p50 {gc['p50']:.1f} / p95 {gc['p95']:.1f} / p99 {gc['p99']:.1f} ms"
+                if gc["alloc_rate"] is not None:
+                    gc_info += f" | asig. {gc['alloc_rate'] / (1024 * 1024):.0f} MB/s"
+                if gc["promotion_rate"] is not None:
+                    gc_info += f" | prom. {gc['promotion_rate'] / (1024 * 1024):.1f} MB/s"
+                if gc["heap_after"] is not None:
+                    gc_info += f" | heap {gc['heap_after'] // (1024 * 1024)}/{gc['heap_total'] // (1024 * 1024)} MB"
+                status_info.append(gc_info)
+            if self.server_running and tick["lagging"]:
+                status_info.append(
+                    f"⚠️ [red]Can't keep up: {tick['lag_ms']} ms / {tick['lag_ticks']} ticks perdidos en el último minuto[/red]"
+                )
+            
             layout["status"].update(Panel(
                 "\n".join(status_info),
                 title="📊 Estado del Servidor",
@@ -987,6 +5625,18 @@ class MinecraftServerManager:
                     f"🧠 RAM: [cyan]{stats['memory_percent']:.1f}%[/cyan] ({stats['memory_used']//1024//1024//1024:.1f}GB/{stats['memory_total']//1024//1024//1024:.1f}GB)",
                     f"💾 Disco: [blue]{stats['disk_percent']:.1f}%[/blue] ({stats['disk_used']//1024//1024//1024:.1f}GB/{stats['disk_total']//1024//1024//1024:.1f}GB)",
                 ]
+                process = stats["process"]
+                if process:
+                    system_info.append(
+                        f"☕ Java: [yellow]{process['cpu']:.1f}%[/yellow] CPU, "
+                        f"[cyan]{process['rss'] / (1024 ** 3):.1f}GB[/cyan], {process['threads']} hilos"
+                    )
+                system_info.extend([
+                    f"📈 CPU 1m  [yellow]{sparkline(self.timeseries.series('cpu', 0, 60), 30)}[/yellow]",
+                    f"📈 CPU 1h  [yellow]{sparkline(self.timeseries.series('cpu', 1, 60), 30)}[/yellow]",
+                    f"📈 RAM Java 1h [cyan]{sparkline(self.timeseries.series('rss', 1, 60), 30)}[/cyan]",
+                    f"📈 Disco E/S 1m [blue]{sparkline(self.timeseries.series('disk_write', 0, 60), 30)}[/blue]",
+                ])
             else:
                 system_info = ["❌ No se pudieron obtener estadísticas"]
             
@@ -999,6 +5649,7 @@ class MinecraftServerManager:
             # Jugadores conectados
             players = self.get_connected_players()
             players_info = []
+            players_info.append(f"📈 24h [green]{sparkline(self.timeseries.series('players', 2, 24))}[/green]")
             if players:
                 players_info.append(f"👥 Conectados: [green]{len(players)}[/green]")
                 for player in players[:5]:  # Mostrar máximo 5
@@ -1015,7 +5666,13 @@ class MinecraftServerManager:
             ))
             
             # Output del servidor (últimas líneas)
-            output_lines = self.last_output[-8:] if self.last_output else ["📝 [dim]No hay output disponible[/dim]"]
+            output_lines = list(self.last_output)[-8:] if self.last_output else ["📝 [dim]No hay output disponible[/dim]"]
+            pump_stats = self.output_pump.stats if self.output_pump else None
+            if pump_stats and (pump_stats["late"] or pump_stats["dropped"]):
+                output_lines.append(
+                    f"[yellow]⚠️ Consola saturada: {pump_stats['late']} líneas tardías, "
+                    f"{pump_stats['dropped']} descartadas[/yellow]"
+                )
             layout["output"].update(Panel(
                 "\n".join(output_lines),
                 title="📋 Output del Servidor",
@@ -1071,6 +5728,7 @@ class MinecraftServerManager:
                 ("11", "⚡ Herramientas del mundo"),
                 ("12", "💾 Gestión de backups"),
                 ("13", "🔒 Configurar seguridad"),
+                ("14", "🔎 Buscar en logs"),
                 ("0", "❌ Salir")
             ]
             
@@ -1090,7 +5748,7 @@ class MinecraftServerManager:
             
             choice = Prompt.ask(
                 "\n[bold yellow]Selecciona una opción[/bold yellow]",
-                choices=[str(i) for i in range(14)]
+                choices=[str(i) for i in range(15)]
             )
             
             # Ejecutar acción seleccionada
@@ -1177,13 +5835,112 @@ class MinecraftServerManager:
                 self.users_menu()
             
             elif choice == "11":
-                self.quick_commands_menu()
+                self.world_tools_menu()
             
             elif choice == "12":
                 self.backup_menu()
             
             elif choice == "13":
                 self.security_menu()
+            
+            elif choice == "14":
+                self.log_search_menu()
+    
+    def update_log_index(self):
+        """Indexar los logs archivados nuevos mostrando el resultado"""
+        if not self.log_index.logs_dir.exists():
+            console.print("❌ No existe la carpeta logs", style="red")
+            return False
+        
+        start = time.perf_counter()
+        with console.status("🔎 Indexando logs archivados..."):
+            files, lines = self.log_index.update()
+        if files:
+            console.print(
+                f"✅ {files} archivos indexados ({lines} líneas) en {time.perf_counter() - start:.1f}s",
+                style="green"
+            )
+        return True
+    
+    def log_search_menu(self):
+        """Búsquedas sobre logs/*.log.gz"""
+        console.clear()
+        panel = Panel.fit(
+            "[bold blue]🔎 BÚSQUEDA EN LOGS[/bold blue]",
+            border_style="blue"
+        )
+        console.print(panel)
+        
+        if not self.update_log_index():
+            Prompt.ask("Presiona Enter para continuar")
+            return
+        
+        while True:
+            stats = self.log_index.stats()
+            console.print(
+                f"\n📚 {stats['files']} archivos, {stats['lines']} líneas indexadas "
+                f"({'FTS5' if stats['fts'] else 'LIKE'})",
+                style="dim"
+            )
+            
+            table = Table(show_header=True, header_style="bold magenta")
+            table.add_column("Opción", style="cyan", width=8)
+            table.add_column("Descripción", style="white")
+            table.add_row("1", "Buscar texto")
+            table.add_row("2", "Última conexión de un jugador")
+            table.add_row("3", "Frecuencia por día (últimos 7 días)")
+            table.add_row("4", "Actualizar índice")
+            table.add_row("0", "Volver")
+            console.print(table)
+            
+            choice = Prompt.ask("Selecciona una opción", choices=["0", "1", "2", "3", "4"])
+            if choice == "0":
+                break
+            
+            try:
+                if choice == "1":
+                    query = Prompt.ask("Texto a buscar (todas las palabras)")
+                    limit = IntPrompt.ask("Máximo de resultados", default=30)
+                    start = time.perf_counter()
+                    rows = self.log_index.search(query, limit=limit)
+                    elapsed_ms = (time.perf_counter() - start) * 1000
+                    
+                    results = Table(show_header=True, header_style="bold magenta")
+                    results.add_column("Fecha", style="yellow")
+                    results.add_column("Archivo:línea", style="cyan")
+                    results.add_column("Línea", style="white")
+                    for name, line_no, logged_at, message in rows:
+                        results.add_row(logged_at, f"{name}:{line_no}", message)
+                    console.print(results)
+                    console.print(f"{len(rows)} resultados en {elapsed_ms:.1f} ms", style="dim")
+                
+                elif choice == "2":
+                    player = Prompt.ask("Nombre del jugador")
+                    rows = self.log_index.search(f"{player} joined the game", limit=1)
+                    if rows:
+                        name, line_no, logged_at, message = rows[0]
+                        console.print(f"👤 Última entrada de {player}: [yellow]{logged_at}[/yellow] ({name}:{line_no})")
+                    else:
+                        console.print(f"📭 No hay registros de {player} en los logs archivados", style="yellow")
+                
+                elif choice == "3":
+                    query = Prompt.ask("Texto a contar (ej. una excepción)")
+                    since = (datetime.now() - timedelta(days=7)).strftime("%Y-%m-%d")
+                    rows = self.log_index.count_by_day(query, since=since)
+                    if rows:
+                        results = Table(show_header=True, header_style="bold magenta")
+                        results.add_column("Día", style="yellow")
+                        results.add_column("Coincidencias", style="white")
+                        for day, count in rows:
+                            results.add_row(day, str(count))
+                        console.print(results)
+                    else:
+                        console.print("📭 Sin coincidencias en los últimos 7 días", style="yellow")
+                
+                elif choice == "4":
+                    self.update_log_index()
+            except (ValueError, sqlite3.Error) as e:
+                console.print(f"❌ Error en la búsqueda: {e}", style="red")
     
     def config_menu(self):
         """Menú de configuración"""
@@ -1206,6 +5963,8 @@ class MinecraftServerManager:
                 ("3", "whitelist.json", "Lista blanca de jugadores"),
                 ("4", "banned-players.json", "Jugadores baneados"),
                 ("5", "banned-ips.json", "IPs baneadas"),
+                ("6", "Registro GC", "Log de GC de la JVM y pausas"),
+                ("7", "Exportador /metrics", "Métricas OpenMetrics para Prometheus"),
                 ("0", "Volver", "Volver al menú principal")
             ]
             
@@ -1214,7 +5973,7 @@ class MinecraftServerManager:
             
             console.print(table)
             
-            choice = Prompt.ask("Selecciona archivo a editar", choices=["0", "1", "2", "3", "4", "5"])
+            choice = Prompt.ask("Selecciona archivo a editar", choices=["0", "1", "2", "3", "4", "5", "6", "7"])
             
             if choice == "0":
                 break
@@ -1228,11 +5987,96 @@ class MinecraftServerManager:
                 self.manage_banned_players()
             elif choice == "5":
                 self.manage_banned_ips()
+            elif choice == "6":
+                self.configure_gc_logging()
+            elif choice == "7":
+                self.configure_metrics_exporter()
+    
+    def configure_metrics_exporter(self):
+        """Activar o desactivar el endpoint /metrics"""
+        console.clear()
+        running = self.metrics_exporter is not None and self.metrics_exporter.running
+        panel = Panel.fit(
+            "[bold blue]📡 EXPORTADOR DE MÉTRICAS[/bold blue]\n"
+            f"[dim]Estado: {'activo' if running else 'detenido'} | "
+            f"http://{self.metrics_exporter_host}:{self.metrics_exporter_port}/metrics[/dim]",
+            border_style="blue"
+        )
+        console.print(panel)
+        
+        if running:
+            if Confirm.ask("¿Detener el exportador?", default=False):
+                self.stop_metrics_exporter()
+                console.print("✅ Exportador detenido", style="green")
+        elif Confirm.ask("¿Iniciar el exportador?", default=True):
+            self.metrics_exporter_host = Prompt.ask(
+                "Dirección de escucha (0.0.0.0 para aceptar conexiones remotas)",
+                default=self.metrics_exporter_host
+            )
+            self.metrics_exporter_port = IntPrompt.ask("Puerto", default=self.metrics_exporter_port)
+            try:
+                self.start_metrics_exporter()
+                console.print(
+                    f"✅ Sirviendo http://{self.metrics_exporter_host}:{self.metrics_exporter_port}/metrics",
+                    style="green"
+                )
+            except OSError as e:
+                self.metrics_exporter = None
+                console.print(f"❌ No se pudo abrir el puerto: {e}", style="red")
+        Prompt.ask("Presiona Enter para continuar")
+    
+    def configure_gc_logging(self):
+        """Activar el registro de GC y mostrar el análisis de pausas"""
+        console.clear()
+        panel = Panel.fit(
+            "[bold blue]🗑️ REGISTRO DE GC DE LA JVM[/bold blue]\n"
+            f"[dim]Estado: {'activado' if self.gc_logging else 'desactivado'} | Archivo: {self.gc_log_file}[/dim]",
+            border_style="blue"
+        )
+        console.print(panel)
+        
+        if self.gc_logging:
+            self.gc_tail.poll()
+            summary = self.gc_parser.summary()
+            if summary["pauses"]:
+                table = Table(show_header=True, header_style="bold magenta")
+                table.add_column("Métrica", style="cyan")
+                table.add_column("Valor", style="white")
+                table.add_row("Pausas analizadas", str(summary["pauses"]))
+                table.add_row("Pausa p50 / p95 / p99", f"{summary['p50']:.1f} / {summary['p95']:.1f} / {summary['p99']:.1f} ms")
+                table.add_row("Pausa máxima", f"{summary['max']:.1f} ms")
+                if summary["gc_time_pct"] is not None:
+                    table.add_row("Tiempo en pausas", f"{summary['gc_time_pct']:.2f}%")
+                if summary["alloc_rate"] is not None:
+                    table.add_row("Tasa de asignación", f"{summary['alloc_rate'] / (1024 * 1024):.1f} MB/s")
+                if summary["promotion_rate"] is not None:
+                    table.add_row("Tasa de promoción", f"{summary['promotion_rate'] / (1024 * 1024):.2f} MB/s")
+                if summary["heap_after"] is not None:
+                    table.add_row("Heap tras GC", f"{summary['heap_after'] // (1024 * 1024)} / {summary['heap_total'] // (1024 * 1024)} MB")
+                table.add_row("GC completos", str(summary["full_gcs"]))
+                tick = self.tick_probe.snapshot
+                if tick["mspt"] is not None:
+                    table.add_row("MSPT (referencia)", f"{tick['mspt']:.1f} ms (p95 {tick['p95'] or 0:.1f})")
+                console.print(table)
+            else:
+                console.print("📭 Aún no hay pausas registradas", style="dim")
+        
+        if Confirm.ask(f"¿{'Desactivar' if self.gc_logging else 'Activar'} el registro de GC?", default=False):
+            self.gc_logging = not self.gc_logging
+            if self.gc_logging:
+                # La JVM en marcha no escribe gc.log: lo que haya es de una ejecución anterior
+                self.gc_parser = GcLogParser()
+                self.gc_tail = LogTail(self.gc_log_file, self.gc_parser.feed, since=time.time())
+            console.print(
+                f"✅ Registro de GC {'activado' if self.gc_logging else 'desactivado'} "
+                "(se aplica en el próximo arranque del servidor)",
+                style="green"
+            )
+        Prompt.ask("Presiona Enter para continuar")
     
     def manage_banned_players(self):
         """Gestionar jugadores baneados"""
-        banned_file = self.config_files["banned-players.json"]
-        banned_data = self.load_json_config(banned_file)
+        banned_config = self.config_store["banned-players.json"]
         
         console.clear()
         panel = Panel.fit(
@@ -1242,6 +6086,7 @@ class MinecraftServerManager:
         console.print(panel)
         
         while True:
+            banned_data = banned_config.entries()
             if banned_data:
                 table = Table(show_header=True, header_style="bold magenta")
                 table.add_column("UUID", style="cyan")
@@ -1274,21 +6119,22 @@ class MinecraftServerManager:
                 name = Prompt.ask("Nombre del jugador a banear")
                 reason = Prompt.ask("Razón del baneo", default="Violación de reglas")
                 
-                import uuid
-                player_uuid = str(uuid.uuid4())
+                player_uuid = self.resolve_player_uuid(name)
+                if player_uuid is None:
+                    continue
                 ban_entry = {
                     "uuid": player_uuid,
                     "name": name,
-                    "created": datetime.now().isoformat(),
+                    "created": format_ban_time(),
                     "source": "Panel de Administración",
                     "expires": "forever",
                     "reason": reason
                 }
                 
-                banned_data.append(ban_entry)
-                if self.save_json_config(banned_file, banned_data):
+                change = self.update_config_entry(banned_config, ban_entry)
+                if change:
                     console.print("✅ Jugador baneado", style="green")
-                    if self.server_running:
+                    if self.server_running and change == "added":
                         self.send_command(f"ban {name} {reason}")
             
             elif choice == "2":
@@ -1299,16 +6145,15 @@ class MinecraftServerManager:
                 names = [ban.get("name", "N/A") for ban in banned_data]
                 name_to_unban = Prompt.ask("Nombre del jugador a desbanear", choices=names)
                 
-                banned_data = [ban for ban in banned_data if ban.get("name") != name_to_unban]
-                if self.save_json_config(banned_file, banned_data):
+                if self.remove_config_entry(banned_config, name_to_unban):
                     console.print("✅ Jugador desbaneado", style="green")
                     if self.server_running:
                         self.send_command(f"pardon {name_to_unban}")
     
     def manage_banned_ips(self):
-        """Gestionar IPs baneadas"""
-        banned_file = self.config_files["banned-ips.json"]
-        banned_data = self.load_json_config(banned_file)
+        """Gestionar IPs y rangos baneados"""
+        # El vigilante de configuración mantiene el motor al día con los archivos
+        engine = self.ban_engine
         
         console.clear()
         panel = Panel.fit(
@@ -1318,63 +6163,128 @@ class MinecraftServerManager:
         console.print(panel)
         
         while True:
-            if banned_data:
+            if len(engine):
                 table = Table(show_header=True, header_style="bold magenta")
-                table.add_column("IP", style="cyan")
+                table.add_column("IP / Rango", style="cyan")
                 table.add_column("Razón", style="yellow")
                 table.add_column("Fecha", style="red")
+                table.add_column("Expira", style="white")
                 
-                for ban in banned_data:
+                for ban in list(engine.snapshot().values())[:50]:
                     table.add_row(
-                        ban.get("ip", "N/A"),
+                        ban.get("ip") or ban.get("cidr"),
                         ban.get("reason", "Sin razón"),
-                        ban.get("created", "N/A")[:10]  # Solo fecha
+                        ban.get("created", "N/A")[:10],  # Solo fecha
+                        ban.get("expires", "forever")
                     )
                 
                 console.print(table)
+                console.print(
+                    f"📊 {len(engine.singles())} IPs y {len(engine.ranges())} rangos"
+                    + (" (mostrando 50)" if len(engine) > 50 else ""),
+                    style="dim"
+                )
             else:
                 console.print("📭 No hay IPs baneadas", style="dim")
             
             console.print("\n🔧 Opciones:")
-            console.print("1. Banear IP")
-            console.print("2. Desbanear IP")
+            console.print("1. Banear IP o rango (CIDR)")
+            console.print("2. Desbanear IP o rango")
+            console.print("3. Importar lista de bloqueo")
+            console.print("4. Exportar lista")
+            console.print("5. Comprobar una IP")
+            console.print("6. Sincronizar con el servidor")
             console.print("0. Volver")
             
-            choice = Prompt.ask("Selecciona una opción", choices=["0", "1", "2"])
+            choice = Prompt.ask("Selecciona una opción", choices=["0", "1", "2", "3", "4", "5", "6"])
             
             if choice == "0":
                 break
             elif choice == "1":
-                ip = Prompt.ask("IP a banear (formato: 192.168.1.100)")
+                target = Prompt.ask("IP o rango a banear (ej: 192.168.1.100 o 203.0.113.0/24)")
                 reason = Prompt.ask("Razón del baneo", default="Actividad sospechosa")
+                hours = IntPrompt.ask("Duración en horas (0 = permanente)", default=0)
+                expires = format_ban_time(datetime.now().astimezone() + timedelta(hours=hours)) if hours > 0 else "forever"
                 
-                ban_entry = {
-                    "ip": ip,
-                    "created": datetime.now().isoformat(),
-                    "source": "Panel de Administración",
-                    "expires": "forever",
-                    "reason": reason
-                }
+                try:
+                    network = engine.add(target, reason=reason, expires=expires)
+                except ValueError:
+                    console.print("❌ IP o rango no válido", style="red")
+                    continue
                 
-                banned_data.append(ban_entry)
-                if self.save_json_config(banned_file, banned_data):
-                    console.print("✅ IP baneada", style="green")
-                    if self.server_running:
-                        self.send_command(f"ban-ip {ip}")
+                if engine.is_single(network):
+                    self.sync_ip_bans()
+                elif not self.save_ban_ranges():
+                    continue
+                console.print(f"✅ {network} baneado", style="green")
             
             elif choice == "2":
-                if not banned_data:
+                if not len(engine):
                     console.print("❌ No hay IPs baneadas", style="red")
                     continue
                 
-                ips = [ban.get("ip", "N/A") for ban in banned_data]
-                ip_to_unban = Prompt.ask("IP a desbanear", choices=ips)
+                target = Prompt.ask("IP o rango a desbanear")
+                try:
+                    entry = engine.remove(target)
+                except ValueError:
+                    entry = None
+                if entry is None:
+                    console.print("❌ Esa IP o rango no está baneado", style="red")
+                    continue
+                
+                if "ip" in entry:
+                    self.sync_ip_bans()
+                else:
+                    self.save_ban_ranges()
+                console.print("✅ IP desbaneada", style="green")
+            
+            elif choice == "3":
+                path = Path(Prompt.ask("Ruta del archivo (texto con una IP/CIDR por línea o JSON)"))
+                if not path.is_file():
+                    console.print("❌ Archivo no encontrado", style="red")
+                    continue
+                reason = Prompt.ask("Razón del baneo", default="Lista de bloqueo")
                 
-                banned_data = [ban for ban in banned_data if ban.get("ip") != ip_to_unban]
-                if self.save_json_config(banned_file, banned_data):
-                    console.print("✅ IP desbaneada", style="green")
-                    if self.server_running:
-                        self.send_command(f"pardon-ip {ip_to_unban}")
+                start = time.perf_counter()
+                added, invalid = engine.add_many(engine.read_blocklist(path), reason=reason)
+                self.save_ban_ranges()
+                banned, pardoned, errors = self.sync_ip_bans()
+                console.print(
+                    f"✅ {added} entradas nuevas ({banned} IPs enviadas al servidor) "
+                    f"en {time.perf_counter() - start:.1f}s",
+                    style="green"
+                )
+                if invalid:
+                    console.print(f"⚠️ {len(invalid)} líneas no válidas (ej: {invalid[0]})", style="yellow")
+                if errors:
+                    console.print(f"⚠️ {len(errors)} comandos sin confirmar", style="yellow")
+            
+            elif choice == "4":
+                path = Path(Prompt.ask("Archivo de destino", default=str(self.server_dir / "banned-ips-export.txt")))
+                with open(path, 'w', encoding='utf-8') as f:
+                    f.write(engine.export_lines())
+                console.print(f"✅ {len(engine)} entradas exportadas a {path}", style="green")
+            
+            elif choice == "5":
+                ip = Prompt.ask("IP a comprobar")
+                entry = engine.match(ip)
+                if entry:
+                    console.print(
+                        f"🚫 Baneada por {entry.get('ip') or entry.get('cidr')}: {entry.get('reason')} "
+                        f"(expira: {entry.get('expires')})",
+                        style="red"
+                    )
+                else:
+                    console.print("✅ La IP no está baneada", style="green")
+            
+            elif choice == "6":
+                to_ban, to_pardon = engine.diff(self.config_store["banned-ips.json"].entries())
+                console.print(f"📋 {len(to_ban)} IPs por banear, {len(to_pardon)} por perdonar en el servidor")
+                if (to_ban or to_pardon) and Confirm.ask("¿Aplicar los cambios?", default=True):
+                    banned, pardoned, errors = self.sync_ip_bans()
+                    console.print(f"✅ {banned} baneadas, {pardoned} perdonadas", style="green")
+                    for command, error in errors[:10]:
+                        console.print(f"   ❌ {command}: {error}", style="red")
     
     def command_interface(self):
         """Interfaz para enviar comandos al servidor"""
@@ -1401,8 +6311,7 @@ class MinecraftServerManager:
                 break
             
             if command.strip():
-                self.send_command(command)
-                time.sleep(0.5)  # Pausa para ver el resultado
+                self.show_command_result(command.strip())
     
     def users_menu(self):
         """Menú de administración de usuarios"""
@@ -1464,12 +6373,21 @@ class MinecraftServerManager:
         players = self.get_connected_players()
         
         if players:
+            sessions = self.player_tracker.sessions()
             table = Table(show_header=True, header_style="bold magenta")
             table.add_column("Jugador", style="cyan")
+            table.add_column("Conectado desde", style="yellow")
+            table.add_column("Tiempo", style="green")
             table.add_column("Acciones Disponibles", style="white")
             
             for player in players:
-                table.add_row(player, "kick, tp, gamemode, etc.")
+                since = sessions.get(player, {}).get("since")
+                table.add_row(
+                    player,
+                    since.strftime("%H:%M:%S") if since else "N/A",
+                    str(datetime.now() - since).split('.')[0] if since else "N/A",
+                    "kick, tp, gamemode, etc."
+                )
             
             console.print(table)
             
@@ -1516,10 +6434,16 @@ class MinecraftServerManager:
             console.print(panel)
             
             # Mostrar estadísticas de backups
-            backups = list(self.backups_dir.glob("world_backup_*.zip"))
-            total_size = sum(backup.stat().st_size for backup in backups) / (1024 * 1024)  # MB
+            backups = self.get_backups()
+            zip_size = sum(backup["size"] for backup in backups if backup["type"] == "zip")
+            total_size = (zip_size + self.backup_store.disk_usage()) / (1024 * 1024)  # MB
             
             stats_text = f"📊 Backups disponibles: {len(backups)} | Espacio usado: {total_size:.1f} MB"
+            if self.last_backup_stats:
+                stats_text += (
+                    f" | Último: {self.last_backup_stats['seconds']:.1f}s "
+                    f"a {self.last_backup_stats['mb_per_s']:.1f} MB/s"
+                )
             console.print(stats_text)
             
             table = Table(show_header=True, header_style="bold magenta")
@@ -1533,6 +6457,7 @@ class MinecraftServerManager:
                 ("4", "🗑️ Eliminar backup específico"),
                 ("5", "🧹 Limpiar backups antiguos"),
                 ("6", "⚙️ Configurar backup automático"),
+                ("7", "📈 Comparar políticas de compresión"),
                 ("0", "🔙 Volver al menú principal")
             ]
             
@@ -1541,7 +6466,7 @@ class MinecraftServerManager:
             
             console.print(table)
             
-            choice = Prompt.ask("Selecciona una opción", choices=["0", "1", "2", "3", "4", "5", "6"])
+            choice = Prompt.ask("Selecciona una opción", choices=["0", "1", "2", "3", "4", "5", "6", "7"])
             
             if choice == "0":
                 break
@@ -1559,10 +6484,17 @@ class MinecraftServerManager:
                 self.cleanup_old_backups()
             elif choice == "6":
                 self.configure_auto_backup()
+            elif choice == "7":
+                if not self.world_dir.exists():
+                    console.print("❌ Directorio del mundo no encontrado", style="red")
+                else:
+                    console.print("⏱️ Comprimiendo el mundo con cada política...", style="yellow")
+                    print_backup_benchmark(benchmark_backup_policies(self.world_dir, self.backup_workers))
+                Prompt.ask("Presiona Enter para continuar")
     
     def list_backups(self):
         """Listar todos los backups disponibles"""
-        backups = sorted(self.backups_dir.glob("world_backup_*.zip"), reverse=True)
+        backups = self.get_backups()
         
         if not backups:
             console.print("📭 No hay backups disponibles", style="dim")
@@ -1574,19 +6506,22 @@ class MinecraftServerManager:
         table.add_column("Nombre", style="white")
         table.add_column("Fecha de Creación", style="yellow")
         table.add_column("Tamaño", style="green")
+        table.add_column("Escrito", style="green")
         table.add_column("Tipo", style="blue")
         
         for i, backup in enumerate(backups, 1):
-            stat = backup.stat()
-            size_mb = stat.st_size / (1024 * 1024)
-            date_str = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M:%S")
-            backup_type = "Auto" if "auto" in backup.name.lower() else "Manual"
+            size_mb = backup["size"] / (1024 * 1024)
+            stored_mb = backup["stored"] / (1024 * 1024)
+            date_str = backup["created"].strftime("%Y-%m-%d %H:%M:%S")
+            backup_type = "Auto" if backup["auto"] else "Manual"
+            backup_type += " (incremental)" if backup["type"] == "incremental" else " (ZIP)"
             
             table.add_row(
                 str(i),
-                backup.name,
+                backup["name"],
                 date_str,
                 f"{size_mb:.1f} MB",
+                f"{stored_mb:.1f} MB",
                 backup_type
             )
         
@@ -1595,7 +6530,7 @@ class MinecraftServerManager:
     
     def delete_specific_backup(self):
         """Eliminar un backup específico"""
-        backups = sorted(self.backups_dir.glob("world_backup_*.zip"), reverse=True)
+        backups = self.get_backups()
         
         if not backups:
             console.print("📭 No hay backups para eliminar", style="dim")
@@ -1610,11 +6545,10 @@ class MinecraftServerManager:
         table.add_column("Tamaño", style="green")
         
         for i, backup in enumerate(backups, 1):
-            stat = backup.stat()
-            size_mb = stat.st_size / (1024 * 1024)
-            date_str = datetime.fromtimestamp(stat.st_mtime).strftime("%Y-%m-%d %H:%M")
+            size_mb = backup["size"] / (1024 * 1024)
+            date_str = backup["created"].strftime("%Y-%m-%d %H:%M")
             
-            table.add_row(str(i), backup.name, date_str, f"{size_mb:.1f} MB")
+            table.add_row(str(i), backup["name"], date_str, f"{size_mb:.1f} MB")
         
         console.print(table)
         
@@ -1627,9 +6561,10 @@ class MinecraftServerManager:
             if 1 <= choice <= len(backups):
                 selected_backup = backups[choice - 1]
                 
-                if Confirm.ask(f"⚠️ ¿Eliminar {selected_backup.name}?"):
-                    selected_backup.unlink()
-                    console.print("✅ Backup eliminado", style="green")
+                if Confirm.ask(f"⚠️ ¿Eliminar {selected_backup['name']}?"):
+                    deleted_count, freed_space = self.delete_backups([selected_backup])
+                    if deleted_count:
+                        console.print(f"✅ Backup eliminado, {freed_space / (1024 * 1024):.1f} MB liberados", style="green")
                 else:
                     console.print("❌ Eliminación cancelada", style="yellow")
             else:
@@ -1642,7 +6577,7 @@ class MinecraftServerManager:
     
     def cleanup_old_backups(self):
         """Limpiar backups antiguos"""
-        backups = sorted(self.backups_dir.glob("world_backup_*.zip"))
+        backups = self.get_backups()
         
         if len(backups) <= 5:
             console.print("ℹ️ No hay suficientes backups para limpiar (se mantienen mínimo 5)", style="blue")
@@ -1656,23 +6591,14 @@ class MinecraftServerManager:
             Prompt.ask("Presiona Enter para continuar")
             return
         
-        to_delete = backups[:-keep_count]
+        to_delete = backups[keep_count:]
         
         console.print(f"📋 Se eliminarán {len(to_delete)} backups antiguos:")
         for backup in to_delete:
-            console.print(f"  🗑️ {backup.name}")
+            console.print(f"  🗑️ {backup['name']}")
         
         if Confirm.ask(f"⚠️ ¿Confirmar eliminación de {len(to_delete)} backups?"):
-            deleted_count = 0
-            freed_space = 0
-            
-            for backup in to_delete:
-                try:
-                    freed_space += backup.stat().st_size
-                    backup.unlink()
-                    deleted_count += 1
-                except Exception as e:
-                    console.print(f"❌ Error eliminando {backup.name}: {e}", style="red")
+            deleted_count, freed_space = self.delete_backups(to_delete)
             
             freed_mb = freed_space / (1024 * 1024)
             console.print(f"✅ {deleted_count} backups eliminados, {freed_mb:.1f} MB liberados", style="green")
@@ -1692,9 +6618,34 @@ class MinecraftServerManager:
         
         console.print("📋 Configuración actual:")
         console.print("  🕐 Frecuencia: Cada 3 horas")
-        console.print("  📦 Máximo backups: 10")
+        console.print(f"  📦 Máximo backups: {self.max_backups}")
+        console.print(f"  🧩 Tipo: {'Incremental (deduplicado)' if self.backup_mode == 'incremental' else 'ZIP completo'}")
+        console.print(f"  🧵 Hilos de compresión: {self.backup_workers}")
+        console.print(f"  🗜️ Política de compresión: {self.backup_policy}")
         console.print("  📁 Directorio: " + str(self.backups_dir))
         
+        if Confirm.ask("¿Cambiar el tipo de backup?", default=False):
+            self.backup_mode = Prompt.ask(
+                "Tipo de backup",
+                choices=["incremental", "zip"],
+                default=self.backup_mode
+            )
+            console.print(f"✅ Tipo de backup: {self.backup_mode}", style="green")
+        
+        if Confirm.ask("¿Cambiar el número de hilos de compresión?", default=False):
+            workers = IntPrompt.ask("Hilos de compresión", default=self.backup_workers)
+            self.backup_workers = max(1, workers)
+            console.print(f"✅ Hilos de compresión: {self.backup_workers}", style="green")
+        
+        if Confirm.ask("¿Cambiar la política de compresión?", default=False):
+            self.backup_policy = Prompt.ask(
+                "Política de compresión",
+                choices=list(BACKUP_COMPRESSION_POLICIES),
+                default=self.backup_policy
+            )
+            self.backup_store.policy = self.backup_policy
+            console.print(f"✅ Política de compresión: {self.backup_policy}", style="green")
+        
         console.print("\n⚠️ Nota: La configuración automática está activa.")
         console.print("Los backups se crean automáticamente cada 3 horas mientras el panel esté ejecutándose.")
         
@@ -1795,6 +6746,11 @@ class MinecraftServerManager:
             if not self.authenticate():
                 return
             
+            # Métricas en segundo plano para el dashboard y el menú
+            self.timeseries.load()
+            self.metrics.start()
+            self.start_jobs()
+            
             # Mostrar menú principal
             self.show_main_menu()
             
@@ -1807,10 +6763,20 @@ class MinecraftServerManager:
         except Exception as e:
             console.print(f"\n💥 Error inesperado: {e}", style="bold red")
         finally:
+            self.stop_metrics_exporter()
+            self.stop_jobs()
+            self.metrics.stop()
+            self.save_timeseries()
             console.print("\n✨ ¡Gracias por usar el panel de administración!", style="bold blue")
 
 def main():
     """Función principal"""
+    if len(sys.argv) > 1 and sys.argv[1] == "--benchmark-backups":
+        # Benchmark sobre el mundo indicado o el de ejemplo junto al script
+        world_dir = Path(sys.argv[2]) if len(sys.argv) > 2 else Path(__file__).resolve().parent / "world"
+        print_backup_benchmark(benchmark_backup_policies(world_dir))
+        return
+    
     server_manager = MinecraftServerManager()
     server_manager.run()
 
@@ -0,0 +1,28 @@
+"""Carga de los scripts del panel como módulos (sus nombres empiezan por cifra)"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import pytest
+
+ROOT = Path(__file__).resolve().parent.parent
+
+
+def _load(name, filename):
+    if name not in sys.modules:
+        spec = importlib.util.spec_from_file_location(name, ROOT / filename)
+        module = importlib.util.module_from_spec(spec)
+        sys.modules[name] = module
+        spec.loader.exec_module(module)
+    return sys.modules[name]
+
+
+@pytest.fixture(scope="session")
+def panel():
+    return _load("admin_panel", "04_admin_panel.py")
+
+
+@pytest.fixture(scope="session")
+def installer():
+    return _load("install_minecraft_server", "02_install_minecraft_server.py")
@@ -0,0 +1,166 @@
+import hashlib
+import os
+import re
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+DATA = os.urandom(1024 * 1024 + 12345)
+SHA1 = hashlib.sha1(DATA).hexdigest()
+SHA256 = hashlib.sha256(DATA).hexdigest()
+
+
+class ArtifactHandler(BaseHTTPRequestHandler):
+    """Servidor de archivos con Range, If-Range y fallos a demanda"""
+
+    protocol_version = "HTTP/1.1"
+
+    def _headers(self, status, length, extra=(), etag=None):
+        self.send_response(status)
+        self.send_header("Content-Length", str(length))
+        self.send_header("ETag", etag or self.server.etag)
+        if self.server.ranges:
+            self.send_header("Accept-Ranges", "bytes")
+        for name, value in extra:
+            self.send_header(name, value)
+        self.end_headers()
+
+    def do_HEAD(self):
+        self._headers(200, len(self.server.data), etag=self.server.head_etag)
+
+    def do_GET(self):
+        server = self.server
+        data = server.data
+        match = re.fullmatch(r"bytes=(\d+)-(\d+)", self.headers.get("Range", ""))
+        with server.lock:
+            server.requests.append(self.headers.get("Range"))
+        if match and server.ranges and self.headers.get("If-Range", server.etag) == server.etag:
+            start, end = int(match.group(1)), int(match.group(2))
+            body = data[start:end + 1]
+            self._headers(206, len(body), [("Content-Range", f"bytes {start}-{end}/{len(data)}")])
+        else:
+            start, body = 0, data
+            self._headers(200, len(body))
+        with server.lock:
+            cut = start == server.cut_at
+            if cut:
+                server.cut_at = None
+        if cut:
+            # Conexión cortada a mitad del tramo
+            self.wfile.write(body[:len(body) // 2])
+            self.wfile.flush()
+            self.close_connection = True
+            return
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ArtifactHandler)
+    server.daemon_threads = True
+    server.lock = threading.Lock()
+    server.data = DATA
+    server.etag = '"v1"'
+    server.head_etag = None
+    server.ranges = True
+    server.cut_at = None
+    server.requests = []
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/server.jar"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def downloader(installer, tmp_path):
+    return installer.ArtifactDownloader(tmp_path / "cache", workers=4, min_part_size=256 * 1024, timeout=5)
+
+
+def test_parallel_ranges(server, downloader):
+    path = downloader.fetch(server.url, sha1=SHA1, sha256=SHA256)
+
+    assert path.read_bytes() == DATA
+    assert path == downloader.cache_path("sha256", SHA256)
+    assert downloader.cache_path("sha1", SHA1).read_bytes() == DATA
+    assert len(server.requests) == 4 and all(server.requests)
+
+
+def test_cache_hit_skips_network(server, downloader, tmp_path):
+    downloader.fetch(server.url, sha1=SHA1)
+    server.requests.clear()
+
+    destination = tmp_path / "server.jar"
+    downloader.install(server.url, destination, sha1=SHA1)
+
+    assert destination.read_bytes() == DATA
+    assert server.requests == []
+
+
+def test_server_without_ranges_gets_single_request(server, downloader):
+    server.ranges = False
+
+    path = downloader.fetch(server.url, sha256=SHA256)
+
+    assert path.read_bytes() == DATA
+    assert server.requests == [None]
+
+
+def test_ignored_range_restarts_with_full_download(server, downloader):
+    # El archivo cambia entre el HEAD y los GET: If-Range no coincide y llega un 200 completo
+    server.head_etag = '"v1"'
+    server.etag = '"v2"'
+
+    path = downloader.fetch(server.url, sha1=SHA1)
+
+    assert path.read_bytes() == DATA
+    assert server.requests[-1] is None
+
+
+def test_interrupted_download_resumes(installer, server, downloader):
+    downloader.CHUNK_SIZE = 16 * 1024
+    parts = downloader._new_state(server.url, len(DATA), None, True)["parts"]
+    cut_start, cut_end, _ = parts[1]
+    server.cut_at = cut_start
+    with pytest.raises(installer.DownloadError):
+        downloader.fetch(server.url, sha1=SHA1)
+    assert list((downloader.cache_dir / "downloads").glob("*.json"))
+
+    server.requests.clear()
+    path = downloader.fetch(server.url, sha1=SHA1)
+
+    assert path.read_bytes() == DATA
+    # El tramo cortado continúa tras lo que ya estaba escrito, no desde su inicio
+    ranges = [tuple(map(int, re.fullmatch(r"bytes=(\d+)-(\d+)", header).groups())) for header in server.requests]
+    (resumed,) = [start for start, end in ranges if end == cut_end]
+    assert cut_start < resumed <= cut_end
+    assert sum(end - start + 1 for start, end in ranges) < len(DATA)
+
+
+def test_hash_mismatch_is_rejected(installer, server, downloader):
+    with pytest.raises(installer.DownloadError, match="SHA1"):
+        downloader.fetch(server.url, sha1="0" * 40)
+
+    assert not list((downloader.cache_dir / "downloads").iterdir())
+    assert not (downloader.cache_dir / "artifacts").exists()
+
+
+def test_each_part_uses_its_own_session(installer, server, tmp_path):
+    sessions = []
+
+    def factory():
+        session = installer.requests.Session()
+        sessions.append((threading.get_ident(), session))
+        return session
+
+    downloader = installer.ArtifactDownloader(tmp_path / "cache", session_factory=factory, min_part_size=256 * 1024)
+    downloader.fetch(server.url, sha1=SHA1)
+
+    part_sessions = sessions[1:]
+    assert len(part_sessions) == 4
+    assert len({id(session) for _, session in part_sessions}) == 4
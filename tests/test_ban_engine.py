@@ -0,0 +1,140 @@
+import threading
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+
+@pytest.fixture
+def engine(panel):
+    return panel.BanEngine()
+
+
+def in_minutes(panel, minutes):
+    return panel.format_ban_time(datetime.now().astimezone() + timedelta(minutes=minutes))
+
+
+def test_cidr_match_picks_most_specific(engine):
+    engine.add("10.0.0.0/8", reason="red")
+    engine.add("10.1.0.0/16", reason="subred")
+    engine.add("10.1.2.3", reason="ip")
+
+    assert engine.match("10.1.2.3")["reason"] == "ip"
+    assert engine.match("10.1.9.9")["reason"] == "subred"
+    assert engine.match("10.200.0.1")["reason"] == "red"
+    assert engine.match("11.0.0.0") is None
+    assert engine.match("9.255.255.255") is None
+
+
+def test_adjacent_ranges_and_gaps(engine):
+    engine.add("192.168.0.0/24")
+    engine.add("192.168.1.0/24")
+    engine.add("192.168.3.0/24")
+
+    assert engine.match("192.168.1.255")["cidr"] == "192.168.1.0/24"
+    assert engine.match("192.168.2.1") is None
+    assert engine.match("192.168.3.0")["cidr"] == "192.168.3.0/24"
+
+
+def test_ipv6_and_mapped_ipv4(engine):
+    engine.add("2001:db8::/32")
+    engine.add("203.0.113.7")
+
+    assert engine.match("[2001:db8::1]")["cidr"] == "2001:db8::/32"
+    assert engine.match("2001:db9::1") is None
+    assert engine.match("::ffff:203.0.113.7")["ip"] == "203.0.113.7"
+    assert engine.match("no es una ip") is None
+
+
+def test_index_is_rebuilt_after_changes(engine):
+    engine.add("172.16.0.0/12")
+    assert engine.match("172.16.5.5") is not None
+
+    engine.remove("172.16.0.0/12")
+    assert engine.match("172.16.5.5") is None
+
+
+def test_singles_ranges_and_bulk_add(engine):
+    added, invalid = engine.add_many(["1.2.3.4", "5.6.0.0/16", "1.2.3.4", "basura"])
+
+    assert added == 2 and invalid == ["basura"]
+    assert [entry["ip"] for entry in engine.singles()] == ["1.2.3.4"]
+    assert [entry["cidr"] for entry in engine.ranges()] == ["5.6.0.0/16"]
+
+
+def test_expiry_uses_timer_wheel(panel, engine):
+    engine.add("8.8.8.8", expires=in_minutes(panel, 5))
+    engine.add("9.9.0.0/16", expires=in_minutes(panel, 30))
+    engine.add("1.1.1.1")
+
+    assert engine.expire() == []
+    expired = engine.expire(now=time.time() + 10 * 60)
+    assert [entry["ip"] for entry in expired] == ["8.8.8.8"]
+    assert engine.match("8.8.8.8") is None
+    assert engine.match("9.9.1.1") is not None
+
+    engine.expire(now=time.time() + 60 * 60)
+    assert engine.match("9.9.1.1") is None
+    assert engine.match("1.1.1.1") is not None
+
+
+def test_removed_ban_does_not_expire(panel, engine):
+    engine.add("8.8.8.8", expires=in_minutes(panel, 5))
+    engine.add("8.8.8.8")
+
+    assert engine.expire(now=time.time() + 10 * 60) == []
+    assert engine.match("8.8.8.8") is not None
+
+
+def test_diff_with_server_list(engine):
+    engine.add("1.1.1.1")
+    engine.add("2.2.2.2")
+    engine.add("3.0.0.0/8")
+
+    to_ban, to_pardon = engine.diff([{"ip": "2.2.2.2"}, {"ip": "4.4.4.4"}])
+
+    assert [entry["ip"] for entry in to_ban] == ["1.1.1.1"]
+    assert to_pardon == ["4.4.4.4"]
+
+
+def test_load_replaces_entries_and_schedules_expiry(panel, engine):
+    engine.add("7.7.7.7")
+    engine.load(
+        [{"ip": "1.1.1.1", "expires": in_minutes(panel, 5)}, {"ip": "no-ip"}],
+        [{"cidr": "10.0.0.0/8", "reason": "rango"}]
+    )
+
+    assert engine.match("7.7.7.7") is None
+    assert engine.match("10.2.3.4")["reason"] == "rango"
+    assert [entry["ip"] for entry in engine.expire(now=time.time() + 600)] == ["1.1.1.1"]
+
+
+def test_reload_never_exposes_empty_engine(engine):
+    singles = [{"ip": f"10.0.{i // 256}.{i % 256}"} for i in range(2000)]
+    engine.load(singles, [])
+    stop = threading.Event()
+    sizes = []
+
+    def reload():
+        while not stop.is_set():
+            engine.load(singles, [])
+
+    thread = threading.Thread(target=reload)
+    thread.start()
+    try:
+        for _ in range(200):
+            sizes.append(len(engine.singles()))
+    finally:
+        stop.set()
+        thread.join()
+    assert set(sizes) == {2000}
+
+
+def test_read_blocklist_formats(panel, tmp_path):
+    text = tmp_path / "lista.txt"
+    text.write_text("# comentario\n1.2.3.4\n10.0.0.0/8, spam\n\n")
+    json_list = tmp_path / "banned-ips.json"
+    json_list.write_text('[{"ip": "5.5.5.5"}, {"cidr": "6.0.0.0/8"}]')
+
+    assert panel.BanEngine.read_blocklist(text) == ["1.2.3.4", "10.0.0.0/8"]
+    assert panel.BanEngine.read_blocklist(json_list) == ["5.5.5.5", "6.0.0.0/8"]
@@ -0,0 +1,102 @@
+import pytest
+
+
+class Line:
+    def __init__(self, message):
+        self.message = message
+
+
+@pytest.fixture
+def sent():
+    return []
+
+
+@pytest.fixture
+def correlator(panel, sent):
+    def send_line(command):
+        sent.append(command)
+        return True
+    return panel.CommandCorrelator(send_line)
+
+
+def test_expected_line_resolves_request(correlator, sent):
+    future = correlator.request("whitelist add Alex", r"Added Alex to the whitelist")
+    correlator.handle_event(Line("Steve joined the game"))
+    correlator.handle_event(Line("Added Alex to the whitelist"))
+
+    assert future.result(1) == "Added Alex to the whitelist"
+    assert sent == ["whitelist add Alex"]
+
+
+def test_requests_resolve_by_pattern_not_order(correlator):
+    first = correlator.request("op Alex", r"Made Alex a server operator")
+    second = correlator.request("op Steve", r"Made Steve a server operator")
+    correlator.handle_event(Line("Made Steve a server operator"))
+    correlator.handle_event(Line("Made Alex a server operator"))
+
+    assert first.result(1).endswith("Alex a server operator")
+    assert second.result(1).endswith("Steve a server operator")
+
+
+def test_fail_pattern_raises_command_error(panel, correlator):
+    future = correlator.request("whitelist add Nadie", r"Added Nadie", fail=r"That player does not exist")
+    correlator.handle_event(Line("That player does not exist"))
+
+    with pytest.raises(panel.CommandError):
+        future.result(1)
+
+
+def test_generic_error_goes_to_the_only_request(panel, correlator):
+    future = correlator.request("tick query", r"Average time per tick")
+    correlator.handle_event(Line("Unknown or incomplete command, see below for error"))
+
+    with pytest.raises(panel.CommandError, match="Unknown or incomplete"):
+        future.result(1)
+
+
+def test_generic_error_is_not_guessed_between_requests(correlator):
+    first = correlator.request("op Alex", r"Made Alex", timeout=0.2)
+    second = correlator.request("op Steve", r"Made Steve", timeout=0.2)
+    correlator.handle_event(Line("Incorrect argument for command"))
+
+    with pytest.raises(TimeoutError):
+        first.result(1)
+    with pytest.raises(TimeoutError):
+        second.result(1)
+
+
+def test_generic_error_after_foreign_command_times_out(correlator):
+    future = correlator.request("op Alex", r"Made Alex", timeout=0.2)
+    # El administrador escribe un comando inválido en la consola
+    correlator.note_foreign()
+    correlator.handle_event(Line("Unknown or incomplete command, see below for error"))
+
+    with pytest.raises(TimeoutError):
+        future.result(1)
+
+
+def test_generic_error_right_after_foreign_command_times_out(correlator):
+    correlator.request("gamemode creativ Alex")
+    future = correlator.request("op Alex", r"Made Alex", timeout=0.2)
+    correlator.handle_event(Line("Incorrect argument for command"))
+
+    with pytest.raises(TimeoutError):
+        future.result(1)
+
+
+def test_request_without_pattern_only_sends(correlator, sent):
+    future = correlator.request("say hola")
+
+    assert future.result(1) is None
+    assert sent == ["say hola"]
+
+
+def test_failed_send_and_cancel(panel, correlator):
+    failing = panel.CommandCorrelator(lambda command: False)
+    with pytest.raises(panel.CommandError):
+        failing.request("list", r"players online").result(1)
+
+    future = correlator.request("list", r"players online")
+    correlator.cancel_all()
+    with pytest.raises(panel.CommandError, match="servidor detenido"):
+        future.result(1)
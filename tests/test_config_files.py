@@ -0,0 +1,188 @@
+import json
+import os
+import stat
+import sys
+
+import pytest
+
+PROPERTIES = (
+    "#Minecraft server properties\r\n"
+    "#Sat Oct 17 08:00:00 CEST 2026\r\n"
+    "motd=Servidor de \\u00d1and\\u00fa\r\n"
+    "! comentario con exclamación\r\n"
+    "max-players = 20\r\n"
+    "level-seed=\\\r\n"
+    "    12345\r\n"
+    "rcon.password=a\\=b\\:c\r\n"
+    "pvp:true\r\n"
+)
+
+
+def bump_mtime(path):
+    # Asegurar un mtime distinto aunque la resolución del sistema de archivos sea baja
+    st = path.stat()
+    os.utime(path, ns=(st.st_atime_ns, st.st_mtime_ns + 2_000_000_000))
+
+
+@pytest.fixture
+def properties_path(tmp_path):
+    path = tmp_path / "server.properties"
+    path.write_bytes(PROPERTIES.encode("utf-8"))
+    return path
+
+
+def test_properties_parse_escapes_and_continuations(panel, properties_path):
+    properties = panel.PropertiesFile(properties_path)
+
+    assert properties.as_dict() == {
+        "motd": "Servidor de Ñandú",
+        "max-players": "20",
+        "level-seed": "12345",
+        "rcon.password": "a=b:c",
+        "pvp": "true",
+    }
+
+
+def test_properties_update_keeps_comments_order_and_newlines(panel, properties_path):
+    properties = panel.PropertiesFile(properties_path)
+
+    changed = properties.update({"max-players": 40, "level-seed": "999", "pvp": "true", "white-list": "true"})
+
+    assert changed == ["max-players", "level-seed", "white-list"]
+    assert properties_path.read_bytes().decode("utf-8") == (
+        "#Minecraft server properties\r\n"
+        "#Sat Oct 17 08:00:00 CEST 2026\r\n"
+        "motd=Servidor de \\u00d1and\\u00fa\r\n"
+        "! comentario con exclamación\r\n"
+        "max-players=40\r\n"
+        "level-seed=999\r\n"
+        "rcon.password=a\\=b\\:c\r\n"
+        "pvp:true\r\n"
+        "white-list=true\r\n"
+    )
+    assert panel.PropertiesFile(properties_path).get("white-list") == "true"
+
+
+def test_properties_escape_round_trip(panel, properties_path):
+    properties = panel.PropertiesFile(properties_path)
+    value = " #lleva = y : y \\ y\ttab"
+
+    properties.update({"motd": value})
+
+    assert panel.PropertiesFile(properties_path).get("motd") == value
+
+
+def test_properties_unchanged_update_does_not_write(panel, properties_path):
+    properties = panel.PropertiesFile(properties_path)
+    before = properties_path.stat().st_mtime_ns
+
+    assert properties.update({"pvp": "true", "max-players": "20"}) == []
+    assert properties_path.stat().st_mtime_ns == before
+
+
+def test_properties_latin1_file_stays_latin1(panel, tmp_path):
+    path = tmp_path / "server.properties"
+    path.write_bytes("motd=Cañón\n".encode("latin-1"))
+    properties = panel.PropertiesFile(path)
+
+    properties.update({"level-name": "mundo€"})
+
+    data = path.read_bytes()
+    assert data.decode("latin-1") == "motd=Cañón\nlevel-name=mundo\\u20ac\n"
+    assert panel.PropertiesFile(path).get("level-name") == "mundo€"
+
+
+def test_properties_sees_external_edits(panel, properties_path):
+    properties = panel.PropertiesFile(properties_path)
+    assert properties.get("pvp") == "true"
+
+    properties_path.write_text("pvp=false\n")
+    bump_mtime(properties_path)
+
+    assert properties.get("pvp") == "false"
+
+
+def test_json_list_upsert_remove_and_index(panel, tmp_path):
+    path = tmp_path / "ops.json"
+    path.write_text(json.dumps([{"uuid": "u1", "name": "Alex", "level": 4}]))
+    ops = panel.JsonConfigList(path)
+
+    assert ops.get("alex")["uuid"] == "u1"
+    assert ops.get("U1", key="uuid")["name"] == "Alex"
+    assert ops.upsert({"name": "Alex", "level": 4}) is None
+    assert ops.upsert({"name": "Alex", "level": 2}) == "changed"
+    assert ops.upsert({"uuid": "u2", "name": "Steve", "level": 4}) == "added"
+    assert ops.remove("steve")["uuid"] == "u2"
+    assert json.loads(path.read_text()) == [{"uuid": "u1", "name": "Alex", "level": 2}]
+
+
+def test_json_list_replace_reports_difference(panel, tmp_path):
+    path = tmp_path / "whitelist.json"
+    whitelist = panel.JsonConfigList(path)
+    whitelist.upsert_many([{"name": "a"}, {"name": "b"}])
+
+    added, removed = whitelist.replace([{"name": "b"}, {"name": "c"}])
+
+    assert added == [{"name": "c"}] and removed == [{"name": "a"}]
+    assert whitelist.replace([{"name": "b"}, {"name": "c"}]) == ([], [])
+
+
+def test_json_list_keeps_last_good_copy_while_server_writes(panel, tmp_path):
+    path = tmp_path / "banned-ips.json"
+    path.write_text('[{"ip": "1.1.1.1"}]')
+    bans = panel.JsonConfigList(path, ("ip",))
+    assert len(bans) == 1
+
+    path.write_text('[{"ip": "1.1.1.1"}, {"ip": ')
+    bump_mtime(path)
+    assert len(bans) == 1
+
+    path.write_text('[{"ip": "1.1.1.1"}, {"ip": "2.2.2.2"}]')
+    bump_mtime(path)
+    assert bans.get("2.2.2.2") is not None
+
+
+def test_atomic_write_failure_keeps_original(panel, tmp_path, monkeypatch):
+    path = tmp_path / "ops.json"
+    path.write_text("[]")
+
+    def broken_replace(src, dst):
+        raise OSError("disco lleno")
+
+    monkeypatch.setattr(panel.os, "replace", broken_replace)
+    with pytest.raises(OSError):
+        panel.atomic_write_text(path, "[{}]")
+
+    assert path.read_text() == "[]"
+    assert [p.name for p in tmp_path.iterdir()] == ["ops.json"]
+
+
+@pytest.mark.skipif(sys.platform == "win32", reason="permisos POSIX")
+def test_atomic_write_keeps_permissions(panel, tmp_path):
+    path = tmp_path / "server.properties"
+    path.write_text("pvp=true\n")
+    path.chmod(0o644)
+
+    panel.atomic_write_text(path, "pvp=false\n")
+
+    assert stat.S_IMODE(path.stat().st_mode) == 0o644
+
+
+def test_config_store_poll_reports_only_external_changes(panel, tmp_path, properties_path):
+    files = {
+        "server.properties": properties_path,
+        "ops.json": tmp_path / "ops.json",
+        "whitelist.json": tmp_path / "whitelist.json",
+    }
+    store = panel.ConfigStore(files)
+    seen = []
+    store.add_listener(seen.append)
+
+    assert store.poll() == []
+    store["ops.json"].upsert({"name": "Alex", "uuid": "u1"})
+    store.properties.update({"pvp": "false"})
+    assert store.poll() == []
+
+    files["whitelist.json"].write_text('[{"name": "Steve"}]')
+    assert store.poll() == ["whitelist.json"]
+    assert seen == ["whitelist.json"]
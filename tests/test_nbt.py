@@ -0,0 +1,126 @@
+import gzip
+import struct
+import zlib
+
+import pytest
+
+
+def nbt_string(text):
+    raw = text.encode("utf-8")
+    return struct.pack(">H", len(raw)) + raw
+
+
+def nbt_payload(tag, value):
+    if tag == 1:
+        return struct.pack(">b", value)
+    if tag == 2:
+        return struct.pack(">h", value)
+    if tag == 3:
+        return struct.pack(">i", value)
+    if tag == 4:
+        return struct.pack(">q", value)
+    if tag == 6:
+        return struct.pack(">d", value)
+    if tag == 7:
+        return struct.pack(">i", len(value)) + struct.pack(f">{len(value)}b", *value)
+    if tag == 8:
+        return nbt_string(value)
+    if tag == 9:
+        item_tag, items = value
+        return struct.pack(">bi", item_tag, len(items)) + b"".join(nbt_payload(item_tag, item) for item in items)
+    if tag == 10:
+        return b"".join(
+            bytes([child_tag]) + nbt_string(key) + nbt_payload(child_tag, child)
+            for key, (child_tag, child) in value.items()
+        ) + b"\x00"
+    if tag == 11:
+        return struct.pack(f">i{len(value)}i", len(value), *value)
+    if tag == 12:
+        return struct.pack(f">i{len(value)}q", len(value), *value)
+    raise ValueError(tag)
+
+
+def nbt_document(root, name=""):
+    return b"\x0a" + nbt_string(name) + nbt_payload(10, root)
+
+
+CHUNK = {
+    "DataVersion": (3, 3955),
+    "xPos": (3, -2),
+    "InhabitedTime": (4, 123456789012),
+    "Status": (8, "minecraft:full"),
+    "Heightmaps": (10, {
+        "MOTION_BLOCKING": (12, [-1, 0, 2 ** 62, -(2 ** 63)]),
+    }),
+    "Biomes": (11, [1, -7, 2 ** 31 - 1]),
+    "Light": (7, [-128, 0, 127]),
+    "sections": (9, (10, [
+        {"Y": (1, -4), "name": (8, "sección ñ")},
+        {"Y": (1, 5)},
+    ])),
+    "Pos": (9, (6, [0.5, 64.0, -3.25])),
+    "Empty": (9, (0, [])),
+}
+
+
+@pytest.fixture
+def chunk(panel):
+    return panel.parse_nbt(nbt_document(CHUNK, "raíz"))
+
+
+def test_scalars_and_strings(chunk):
+    assert chunk.name == "raíz"
+    assert chunk["DataVersion"] == 3955
+    assert chunk["xPos"] == -2
+    assert chunk["InhabitedTime"] == 123456789012
+    assert chunk["Status"] == "minecraft:full"
+    assert chunk.get("NoExiste", "x") == "x"
+    assert "Heightmaps" in chunk and len(chunk) == len(CHUNK)
+
+
+def test_arrays_are_decoded_big_endian(chunk):
+    assert list(chunk.find("Heightmaps", "MOTION_BLOCKING")) == [-1, 0, 2 ** 62, -(2 ** 63)]
+    assert list(chunk["Biomes"]) == [1, -7, 2 ** 31 - 1]
+    assert list(chunk["Light"]) == [-128, 0, 127]
+
+
+def test_lists_and_nested_lookup(chunk):
+    sections = chunk["sections"]
+    assert len(sections) == 2
+    assert sections[-1]["Y"] == 5
+    assert chunk.find("sections", 0, "name") == "sección ñ"
+    assert chunk.find("sections", 5, "Y", default=None) is None
+    assert list(chunk["Pos"]) == [0.5, 64.0, -3.25]
+    assert len(chunk["Empty"]) == 0
+    with pytest.raises(IndexError):
+        sections[2]
+
+
+def test_to_python_matches_source(chunk):
+    value = chunk.to_python()
+    assert value["Heightmaps"] == {"MOTION_BLOCKING": [-1, 0, 2 ** 62, -(2 ** 63)]}
+    assert value["sections"] == [{"Y": -4, "name": "sección ñ"}, {"Y": 5}]
+    assert value["Light"] == [-128, 0, 127]
+
+
+def test_skips_unread_values(panel):
+    # Un valor grande antes de la clave pedida se salta por su prefijo de longitud
+    document = nbt_document({
+        "Big": (12, list(range(10000))),
+        "Strings": (9, (8, ["a", "bb", "ccc"])),
+        "Wanted": (3, 7),
+    })
+    assert panel.parse_nbt(document)["Wanted"] == 7
+
+
+@pytest.mark.parametrize("compress", [gzip.compress, zlib.compress, lambda data: data])
+def test_load_nbt_file(panel, tmp_path, compress):
+    path = tmp_path / "level.dat"
+    path.write_bytes(compress(nbt_document({"Data": (10, {"LevelName": (8, "Mundo")})})))
+
+    assert panel.load_nbt_file(path).find("Data", "LevelName") == "Mundo"
+
+
+def test_rejects_non_compound_root(panel):
+    with pytest.raises(ValueError):
+        panel.parse_nbt(b"\x08\x00\x00")
@@ -0,0 +1,121 @@
+import struct
+import zlib
+
+import pytest
+
+SECTOR = 4096
+
+
+def chunk_nbt(inhabited, filler=b""):
+    name = b"InhabitedTime"
+    data = b"\x0a\x00\x00" + b"\x04" + struct.pack(">H", len(name)) + name + struct.pack(">q", inhabited)
+    if filler:
+        key = b"Filler"
+        data += b"\x07" + struct.pack(">H", len(key)) + key + struct.pack(">i", len(filler)) + filler
+    return data + b"\x00"
+
+
+def write_region(path, chunks, gap=3):
+    """Escribir un .mca con los chunks separados por sectores libres.
+
+    chunks: {(x, z): (inhabited, timestamp, external)}
+    """
+    locations = [0] * 1024
+    timestamps = [0] * 1024
+    body = bytearray()
+    sector = 2
+    for (x, z), (inhabited, timestamp, external) in chunks.items():
+        sector += gap
+        body += bytes(gap * SECTOR)
+        payload = zlib.compress(chunk_nbt(inhabited, bytes(range(256)) * 20))
+        if external:
+            (path.parent / f"c.{x}.{z}.mcc").write_bytes(payload)
+            record = struct.pack(">IB", 1, 2 | 0x80)
+        else:
+            record = struct.pack(">IB", len(payload) + 1, 2) + payload
+        count = -(-len(record) // SECTOR)
+        body += record + bytes(count * SECTOR - len(record))
+        locations[x + z * 32] = sector << 8 | count
+        timestamps[x + z * 32] = timestamp
+        sector += count
+    path.write_bytes(struct.pack(">1024I", *locations) + struct.pack(">1024I", *timestamps) + bytes(body))
+
+
+CHUNKS = {
+    (5, 5): (10, 1001, False),
+    (0, 0): (500000, 1002, False),
+    (1, 0): (0, 1003, True),
+    (0, 1): (2000, 1004, False),
+}
+
+
+@pytest.fixture
+def region_path(tmp_path):
+    path = tmp_path / "r.0.0.mca"
+    write_region(path, CHUNKS)
+    return path
+
+
+def read_all(panel, path):
+    with panel.RegionFile(path) as region:
+        return {
+            (x, z): (region.read_chunk_nbt(x, z)["InhabitedTime"], timestamp, sector)
+            for x, z, sector, _, timestamp in region.chunks()
+        }
+
+
+def test_reads_chunks_and_header(panel, region_path):
+    chunks = read_all(panel, region_path)
+    assert {key: value[:2] for key, value in chunks.items()} == {
+        key: (inhabited, timestamp) for key, (inhabited, timestamp, _) in CHUNKS.items()
+    }
+    with panel.RegionFile(region_path) as region:
+        assert region.chunk_count() == 4
+        assert region.fragmentation() > 0.5
+        assert region.read_chunk(31, 31) is None
+
+
+def test_compaction_removes_gaps_and_orders_by_z(panel, region_path):
+    before = read_all(panel, region_path)
+
+    stats = panel.compact_region_file(region_path)
+
+    after = read_all(panel, region_path)
+    assert {key: value[:2] for key, value in after.items()} == {key: value[:2] for key, value in before.items()}
+    assert stats["new_fragmentation"] == 0.0
+    assert stats["new_size"] == region_path.stat().st_size < stats["old_size"]
+    order = [key for key, _ in sorted(after.items(), key=lambda item: item[1][2])]
+    assert order == sorted(after, key=lambda key: panel.morton_index(*key))
+    assert (region_path.parent / "c.1.0.mcc").exists()
+
+
+def test_dry_run_leaves_file_untouched(panel, region_path):
+    data = region_path.read_bytes()
+
+    stats = panel.compact_region_file(region_path, dry_run=True)
+
+    assert region_path.read_bytes() == data
+    assert stats["new_fragmentation"] is None
+    assert stats["new_size"] < stats["old_size"]
+
+
+def test_drop_chunks_and_external_data(panel, region_path):
+    stats = panel.compact_region_file(region_path, drop={0 + 0 * 32, 1 + 0 * 32})
+
+    assert stats["dropped"] == 2
+    assert set(read_all(panel, region_path)) == {(5, 5), (0, 1)}
+    assert not (region_path.parent / "c.1.0.mcc").exists()
+
+
+def test_dropping_every_chunk_removes_file(panel, region_path):
+    stats = panel.compact_region_file(region_path, drop=range(1024))
+
+    assert not region_path.exists()
+    assert stats["new_size"] == 0 and stats["new_fragmentation"] == 0.0
+
+
+def test_scan_inhabited_time(panel, region_path):
+    path, drop = panel._scan_region_inhabited(region_path, 1000)
+
+    assert path == str(region_path)
+    assert sorted(drop) == sorted([5 + 5 * 32, 1 + 0 * 32])
@@ -0,0 +1,76 @@
+import pytest
+
+
+@pytest.fixture
+def manager(panel, tmp_path):
+    # Solo los atributos que usa restore_world (el constructor apunta a C:/MinecraftServer)
+    manager = panel.MinecraftServerManager.__new__(panel.MinecraftServerManager)
+    manager.server_dir = tmp_path / "server"
+    manager.world_dir = manager.server_dir / "world"
+    manager.backups_dir = manager.server_dir / "backups"
+    manager.backups_dir.mkdir(parents=True)
+    manager.backup_store = panel.IncrementalBackupStore(manager.backups_dir)
+    manager.backup_workers = 2
+    manager.max_pre_restore_copies = 2
+    manager.world_dir.mkdir()
+    (manager.world_dir / "level.dat").write_bytes(b"guardado")
+    (manager.world_dir / "region").mkdir()
+    (manager.world_dir / "region" / "r.0.0.mca").write_bytes(b"r" * 9000)
+    return manager
+
+
+def contents(root):
+    return {p.relative_to(root).as_posix(): p.read_bytes() for p in root.rglob("*") if p.is_file()}
+
+
+def change_world(manager):
+    (manager.world_dir / "level.dat").write_bytes(b"cambiado")
+    (manager.world_dir / "nuevo.dat").write_bytes(b"nuevo")
+
+
+def test_restore_incremental_swaps_world(manager):
+    saved = contents(manager.world_dir)
+    manager.backup_store.snapshot(manager.world_dir, "backup_1")
+    change_world(manager)
+    current = contents(manager.world_dir)
+
+    path = manager.backup_store.list_manifests()[-1]
+    manager.restore_world({"name": "backup_1", "type": "incremental", "path": path})
+
+    assert contents(manager.world_dir) == saved
+    (pre_restore,) = manager.backups_dir.glob("world_pre_restore_*")
+    assert contents(pre_restore) == current
+    assert not list(manager.server_dir.glob(".*_restore_tmp"))
+
+
+def test_restore_zip_swaps_world(panel, manager):
+    saved = contents(manager.world_dir)
+    archive = manager.backups_dir / "backup_1.zip"
+    panel.write_zip_parallel(manager.world_dir, archive)
+    change_world(manager)
+
+    manager.restore_world({"name": "backup_1", "type": "zip", "path": archive})
+
+    assert contents(manager.world_dir) == saved
+
+
+def test_failed_restore_keeps_current_world(manager):
+    change_world(manager)
+    current = contents(manager.world_dir)
+    missing = manager.backup_store.manifests_dir / "no_existe.json"
+
+    with pytest.raises(OSError):
+        manager.restore_world({"name": "no_existe", "type": "incremental", "path": missing})
+
+    assert contents(manager.world_dir) == current
+    assert not list(manager.backups_dir.glob("world_pre_restore_*"))
+    assert not list(manager.server_dir.glob(".*_restore_tmp"))
+
+
+def test_pre_restore_copies_are_pruned(manager):
+    manager.backup_store.snapshot(manager.world_dir, "backup_1")
+    path = manager.backup_store.list_manifests()[-1]
+    for _ in range(4):
+        manager.restore_world({"name": "backup_1", "type": "incremental", "path": path})
+
+    assert len(list(manager.backups_dir.glob("world_pre_restore_*"))) == manager.max_pre_restore_copies
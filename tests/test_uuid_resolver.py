@@ -0,0 +1,131 @@
+import json
+import threading
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+def profile_id(name):
+    return uuid.uuid5(uuid.NAMESPACE_DNS, name.lower()).hex
+
+
+class ProfilesHandler(BaseHTTPRequestHandler):
+    """Imitación local del endpoint de perfiles de Mojang"""
+
+    def do_POST(self):
+        server = self.server
+        names = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            server.requests.append(names)
+            throttled = server.throttle > 0
+            server.throttle -= throttled
+        if throttled:
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if any(name.startswith("roto") for name in names):
+            self.send_response(500)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        profiles = [
+            {"id": profile_id(name), "name": name.capitalize()}
+            for name in names if not name.startswith("nadie")
+        ]
+        if not profiles:
+            self.send_response(204)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        body = json.dumps(profiles).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def api():
+    server = ThreadingHTTPServer(("127.0.0.1", 0), ProfilesHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.throttle = 0
+    thread = threading.Thread(target=server.serve_forever, args=(0.05,), daemon=True)
+    thread.start()
+    server.url = f"http://127.0.0.1:{server.server_port}/profiles/minecraft"
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def resolver(panel, api, tmp_path):
+    return panel.UuidResolver(tmp_path / "usercache.json", profiles_url=api.url, timeout=5)
+
+
+def test_resolves_in_batches_and_caches(panel, api, resolver, tmp_path):
+    names = [f"jugador{i}" for i in range(25)]
+
+    results = resolver.resolve(names)
+
+    assert len(results) == 25
+    assert results["jugador7"] == {"name": "Jugador7", "uuid": str(uuid.UUID(profile_id("jugador7")))}
+    assert sorted(len(batch) for batch in api.requests) == [5, 10, 10]
+    cache = json.loads((tmp_path / "usercache.json").read_text())
+    assert {entry["name"] for entry in cache} == {name.capitalize() for name in names}
+
+    # Una segunda instancia lee usercache.json y no consulta la API
+    again = panel.UuidResolver(tmp_path / "usercache.json", profiles_url=api.url)
+    assert again.resolve(["JUGADOR3"])["jugador3"]["uuid"] == results["jugador3"]["uuid"]
+    assert len(api.requests) == 3
+
+
+def test_failed_batch_keeps_the_others(api, resolver, tmp_path):
+    names = [f"ok{i}" for i in range(10)] + ["roto1"] + [f"mas{i}" for i in range(9)]
+
+    results = resolver.resolve(names)
+
+    assert set(results) == {f"ok{i}" for i in range(10)}
+    assert set(resolver.last_failed) == {"roto1"} | {f"mas{i}" for i in range(9)}
+    cache = json.loads((tmp_path / "usercache.json").read_text())
+    assert len(cache) == 10
+
+    # Los nombres del lote fallido no se dan por inexistentes: se vuelven a pedir
+    resolver.resolve(["mas1"])
+    assert api.requests[-1] == ["mas1"]
+    assert resolver.last_failed == {}
+
+
+def test_missing_names_are_not_retried_immediately(api, resolver):
+    assert resolver.resolve(["nadie1", "alguien"]).keys() == {"alguien"}
+    requests_before = len(api.requests)
+
+    assert resolver.resolve_one("nadie1") is None
+    assert len(api.requests) == requests_before
+
+
+def test_retries_after_rate_limit(api, resolver):
+    api.throttle = 2
+
+    assert resolver.resolve_one("steve") == str(uuid.UUID(profile_id("steve")))
+    assert len(api.requests) == 3
+
+
+def test_resolve_one_raises_when_lookup_fails(panel, resolver):
+    with pytest.raises(panel.requests.HTTPError):
+        resolver.resolve_one("roto")
+
+
+def test_offline_mode_matches_server(panel, api, tmp_path):
+    resolver = panel.UuidResolver(tmp_path / "usercache.json", profiles_url=api.url, online=False)
+
+    # UUID que genera el servidor en modo offline para "Notch"
+    assert resolver.resolve_one("Notch") == "b50ad385-829d-3141-a216-7e7d7539ba7f"
+    assert api.requests == []
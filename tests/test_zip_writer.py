@@ -0,0 +1,109 @@
+import os
+import zipfile
+
+import pytest
+
+
+def make_world(root, files):
+    world = root / "world"
+    for name, data in files.items():
+        path = world / name
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_bytes(data)
+    return world
+
+
+def read_back(archive):
+    with zipfile.ZipFile(archive) as zipf:
+        assert zipf.testzip() is None
+        return {info.filename: (info, zipf.read(info)) for info in zipf.infolist()}
+
+
+@pytest.mark.parametrize("policy", ["stored", "fast", "deflate"])
+def test_round_trip(panel, tmp_path, policy):
+    files = {
+        "level.dat": os.urandom(3000),
+        "region/r.0.0.mca": b"chunk" * 50000,
+        "datos/ñandú.json": b'{"a": 1}',
+        "empty.txt": b"",
+    }
+    world = make_world(tmp_path, files)
+    archive = tmp_path / "backup.zip"
+
+    stats = panel.write_zip_parallel(world, archive, workers=3, policy=policy)
+
+    members = read_back(archive)
+    assert stats["files"] == len(files)
+    assert {name: data for name, (_, data) in members.items()} == {
+        f"world/{name}": data for name, data in files.items()
+    }
+    assert members["world/datos/ñandú.json"][0].flag_bits & 0x800
+
+
+def test_stored_and_deflated_methods(panel, tmp_path):
+    world = make_world(tmp_path, {"level.dat": b"x" * 100000, "stats.json": b"y" * 100000})
+    archive = tmp_path / "backup.zip"
+
+    panel.write_zip_parallel(world, archive, workers=2, policy="fast")
+
+    members = read_back(archive)
+    stored, _ = members["world/level.dat"]
+    deflated, _ = members["world/stats.json"]
+    assert stored.compress_type == zipfile.ZIP_STORED
+    assert stored.compress_size == stored.file_size
+    assert deflated.compress_type == zipfile.ZIP_DEFLATED
+    assert deflated.compress_size < deflated.file_size
+
+
+def test_zip64_member_sizes_and_offsets(panel, tmp_path, monkeypatch):
+    monkeypatch.setattr(panel._ZipStreamWriter, "ZIP64_LIMIT", 1000)
+    files = {f"f{i}.bin": os.urandom(1500) for i in range(4)}
+    world = make_world(tmp_path, files)
+    archive = tmp_path / "backup.zip"
+
+    panel.write_zip_parallel(world, archive, workers=2, policy="stored")
+
+    members = read_back(archive)
+    assert {name: data for name, (_, data) in members.items()} == {
+        f"world/{name}": data for name, data in files.items()
+    }
+    assert all(info.extract_version >= zipfile.ZIP64_VERSION for info, _ in members.values())
+    assert b"PK\x06\x06" in archive.read_bytes()
+
+
+def test_zip64_member_count(panel, tmp_path, monkeypatch):
+    monkeypatch.setattr(panel._ZipStreamWriter, "FILECOUNT_LIMIT", 5)
+    files = {f"f{i}.txt": str(i).encode() for i in range(12)}
+    world = make_world(tmp_path, files)
+    archive = tmp_path / "backup.zip"
+
+    panel.write_zip_parallel(world, archive, workers=2)
+
+    assert len(read_back(archive)) == 12
+    assert b"PK\x06\x07" in archive.read_bytes()
+
+
+def test_mtime_before_1980_is_clamped(panel, tmp_path):
+    world = make_world(tmp_path, {"old.dat": b"antiguo"})
+    os.utime(world / "old.dat", (0, 0))
+    archive = tmp_path / "backup.zip"
+
+    panel.write_zip_parallel(world, archive, workers=1)
+
+    info, data = read_back(archive)["world/old.dat"]
+    assert data == b"antiguo"
+    assert info.date_time == (1980, 1, 1, 0, 0, 0)
+
+
+def test_extract_round_trip(panel, tmp_path):
+    files = {"level.dat": b"nivel", "region/r.0.0.mca": b"r" * 20000}
+    world = make_world(tmp_path, files)
+    archive = tmp_path / "backup.zip"
+    panel.write_zip_parallel(world, archive)
+
+    target = tmp_path / "restaurado"
+    written = panel.extract_zip_parallel(archive, target)
+
+    assert written == sum(len(data) for data in files.values())
+    for name, data in files.items():
+        assert (target / name).read_bytes() == data